@@ -1,29 +1,21 @@
 import streamlit as st
-import google.generativeai as genai
-from google.generativeai.types import HarmCategory, HarmBlockThreshold
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import plotly.express as px
-import plotly.graph_objects as go
 import json
 from PIL import Image
-import PyPDF2
 import io
-import docx
-import zipfile
-from pptx import Presentation
 import re
+import hashlib
 import os
 import sys
 import types
 import time  # Ditambahkan untuk fitur reload (Open Project)
-from fpdf import FPDF 
-from thefuzz import process, fuzz
-import types
-import time  # Ditambahkan untuk fitur reload (Open Project)
-from fpdf import FPDF 
-from thefuzz import process, fuzz
+
+# [LAZY] Library berat (AI, grafik) baru di-import saat pertama dipakai, bukan setiap cold start
+from modules.utils.libs_lazy import REGISTRY, profil_impor
+genai = REGISTRY.daftar('genai', 'google.generativeai', menu=("🤖 AI Assistant",), registrasi_sys=False)
+px = REGISTRY.daftar('px', 'plotly.express', registrasi_sys=False)
+go = REGISTRY.daftar('go', 'plotly.graph_objects', registrasi_sys=False)
 
 # ==========================================
 # 00. WAJIB PALING ATAS: KONFIGURASI HALAMAN
@@ -72,6 +64,7 @@ def get_best_ahsp_match(nama_dari_revit, daftar_kunci_ahsp, threshold=65):
     """
     if not nama_dari_revit or not daftar_kunci_ahsp:
         return None, 0
+    from thefuzz import process, fuzz  # [LAZY] hanya dipakai saat menjodohkan BOQ Revit
         
     # 1. Bersihkan nama Revit dari kata pengganggu agar fokus ke material
     nama_bersih = str(nama_dari_revit).replace("Pekerjaan ", "").strip()
@@ -121,14 +114,13 @@ def get_best_ahsp_match(nama_dari_revit, daftar_kunci_ahsp, threshold=65):
 # ==========================================
 # MESIN KONEKSI SUPABASE (DATABASE CLOUD PERMANEN)
 # ==========================================
-from supabase import create_client, Client
-
 @st.cache_resource
 def init_supabase():
     """Menginisialisasi koneksi ke Supabase menggunakan kunci di secrets.toml"""
     try:
         url = st.secrets["SUPABASE_URL"]
         key = st.secrets["SUPABASE_KEY"]
+        from supabase import create_client  # [LAZY] SDK hanya dimuat jika kunci tersedia
         return create_client(url, key)
     except Exception as e:
         st.error("Kunci Supabase belum dipasang di st.secrets!")
@@ -162,131 +154,15 @@ def get_ahsp_from_supabase():
 import re
 import pandas as pd
 
-def clean_number(val):
-    """Pembersih angka kebal koma, titik, NaN, dan Rp"""
-    if pd.isna(val): return 0.0
-    val_str = str(val).replace('Rp', '').replace(' ', '').strip()
-    if val_str.lower() in ['', '-', 'nan']: return 0.0
-    # Adaptasi desimal gaya Indonesia vs Internasional
-    if ',' in val_str and '.' in val_str:
-        val_str = val_str.replace('.', '').replace(',', '.')
-    elif ',' in val_str:
-        val_str = val_str.replace(',', '.')
-    try:
-        return float(val_str)
-    except:
-        return 0.0
-
 def upload_ahsp_to_supabase(df_excel, nama_kategori):
     """Mesin State Machine + Dynamic Header Mapper"""
     if supabase is None: return
     
-    data_to_insert = []
     progress_text = f"Membedah Matriks Excel: {nama_kategori}..."
     my_bar = st.progress(0, text=progress_text)
-    total_rows = len(df_excel)
-    
-    # 1. Default Indeks Kolom (Akan berubah otomatis jika Excelnya beda)
-    idx_uraian, idx_sat, idx_koef, idx_hs, idx_jml = 1, 2, 3, 4, 5
-    
-    # 2. Memori State Machine
-    current_kode = "-"
-    current_uraian_utama = ""
-    current_satuan_utama = ""
-    current_jenis_komponen = ""
-    
-    for index, row in df_excel.iterrows():
-        # Ubah semua isi baris jadi teks huruf kecil agar mudah dilacak
-        row_vals = [str(x).strip() for x in row.values]
-        row_lower = [x.lower() for x in row_vals]
-        
-        # =======================================================
-        # FITUR BARU: MATA AI PENCARI KOLOM (DYNAMIC MAPPER)
-        # =======================================================
-        if "uraian" in row_lower or "uraian pekerjaan" in row_lower:
-            for i, val in enumerate(row_lower):
-                if "uraian" in val: idx_uraian = i
-                elif "sat" in val or "satuan" in val: idx_sat = i
-                elif "koefisien" in val: idx_koef = i
-                elif "harga" in val and "jumlah" not in val: idx_hs = i
-                elif "jumlah" in val: idx_jml = i
-            continue # Lanjut ke baris berikutnya setelah merekam posisi kolom
-            
-        # Amankan baris yang terlalu pendek
-        if len(row_vals) <= max(idx_uraian, idx_sat, idx_koef, idx_hs): continue
-        
-        col_no = row_vals[0]
-        col_uraian = row_vals[idx_uraian]
-        col_satuan = row_vals[idx_sat]
-        
-        if pd.isna(col_uraian) or col_uraian.lower() in ['', 'nan']: continue
-        
-        # 1. DETEKSI INDUK PEKERJAAN (KODE AHSP / JUDUL PEKERJAAN)
-        is_kode = re.match(r'^\d+(\.\d+)+[a-zA-Z]?$', col_no)
-        is_uraian_utama = any(k in col_uraian.lower() for k in ["1 m", "1 bh", "1 titik", "1 unit", "1 kg", "1 ton", "1 ls", "1 set"])
-        
-        if is_kode or (is_uraian_utama and col_no.upper() not in ['A', 'B', 'C', 'D', 'E', 'F']):
-            current_kode = col_no if is_kode else f"AUTO-{index}"
-            current_uraian_utama = col_uraian
-            
-            sat_match = re.search(r'1\s*(m3|m2|m\'|m|bh|buah|unit|set|ls|titik|kg|ton)', col_uraian.lower())
-            current_satuan_utama = sat_match.group(1) if sat_match else "Ls"
-            current_jenis_komponen = "" 
-            continue
-            
-        # 2. DETEKSI JENIS KOMPONEN (Tenaga Kerja, Bahan, Alat)
-        if col_no.upper() == 'A' or "TENAGA KERJA" in col_uraian.upper():
-            current_jenis_komponen = "Tenaga Kerja"; continue
-        elif col_no.upper() == 'B' or "BAHAN" in col_uraian.upper():
-            current_jenis_komponen = "Bahan"; continue
-        elif col_no.upper() == 'C' or "PERALATAN" in col_uraian.upper():
-            current_jenis_komponen = "Peralatan"; continue
-        elif col_no.upper() == 'D' or "JUMLAH" in col_uraian.upper():
-            current_jenis_komponen = ""; continue
-            
-        # 3. REKAM RINCIAN (ANAK)
-        if current_jenis_komponen != "" and current_uraian_utama != "":
-            koef = clean_number(row_vals[idx_koef])
-            hs = clean_number(row_vals[idx_hs])
-            jml = clean_number(row_vals[idx_jml]) if idx_jml < len(row_vals) else (koef * hs)
-            
-            if koef > 0: 
-                data_to_insert.append({
-                    "kategori": str(nama_kategori)[:100],
-                    "kode_ahsp": str(current_kode)[:50],
-                    "uraian_pekerjaan": str(col_uraian)[:500],
-                    "satuan": str(col_satuan)[:20] if col_satuan.lower() != 'nan' else "-",
-                    "koefisien": koef,
-                    "harga_satuan": hs,
-                    "jumlah_harga": jml,
-                    "jenis_komponen": current_jenis_komponen
-                })
-                    
-        # 4. DETEKSI FINAL (HARGA SATUAN PEKERJAAN - INDUK)
-        if col_no.upper() == 'F' or "HARGA SATUAN PEKERJAAN" in col_uraian.upper():
-            # Cari harga dari kanan ke kiri
-            harga_total = 0.0
-            for val in reversed(row_vals):
-                num = clean_number(val)
-                if num > 0:
-                    harga_total = num; break
-                    
-            if current_uraian_utama != "" and harga_total > 0:
-                data_to_insert.append({
-                    "kategori": str(nama_kategori)[:100],
-                    "kode_ahsp": str(current_kode)[:50],
-                    "uraian_pekerjaan": str(current_uraian_utama)[:500],
-                    "satuan": str(current_satuan_utama)[:20],
-                    "koefisien": None,
-                    "harga_satuan": harga_total,
-                    "jumlah_harga": harga_total,
-                    "jenis_komponen": "Utama"
-                })
-            current_uraian_utama = ""
-            current_kode = "-"
-
-        if index % 20 == 0:
-            my_bar.progress(min(index / total_rows, 1.0), text=progress_text)
+    
+    # State machine + dynamic header mapper tervektorisasi (lihat modules/cost/libs_ahsp_parser.py)
+    data_to_insert = libs_ahsp_parser.parse_ahsp_sheet(df_excel, nama_kategori)
             
     my_bar.progress(1.0, text=f"Siap menyuntik {len(data_to_insert)} baris komponen ke Supabase...")
     
@@ -297,142 +173,92 @@ def upload_ahsp_to_supabase(df_excel, nama_kategori):
         st.warning(f"⚠️ Sheet '{nama_kategori}' dilewati (Tidak ditemukan format AHSP).")
         return
         
-    try:
-        chunk_size = 500
-        for i in range(0, len(data_to_insert), chunk_size):
-            chunk = data_to_insert[i:i + chunk_size]
-            supabase.table("ahsp_master").insert(chunk).execute()
-            
+    # Upsert paralel (idempoten) dengan retry exponential backoff per chunk
+    store = libs_ahsp_store.AHSP_Store_Supabase(supabase)
+    laporan = libs_ahsp_store.upload_bulk(
+        store, data_to_insert, chunk_size=500, max_workers=4,
+        callback=lambda selesai, total: my_bar.progress(selesai / total, text=f"Menyuntik chunk {selesai}/{total} ({nama_kategori})...")
+    )
+    
+    if laporan["Chunk_Sukses"] > 0:
         get_ahsp_from_supabase.clear() # Bersihkan RAM setelah sukses
-    except Exception as e:
-        st.error(f"Gagal menyuntik data {nama_kategori} ke Supabase: {e}")   
+    if laporan["Baris_Kembar_Dibuang"] > 0:
+        st.warning(f"⚠️ {nama_kategori}: {laporan['Baris_Kembar_Dibuang']} dari {laporan['Baris_Input']} baris dibuang karena "
+                   f"kunci (kode_ahsp, kategori, uraian_pekerjaan) kembar - hanya baris terakhir tiap kunci yang disimpan.")
+        with st.expander(f"Lihat {len(laporan['Kunci_Kembar'])} kunci kembar ({nama_kategori})"):
+            st.dataframe(pd.DataFrame(laporan["Kunci_Kembar"]), use_container_width=True, hide_index=True)
+    if laporan["Chunk_Gagal"] > 0:
+        st.error(f"Gagal menyuntik {laporan['Baris_Gagal']} baris ({laporan['Chunk_Gagal']} chunk) {nama_kategori} ke Supabase: {laporan['Error'][0]}")
+    else:
+        st.caption(f"✅ {nama_kategori}: {laporan['Total_Baris']} baris dalam {laporan['Durasi_Detik']} detik ({laporan['Baris_per_Detik']} baris/detik, retry: {laporan['Jumlah_Retry']})")
+    return laporan
     
         
 # ==========================================
-# 1. IMPORT LIBRARY ENGINEERING (MODULAR)
+# 1. IMPORT LIBRARY ENGINEERING (MODULAR, LAZY PER MENU)
 # ==========================================
 try:
-    # A. Core Modules
+    # A. Core Modules (dipakai sidebar di setiap rerun -> dimuat langsung)
     from core.backend_enginex import EnginexBackend
     from core.persona import gems_persona, get_persona_list
-
-    # B. Engineering Modules
     from modules.struktur.validator_sni import cek_dimensi_kolom, cek_rasio_tulangan, validasi_gempa_sni
-    from modules.struktur import libs_sni, libs_baja, libs_bridge, libs_gempa
-    
-    # [SAFE IMPORT] Modul Beton & FEM (Agar tidak crash jika dependency kurang)
-    try:
-        from modules.struktur import libs_beton 
-        from modules.struktur import libs_fem 
-    except ImportError:
-        pass
-    
-    from modules.water import libs_hidrologi, libs_irigasi, libs_jiat, libs_bendung
-    from modules.cost import libs_ahsp, libs_rab_engine, libs_optimizer, libs_research, libs_price_engine
-    from modules.arch import libs_arch, libs_zoning, libs_green
-    
-    # C. Utility Modules (TERMASUK YANG BARU)
-    from modules.utils import libs_pdf, libs_export, libs_bim_importer
-    from modules.utils import libs_loader      # <--- [BARU] Universal File Reader (DXF/GIS)
-    from modules.utils import libs_auto_chain  # <--- [BARU] Generator Laporan Panjang
-    # [BARU] Modul MEP
-    try:
-        from modules.mep import libs_mep
-        has_mep = True
-    except ImportError:
-        has_mep = False
-    
-    # [BARU] Modul Legal & Kontrak
-    try:
-        # Percobaan 1: Cari di dalam folder terstruktur (Standard)
-        from modules.legal import libs_legal
-        has_legal = True
-    except ImportError:
-        try:
-            # Percobaan 2: Cari di folder utama/root (Fallback)
-            import libs_legal
-            has_legal = True
-        except ImportError as e:
-            # Tampilkan pesan error teknis di atas jika masih gagal
-            st.error(f"⚠️ Gagal memuat libs_legal: {e}")
-            has_legal = False
-    
-    
-    try:
-        from modules.schedule import libs_4d
-        has_4d = True
-    except ImportError:
-        has_4d = False
-    try:
-        from modules.transport import libs_transport
-        has_transport = True
-    except ImportError:
-        has_transport = False
-    
-    # Optional Modules (Geoteknik)
-    try: 
-        from modules.geotek import libs_geoteknik, libs_pondasi
-        has_geotek = True
-    except ImportError: 
-        has_geotek = False
-    
-    try: 
-        from modules.utils import libs_topografi
-        sys.modules['libs_topografi'] = libs_topografi
-    except ImportError: 
-        pass
-        
 except ImportError as e:
     st.error(f"⚠️ **CRITICAL SYSTEM ERROR**")
     st.write(f"Gagal memuat modul engineering dasar. Pesan Error: `{e}`")
     st.stop()
 
-# ==========================================
-# REGISTRASI MODUL KE SYSTEM
-# ==========================================
-# Mendaftarkan modul agar bisa dipanggil oleh fungsi eksekusi dinamis
-sys.modules['libs_sni'] = libs_sni
-sys.modules['libs_baja'] = libs_baja
-sys.modules['libs_bridge'] = libs_bridge
-sys.modules['libs_gempa'] = libs_gempa
-
-if 'libs_fem' in locals(): sys.modules['libs_fem'] = libs_fem
-if 'libs_beton' in locals(): sys.modules['libs_beton'] = libs_beton
-
-sys.modules['libs_hidrologi'] = libs_hidrologi
-sys.modules['libs_irigasi'] = libs_irigasi
-sys.modules['libs_jiat'] = libs_jiat
-sys.modules['libs_bendung'] = libs_bendung
-sys.modules['libs_ahsp'] = libs_ahsp
-sys.modules['libs_rab_engine'] = libs_rab_engine
-sys.modules['libs_optimizer'] = libs_optimizer
-sys.modules['libs_research'] = libs_research
-sys.modules['libs_arch'] = libs_arch
-sys.modules['libs_zoning'] = libs_zoning
-sys.modules['libs_green'] = libs_green
-sys.modules['libs_pdf'] = libs_pdf
-sys.modules['libs_export'] = libs_export
-sys.modules['libs_bim_importer'] = libs_bim_importer
-sys.modules['libs_loader'] = libs_loader         # Register Loader Baru
-sys.modules['libs_auto_chain'] = libs_auto_chain # Register Chain Baru
-sys.modules['libs_price_engine'] = libs_price_engine # <--- TAMBAHAN BARU
-# [BARU] Register MEP
-if has_mep:
-    sys.modules['libs_mep'] = libs_mep
-if has_legal:
-    sys.modules['libs_legal'] = libs_legal
-if has_4d:
-    sys.modules['libs_4d'] = libs_4d
-if has_transport:
-    sys.modules['libs_transport'] = libs_transport
-if has_geotek:
-    sys.modules['libs_geoteknik'] = libs_geoteknik
-    sys.modules['libs_pondasi'] = libs_pondasi
-    try:
-        from modules.cost import libs_bps
-        sys.modules['libs_bps'] = libs_bps
-    except ImportError:
-        pass
+# B. Engine per menu: hanya didaftarkan (proxy di sys.modules), modul asli di-import
+#    saat menu pemakainya dibuka / atribut pertama diakses. Hasil import di-cache per proses.
+MENU_AI = "🤖 AI Assistant"
+MENU_FEM = "🌪️ Analisis Gempa (FEM)"
+MENU_BAJA = "🌉 Audit Baja & Jembatan"
+MENU_GEOTEK = ("🪨 Analisis Geoteknik & Lereng", "🏗️ Daya Dukung Pondasi")
+
+libs_sni = REGISTRY.daftar('libs_sni', 'modules.struktur.libs_sni', menu=(MENU_AI,))
+libs_baja = REGISTRY.daftar('libs_baja', 'modules.struktur.libs_baja', menu=(MENU_AI, MENU_BAJA))
+libs_bridge = REGISTRY.daftar('libs_bridge', 'modules.struktur.libs_bridge', menu=(MENU_BAJA,))
+libs_gempa = REGISTRY.daftar('libs_gempa', 'modules.struktur.libs_gempa', menu=(MENU_AI, MENU_FEM))
+# [SAFE IMPORT] Modul Beton & FEM (Agar tidak crash jika dependency kurang)
+libs_beton = REGISTRY.daftar('libs_beton', 'modules.struktur.libs_beton', menu=("🏗️ Audit Struktur",), opsional=True)
+libs_fem = REGISTRY.daftar('libs_fem', 'modules.struktur.libs_fem', menu=(MENU_FEM, "🏛️ Template Struktur (Klasik)", MENU_BAJA), opsional=True)
+
+libs_hidrologi = REGISTRY.daftar('libs_hidrologi', 'modules.water.libs_hidrologi', menu=("🌊 Analisis Hidrologi",))
+libs_irigasi = REGISTRY.daftar('libs_irigasi', 'modules.water.libs_irigasi', menu=("🌾 Desain Irigasi (KP-01)",))
+libs_jiat = REGISTRY.daftar('libs_jiat', 'modules.water.libs_jiat', menu=("🌊 Analisis Hidrologi",))
+libs_bendung = REGISTRY.daftar('libs_bendung', 'modules.water.libs_bendung', menu=("🌊 Hidrolika Bendung (KP-02)",))
+
+libs_ahsp = REGISTRY.daftar('libs_ahsp', 'modules.cost.libs_ahsp', menu=(MENU_AI,))
+libs_rab_engine = REGISTRY.daftar('libs_rab_engine', 'modules.cost.libs_rab_engine', menu=("📑 Laporan RAB 5D",))
+libs_optimizer = REGISTRY.daftar('libs_optimizer', 'modules.cost.libs_optimizer', menu=(MENU_AI,))
+libs_research = REGISTRY.daftar('libs_research', 'modules.cost.libs_research')
+libs_price_engine = REGISTRY.daftar('libs_price_engine', 'modules.cost.libs_price_engine', menu=("📑 Laporan RAB 5D",))
+libs_reprice = REGISTRY.daftar('libs_reprice', 'modules.cost.libs_reprice', menu=("📑 Laporan RAB 5D",))
+libs_ahsp_parser = REGISTRY.daftar('libs_ahsp_parser', 'modules.cost.libs_ahsp_parser', menu=("⚙️ Admin: Ekstraksi AHSP",))
+libs_ahsp_store = REGISTRY.daftar('libs_ahsp_store', 'modules.cost.libs_ahsp_store', menu=("⚙️ Admin: Ekstraksi AHSP",))
+
+libs_arch = REGISTRY.daftar('libs_arch', 'modules.arch.libs_arch')
+libs_zoning = REGISTRY.daftar('libs_zoning', 'modules.arch.libs_zoning', menu=("🌿 Green Building & Zonasi",))
+libs_green = REGISTRY.daftar('libs_green', 'modules.arch.libs_green', menu=("🌿 Green Building & Zonasi",))
+
+# C. Utility Modules (libs_loader & libs_bim_importer paling berat: geopandas, ezdxf, ifcopenshell)
+libs_pdf = REGISTRY.daftar('libs_pdf', 'modules.utils.libs_pdf', menu=("📑 Laporan RAB 5D",))
+libs_export = REGISTRY.daftar('libs_export', 'modules.utils.libs_export', menu=("📑 Laporan RAB 5D",))
+libs_bim_importer = REGISTRY.daftar('libs_bim_importer', 'modules.utils.libs_bim_importer')
+libs_loader = REGISTRY.daftar('libs_loader', 'modules.utils.libs_loader', menu=("📏 Visual QTO 2D (PlanSwift Mode)", "🗺️ Analisis Topografi 3D"))  # Universal File Reader (DXF/GIS)
+libs_auto_chain = REGISTRY.daftar('libs_auto_chain', 'modules.utils.libs_auto_chain')  # Generator Laporan Panjang
+libs_project_bundle = REGISTRY.daftar('libs_project_bundle', 'modules.utils.libs_project_bundle')  # Bundle Proyek (Parquet + JSON)
+
+# D. Modul opsional: jika gagal di-import, proxy dihapus dari sys.modules sehingga
+#    pengecekan `'libs_x' not in sys.modules` di tiap menu menampilkan peringatan.
+libs_mep = REGISTRY.daftar('libs_mep', 'modules.mep.libs_mep', menu=("💡 Kalkulator MEP (SNI)",), opsional=True)
+# Legal & Kontrak: folder terstruktur (standard) lalu folder utama/root (fallback)
+libs_legal = REGISTRY.daftar('libs_legal', ('modules.utils.libs_legal', 'libs_legal'), menu=("⚖️ Evaluasi Tender & Legal",), opsional=True)
+libs_4d = REGISTRY.daftar('libs_4d', 'modules.schedule.libs_4d', menu=("📅 Penjadwalan Proyek (4D BIM)",), opsional=True)
+libs_transport = REGISTRY.daftar('libs_transport', 'modules.transport.libs_transport', menu=("🛣️ Analisis Transportasi (Jalan)",), opsional=True)
+libs_geoteknik = REGISTRY.daftar('libs_geoteknik', 'modules.geotek.libs_geoteknik', menu=MENU_GEOTEK, opsional=True)
+libs_pondasi = REGISTRY.daftar('libs_pondasi', 'modules.geotek.libs_pondasi', menu=MENU_GEOTEK, opsional=True)
+libs_bps = REGISTRY.daftar('libs_bps', 'modules.cost.libs_bps', menu=MENU_GEOTEK, opsional=True)
+libs_topografi = REGISTRY.daftar('libs_topografi', 'modules.utils.libs_topografi', menu=("🗺️ Analisis Topografi 3D",), opsional=True)
 
 
 st.markdown("""
@@ -566,7 +392,8 @@ def pre_audit_check_sni(data_input):
 
 def render_project_file_manager():
     """
-    [FITUR BARU] Menyimpan (Save) dan Membuka (Open) konfigurasi proyek via JSON.
+    [FITUR BARU] Menyimpan (Save) dan Membuka (Open) konfigurasi proyek.
+    Bundle ZIP (Parquet + JSON) menyimpan SEMUA tabel (BOQ, AHSP, dst); JSON lama tetap didukung.
     """
     st.markdown("### 💾 File Project")
     
@@ -603,12 +430,40 @@ def render_project_file_manager():
             )
         except Exception as e:
             st.error(f"Save UI error (Abaikan jika sedang testing): {e}")
+        
+        # Bundle lengkap: DataFrame (real_boq_data, master_ahsp, ...) ikut tersimpan sebagai Parquet
+        try:
+            st.download_button(
+                label="📦 Save Bundle",
+                data=libs_project_bundle.simpan_bundle(dict(st.session_state.items())),
+                file_name="project_bundle.zip",
+                mime="application/zip",
+                use_container_width=True
+            )
+        except Exception as e:
+            st.error(f"Gagal membuat bundle proyek: {e}")
 
-    # --- 2. FITUR OPEN (UPLOAD JSON) ---
+    # --- 2. FITUR OPEN (UPLOAD JSON / BUNDLE ZIP) ---
     with col_file2:
-        uploaded_json = st.file_uploader("Upload JSON", type=["json"], label_visibility="collapsed")
+        uploaded_json = st.file_uploader("Upload JSON / Bundle", type=["json", "zip"], label_visibility="collapsed")
+        
+        # Bundle ZIP: id file dicatat agar tidak di-load ulang terus selama masih menempel di uploader
+        id_bundle = f"{uploaded_json.name}:{uploaded_json.size}" if uploaded_json is not None else None
         
-        if uploaded_json is not None:
+        if uploaded_json is not None and uploaded_json.name.lower().endswith(".zip"):
+            if st.session_state.get('_bundle_terakhir') != id_bundle:
+                try:
+                    _, loaded_bundle = libs_project_bundle.buka_bundle(uploaded_json)
+                    for key, value in loaded_bundle.items():
+                        st.session_state[key] = value
+                    st.session_state['_bundle_terakhir'] = id_bundle
+                    
+                    st.success(f"Bundle Loaded! ({len(loaded_bundle)} item)")
+                    time.sleep(0.5)
+                    st.rerun()
+                except Exception as e:
+                    st.error(f"Error loading bundle: {e}")
+        elif uploaded_json is not None:
             try:
                 loaded_data = json.load(uploaded_json)
                 
@@ -683,6 +538,7 @@ def clean_text_for_report(text):
 def create_pdf(text_content):
     # Menggunakan fpdf untuk dokumen dasar (SIMBG Requirement: Clean PDF)
     # Ini versi simple. Untuk versi lengkap Header/Footer, gunakan libs_pdf
+    from fpdf import FPDF  # [LAZY] hanya saat ekspor PDF
     class PDF(FPDF):
         def header(self):
             self.set_font('Arial', 'B', 10)
@@ -730,8 +586,13 @@ if 'master_ahsp' not in st.session_state:
         st.session_state.master_ahsp = df_ahsp_db
         st.session_state.status_ahsp = "TERKUNCI DARI DATABASE CLOUD"
     else:
+        # Fallback: katalog lokal versi aktif TIDAK dimuat utuh ke session (bisa puluhan ribu baris).
+        # Layar RAB meminta kandidat per item pekerjaan langsung ke katalog (filter kata kunci + limit).
         st.session_state.master_ahsp = None
-        st.session_state.status_ahsp = "KOSONG"
+        if st.session_state.backend.jumlah_ahsp_permanen() > 0:
+            st.session_state.status_ahsp = "TERKUNCI DARI DATABASE LOKAL"
+        else:
+            st.session_state.status_ahsp = "KOSONG"
 # ==========================================
 
 with st.sidebar:
@@ -742,13 +603,13 @@ with st.sidebar:
     api_key = get_api_key()
     if api_key:
         st.success("🔒 API Key Terdeteksi (Secure Mode)")
-        genai.configure(api_key=api_key, transport="rest")
+        kunci_api_genai = api_key  # genai.configure() ditunda sampai AI benar-benar dipanggil
         is_secure = True
     else:
         st.warning("⚠️ Mode Publik (Tidak Aman)")
         api_key_input = st.text_input("🔑 Masukkan API Key Manual:", type="password")
         if api_key_input:
-            genai.configure(api_key=api_key_input, transport="rest")
+            kunci_api_genai = api_key_input
             is_secure = True
         else:
             is_secure = False
@@ -999,6 +860,12 @@ with st.sidebar:
 # ==========================================
 # 7. LOGIKA TAMPILAN UTAMA
 # ==========================================
+# [LAZY] Muat engine milik menu aktif saja (sekali per proses, berikutnya dari cache)
+engine_gagal = REGISTRY.siapkan_menu(selected_menu)
+if engine_gagal:
+    st.error(f"⚠️ **CRITICAL SYSTEM ERROR**")
+    st.write("Gagal memuat modul engineering untuk menu ini. Pesan Error: " + "; ".join(f"`{v}`" for v in engine_gagal.values()))
+    st.stop()
 
 # A. MODE AI ASSISTANT
 if selected_menu == "🤖 AI Assistant":
@@ -1006,8 +873,28 @@ if selected_menu == "🤖 AI Assistant":
     st.markdown(f'<div class="sub-header">Ahli Aktif: <b>{st.session_state.current_expert_active}</b></div>', unsafe_allow_html=True)
 
     
-    # History
-    history = db.get_chat_history(nama_proyek, st.session_state.current_expert_active)
+    # Pencarian Full-Text (FTS5) di riwayat konsultasi & dokumen proyek
+    with st.expander("🔎 Cari Riwayat Konsultasi & Dokumen"):
+        col_q, col_lingkup = st.columns([3, 1])
+        kata_kunci = col_q.text_input("Kata kunci:", key="kata_kunci_fts", placeholder="misal: mutu beton kolom")
+        semua_proyek = col_lingkup.checkbox("Semua proyek", key="fts_semua_proyek")
+        if kata_kunci:
+            hasil_cari = db.search(kata_kunci, None if semua_proyek else nama_proyek, limit=20)
+            if not hasil_cari:
+                st.caption("Tidak ada hasil.")
+            for h in hasil_cari:
+                ikon = "💬" if h['sumber'] == "chat" else "📄"
+                st.markdown(f"{ikon} **{h['project_name']}** · {h['judul']} · _{h['tanggal']}_")
+                st.caption(h['snippet'].replace("\n", " "))
+
+    # History (hanya N pesan terakhir, bisa dimuat mundur)
+    if 'batas_riwayat_chat' not in st.session_state:
+        st.session_state.batas_riwayat_chat = 100
+    history = db.get_chat_history(nama_proyek, st.session_state.current_expert_active, limit=st.session_state.batas_riwayat_chat)
+    if len(history) >= st.session_state.batas_riwayat_chat:
+        if st.button("⬆️ Muat pesan lebih lama", key="muat_riwayat_lama"):
+            st.session_state.batas_riwayat_chat += 100
+            st.rerun()
     download_btn_counter = 0
 
     for msg in history:
@@ -1146,6 +1033,7 @@ if selected_menu == "🤖 AI Assistant":
                                 img_data = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
                                 full_prompt.append(img_data) 
                             full_prompt[0] += f"\n\n[FILE PDF: {f.name}]\n{txt}"
+                            db.indeks_dokumen(nama_proyek, f.name, txt, jenis="pdf")
                         
                     # 3. HANDLING SPECIAL FILES (CAD/GIS)
                     elif f.name.lower().endswith(('.dxf', '.dwg', '.geojson', '.kml', '.kmz', '.gpx', '.zip', '.tif', '.tiff', '.dem')):
@@ -1154,6 +1042,8 @@ if selected_menu == "🤖 AI Assistant":
                                 text_data, img_data, _ = libs_loader.process_special_file(f)
                                 # Pastikan variabel text_data terdefinisi sebelum dimasukkan ke f-string
                                 full_prompt[0] += f"\n\n[DATA FILE: {f.name}]\n{text_data}"
+                                if f.name.lower().endswith('.dxf'):
+                                    db.indeks_dokumen(nama_proyek, f.name, str(text_data), jenis="dxf")
                                 if img_data:
                                     full_prompt.append(Image.open(img_data))
                                     with st.chat_message("user"):
@@ -1307,6 +1197,7 @@ if selected_menu == "🤖 AI Assistant":
                     chat_hist = [{"role": "user" if h['role']=="user" else "model", "parts": [h['content']]} for h in history if h['content'] != prompt]
                     
                     try:
+                        genai.configure(api_key=kunci_api_genai, transport="rest")
                         available_models = [m.name for m in genai.list_models() if 'generateContent' in m.supported_generation_methods]
                         priorities = ["models/gemini-1.5-flash", "models/gemini-1.5-pro", "models/gemini-pro"]
                         
@@ -2526,10 +2417,21 @@ elif selected_menu == "🗺️ Analisis Topografi 3D":
                         if filename.endswith('.csv'): df_points = pd.read_csv(file_xyz)
                         else: df_points = pd.read_excel(file_xyz)
                         df_points.columns = [str(c).upper().strip() for c in df_points.columns]
+                        if all(k in df_points.columns for k in ['X', 'Y', 'Z']):
+                            df_points = topo_eng.siapkan_titik(df_points)
                     
                     # 2. FORMAT DXF (AutoCAD)
                     elif filename.endswith('.dxf'):
-                        _, _, df_data = sys.modules['libs_loader'].process_special_file(file_xyz)
+                        # Rerun Streamlit: buka ulang artefak awan titik (.npy) tanpa parsing DXF lagi
+                        artefak_topo = st.session_state.setdefault('artefak_topografi', {})
+                        # Kunci: file_id unggahan (unik per unggahan); cadangan: hash isi file.
+                        # Nama + ukuran tidak cukup -> file beda isi bisa memakai artefak lama.
+                        kunci_topo = getattr(file_xyz, 'file_id', None) or hashlib.sha256(file_xyz.getvalue()).hexdigest()
+                        df_data = topo_eng.muat_awan_titik(artefak_topo.get(kunci_topo))
+                        if df_data is None:
+                            _, _, df_data = sys.modules['libs_loader'].process_special_file(file_xyz, pratinjau=False)
+                            if df_data is not None and df_data.attrs.get('Artefak'):
+                                artefak_topo[kunci_topo] = df_data.attrs['Artefak']
                         if df_data is not None and not df_data.empty:
                             df_points = df_data
                         else:
@@ -3290,6 +3192,10 @@ elif selected_menu == "⚙️ Admin: Ekstraksi AHSP":
     st.title("⚙️ Database Master AHSP (Admin Only)")
     st.info("Sistem sekarang dilengkapi fitur 'Smart Filter'. Upload file Excel raksasa Anda, pilih sheet yang relevan, dan sistem akan menyedotnya satu per satu tanpa membebani RAM.")
     
+    with st.expander("🧱 Prasyarat Tabel Supabase (jalankan sekali di SQL Editor)"):
+        st.caption("Upsert idempoten membutuhkan UNIQUE constraint pada (kode_ahsp, kategori, uraian_pekerjaan).")
+        st.code(libs_ahsp_store.DDL_SUPABASE.format(tabel="ahsp_master"), language="sql")
+    
     file_ahsp = st.file_uploader("Upload File Excel AHSP Induk (.xlsx)", type=["xlsx"])
     
     if file_ahsp:
@@ -3347,6 +3253,66 @@ elif selected_menu == "⚙️ Admin: Ekstraksi AHSP":
                 import time
                 time.sleep(2)
                 st.rerun()
+
+    # ==========================================================
+    # BATCH INGEST BANYAK WORKBOOK -> DATABASE LOKAL (PARALEL)
+    # ==========================================================
+    st.divider()
+    st.markdown("### 📚 Gabung Banyak Workbook AHSP (Database Lokal)")
+    st.caption("Setiap workbook dibedah di proses terpisah (sesuai jumlah core CPU), lalu sheet HSP disimpan sebagai satu snapshot katalog baru (versi lama tetap bisa dipulihkan).")
+    
+    files_batch = st.file_uploader("Upload 5-10 File Excel AHSP sekaligus (.xlsx)", type=["xlsx"], accept_multiple_files=True, key="batch_ahsp_files")
+    
+    if files_batch and st.button("🔒 Sedot dan Kunci Permanen", use_container_width=True):
+        bar_batch = st.progress(0, text=f"Membedah {len(files_batch)} workbook secara paralel...")
+        log_batch = st.empty()
+        baris_log = []
+        
+        def progress_batch(nama_file, selesai, total, jumlah_baris):
+            bar_batch.progress(selesai / total, text=f"Selesai {selesai}/{total} workbook")
+            baris_log.append(f"✅ {nama_file}: {jumlah_baris} baris")
+            log_batch.markdown("\n".join(f"- {b}" for b in baris_log))
+        
+        sukses, pesan = db.proses_dan_simpan_multi_excel_paralel(files_batch, callback=progress_batch)
+        if sukses:
+            st.success(pesan)
+            st.session_state.master_ahsp = None
+            st.session_state.status_ahsp = "TERKUNCI DARI DATABASE LOKAL"
+        else:
+            st.error(pesan)
+
+    with st.expander("🗂️ Riwayat Versi Katalog AHSP"):
+        df_versi = db.katalog.daftar_versi()
+        if df_versi.empty:
+            st.caption("Belum ada snapshot katalog.")
+        else:
+            st.dataframe(df_versi, use_container_width=True, hide_index=True)
+            id_pilih = st.selectbox("Pulihkan versi:", df_versi['id_versi'].tolist(), key="pilih_versi_katalog")
+            if st.button("♻️ Aktifkan Versi Ini", key="aktifkan_versi_katalog"):
+                db.katalog.aktifkan_versi(int(id_pilih))
+                st.session_state.master_ahsp = None
+                st.session_state.status_ahsp = "TERKUNCI DARI DATABASE LOKAL"
+                st.success(f"Katalog versi #{id_pilih} kini aktif.")
+            n_simpan = st.number_input("Simpan versi terakhir:", min_value=1, value=db.simpan_versi_katalog or 5, step=1, key="simpan_versi_katalog")
+            if st.button("🧹 Pangkas Versi Lama", key="pangkas_versi_katalog"):
+                n_hapus = db.katalog.pangkas_versi(simpan_terakhir=int(n_simpan))
+                st.success(f"{n_hapus} versi lama dihapus (versi aktif selalu dipertahankan).")
+
+    with st.expander("⏱️ Profil Waktu Import (Cold Start)"):
+        st.caption("Engine dimuat per menu saat pertama dibuka. Tabel di bawah menunjukkan engine yang sudah dimuat di proses server ini beserta waktu import-nya.")
+        st.dataframe(REGISTRY.status(), use_container_width=True, hide_index=True)
+        
+        st.caption("Profil `python -X importtime` di interpreter baru (cold start sungguhan) untuk seluruh engine terdaftar.")
+        if st.button("🔬 Jalankan Profil Import", key="profil_import_engine"):
+            with st.spinner("Meng-import semua engine di proses terpisah..."):
+                hasil_profil = profil_impor(REGISTRY.daftar_modul())
+            if "error" in hasil_profil:
+                st.error(hasil_profil["error"])
+            else:
+                st.metric("Total Waktu Import Semua Engine", f"{hasil_profil['Total_ms'] / 1000:.2f} detik")
+                st.dataframe(hasil_profil["Per_Modul"], use_container_width=True, hide_index=True)
+                if hasil_profil["Gagal"]:
+                    st.warning("Gagal di-import: " + "; ".join(hasil_profil["Gagal"]))
         
         
 # --- E. MODE LAPORAN RAB 5D (WORKSPACE ONLINE) ---
@@ -3373,8 +3339,10 @@ elif selected_menu == "📑 Laporan RAB 5D":
     # 2. PENGAMANAN DATABASE AHSP (ANTI-CRASH)
     # =========================================================
     db_ahsp = st.session_state.get('master_ahsp')
+    # Katalog lokal: tidak ada DataFrame di session, kandidat AHSP di-query per item pekerjaan
+    katalog_lokal = db_ahsp is None and st.session_state.get('status_ahsp') == "TERKUNCI DARI DATABASE LOKAL"
     
-    if db_ahsp is None or (isinstance(db_ahsp, pd.DataFrame) and db_ahsp.empty):
+    if not katalog_lokal and (db_ahsp is None or (isinstance(db_ahsp, pd.DataFrame) and db_ahsp.empty)):
         st.error("🚨 SISTEM TERKUNCI: Database Master AHSP Kosong!")
         st.warning("Volume dari Revit berhasil ditarik, namun harga tidak bisa dihitung. Silakan ke menu **⚙️ Admin: Ekstraksi AHSP**, upload File Excel AHSP, lalu klik tombol 'Sedot dan Kunci Permanen'.")
         
@@ -3384,7 +3352,7 @@ elif selected_menu == "📑 Laporan RAB 5D":
         st.stop()
         
     # Cek apakah kolom URAIAN ada di database AHSP (menghindari KeyError)
-    col_uraian = next((c for c in db_ahsp.columns if 'uraian' in str(c).lower()), None)
+    col_uraian = 'Uraian Pekerjaan' if katalog_lokal else next((c for c in db_ahsp.columns if 'uraian' in str(c).lower()), None)
     
     if not col_uraian:
         st.error("🚨 DATABASE AHSP KORUP: Tidak menemukan kolom 'Uraian Pekerjaan'.")
@@ -3405,8 +3373,22 @@ elif selected_menu == "📑 Laporan RAB 5D":
         elif "maluku" in lokasi_proyek.lower(): ikk_multiplier = 1.25
         elif "kalimantan" in lokasi_proyek.lower(): ikk_multiplier = 1.15
         
-        # Ambil daftar SEMUA Uraian Pekerjaan dari Supabase untuk "Kamus" NLP
-        daftar_uraian_ahsp = db_ahsp['Uraian Pekerjaan'].astype(str).tolist()
+        # "Kamus" NLP: Supabase -> SEMUA Uraian Pekerjaan (sudah di-cache di RAM).
+        # Katalog lokal -> kandidat per kata pencarian (LIKE per kata, maks 200 baris per kata).
+        daftar_uraian_ahsp = None if katalog_lokal else db_ahsp['Uraian Pekerjaan'].astype(str).tolist()
+        cache_kandidat = {}
+
+        def kandidat_ahsp(kata_pencarian, per_kata=200):
+            if not katalog_lokal:
+                return db_ahsp, daftar_uraian_ahsp
+            if kata_pencarian not in cache_kandidat:
+                daftar_kata = [k for k in re.findall(r'\w+', kata_pencarian) if len(k) >= 4] or [kata_pencarian]
+                df_kandidat = pd.concat([
+                    db.get_master_ahsp_permanen(kolom=('kode_analisa', 'uraian_pekerjaan', 'satuan', 'harga_satuan'), kata_kunci=k, limit=per_kata)
+                    for k in daftar_kata
+                ], ignore_index=True).drop_duplicates(subset=['Kode Analisa', 'Uraian Pekerjaan'])
+                cache_kandidat[kata_pencarian] = (df_kandidat, df_kandidat['Uraian Pekerjaan'].astype(str).tolist())
+            return cache_kandidat[kata_pencarian]
 
         def ai_ahsp_matcher(nama_pekerjaan_revit):
             """Fungsi NLP sesungguhnya untuk menjodohkan kata bahasa Inggris Revit ke bahasa Indonesia PUPR"""
@@ -3425,17 +3407,18 @@ elif selected_menu == "📑 Laporan RAB 5D":
             
             # --- 2. NLP FUZZY MATCHING (Levenshtein Distance) ---
             # Mencari tingkat kemiripan kata di atas 50%
-            best_match, score = get_best_ahsp_match(kata_pencarian, daftar_uraian_ahsp, threshold=50)
+            df_kandidat, daftar_kandidat = kandidat_ahsp(kata_pencarian)
+            best_match, score = get_best_ahsp_match(kata_pencarian, daftar_kandidat, threshold=50)
             
             # --- 3. AMBIL HARGA JIKA KETEMU JODOHNYA ---
             if best_match:
                 # Cari baris yang Uraiannya persis sama dengan best_match
-                baris_ahsp = db_ahsp[db_ahsp['Uraian Pekerjaan'] == best_match].iloc[0]
+                baris_ahsp = df_kandidat[df_kandidat['Uraian Pekerjaan'] == best_match].iloc[0]
                 
                 harga_dasar = float(baris_ahsp.get('Harga Satuan (Rp)', 0.0))
                 
                 # Di Supabase, kita tadi tidak menyimpan kode untuk "Utama", jadi kita pakai "-" saja
-                kode_ahsp = "-" 
+                kode_ahsp = str(baris_ahsp.get('Kode Analisa', "-")) 
                 satuan = str(baris_ahsp.get('Satuan', "Unit"))
                 uraian_asli = str(baris_ahsp.get('Uraian Pekerjaan', best_match))
                 
@@ -0,0 +1,397 @@
+# ==============================================================================
+# 📄 NAMA FILE: ahsp_catalog.py
+# 📍 LOKASI: core/ahsp_catalog.py
+# 🛠️ FUNGSI: Katalog AHSP Ber-Versi (Snapshot per Upload + Query API Hemat Memori)
+# ==============================================================================
+
+from datetime import datetime
+
+import pandas as pd
+from sqlalchemy import create_engine, event, select, insert, update, delete, func, literal
+
+try:
+    from core.schema_ahsp import AHSPHeader, AHSPKomposisi, KatalogVersi, MasterAlat, MasterBahan, MasterTenaga, migrasi_skema
+except ImportError:
+    from schema_ahsp import AHSPHeader, AHSPKomposisi, KatalogVersi, MasterAlat, MasterBahan, MasterTenaga, migrasi_skema
+
+# Database aplikasi (EnginexBackend 'enginex_core.db') -> default katalog & ETL master HSD
+DB_URL_KATALOG = "sqlite:///enginex_core.db"
+# Kolom katalog -> nama kolom yang dipakai layar RAB (st.session_state.master_ahsp)
+NAMA_KOLOM_TAMPILAN = {
+    'kode_analisa': 'Kode Analisa',
+    'uraian_pekerjaan': 'Uraian Pekerjaan',
+    'satuan': 'Satuan',
+    'harga_satuan': 'Harga Satuan (Rp)',
+    'kategori': 'Kategori',
+    'divisi_pupr': 'Divisi PUPR',
+}
+KOLOM_KATALOG_DEFAULT = ('uraian_pekerjaan', 'satuan', 'harga_satuan')
+# jenis_komponen hasil libs_ahsp_parser -> (tipe_sumber_daya, model master HSD, kolom id, kolom uraian)
+PETA_SUMBER_DAYA = {
+    'Tenaga Kerja': ('TENAGA', MasterTenaga, 'id_tenaga', 'uraian_tenaga'),
+    'Bahan': ('BAHAN', MasterBahan, 'id_bahan', 'uraian_bahan'),
+    'Peralatan': ('ALAT', MasterAlat, 'id_alat', 'uraian_alat'),
+}
+
+
+def _pragma_sqlite(dbapi_conn, _):
+    cur = dbapi_conn.cursor()
+    cur.execute("PRAGMA foreign_keys=ON")
+    cur.execute("PRAGMA busy_timeout=10000")
+    cur.close()
+
+
+class Katalog_AHSP_Engine:
+    """
+    Store master AHSP ternormalisasi (tb_katalog_versi + tb_ahsp_header + tb_rel_ahsp_komposisi).
+    Setiap upload menjadi SATU snapshot versi baru; hanya satu versi yang aktif.
+    Layar cukup meminta kolom & baris yang dibutuhkan (bukan SELECT * seluruh katalog).
+    """
+    def __init__(self, engine_atau_url=DB_URL_KATALOG):
+        if isinstance(engine_atau_url, str):
+            self.engine = create_engine(engine_atau_url, future=True)
+        else:
+            self.engine = engine_atau_url
+        if self.engine.dialect.name == "sqlite":
+            event.listen(self.engine, "connect", _pragma_sqlite)
+        # Non-destruktif: indeks UNIQUE yang terhalang baris kembar dilaporkan, bukan di-dedup diam-diam
+        self.langkah_migrasi = migrasi_skema(self.engine)
+        for langkah in self.langkah_migrasi:
+            if langkah.startswith("LEWATI INDEX"):
+                print(f"[!] Katalog AHSP: {langkah}")
+
+    # ==========================================
+    # 1. TULIS SNAPSHOT
+    # ==========================================
+    def simpan_snapshot(self, stream_baris, label, sumber=None, basis_versi=None, aktifkan=True, batch_size=1000,
+                        komposisi=None, wilayah=''):
+        """
+        Menulis snapshot katalog baru dalam SATU transaksi.
+        stream_baris: iterable tuple (uraian, satuan, harga, kategori[, kode_analisa]) - format KOLOM_MASTER_AHSP,
+                      kode_analisa kosong -> kode sintetis AUTO-n.
+        basis_versi: id versi yang disalin lebih dulu (untuk upload yang menambah, bukan mengganti).
+        komposisi: list baris libs_ahsp_parser.parse_ahsp_sheet (rincian Tenaga/Bahan/Peralatan + baris 'Utama').
+                   Dibaca SETELAH stream_baris habis, jadi boleh diisi oleh generator stream_baris.
+        Output: Dictionary {id_versi, jumlah_item, jumlah_baru, jumlah_komposisi} atau {"error": ...}.
+        """
+        try:
+            with self.engine.begin() as conn:
+                id_versi = conn.execute(
+                    insert(KatalogVersi).values(label=str(label)[:255], sumber=sumber, dibuat=datetime.now(), aktif=False)
+                ).inserted_primary_key[0]
+
+                jumlah_basis = 0
+                if basis_versi is not None:
+                    kolom_salin = ('kode_analisa', 'uraian_pekerjaan', 'satuan', 'divisi_pupr', 'kategori', 'harga_satuan')
+                    sumber_salin = select(
+                        *[getattr(AHSPHeader, k) for k in kolom_salin], literal(id_versi)
+                    ).where(AHSPHeader.id_versi == basis_versi).order_by(AHSPHeader.id_ahsp)
+                    jumlah_basis = conn.execute(
+                        insert(AHSPHeader).from_select(list(kolom_salin) + ['id_versi'], sumber_salin)
+                    ).rowcount
+                    if jumlah_basis:
+                        self._salin_komposisi(conn, basis_versi, id_versi, batch_size)
+
+                jumlah_baru = 0
+                batch = []
+                for baris in stream_baris:
+                    uraian, satuan, harga, kategori = baris[:4]
+                    kode = baris[4] if len(baris) > 4 else None
+                    jumlah_baru += 1
+                    batch.append({
+                        'kode_analisa': str(kode)[:50] if kode else f"AUTO-{jumlah_basis + jumlah_baru}",
+                        'uraian_pekerjaan': uraian,
+                        'satuan': satuan or "-",
+                        'harga_satuan': harga,
+                        'kategori': kategori,
+                        'id_versi': id_versi,
+                    })
+                    if len(batch) >= batch_size:
+                        conn.execute(insert(AHSPHeader), batch)
+                        batch = []
+                if batch:
+                    conn.execute(insert(AHSPHeader), batch)
+
+                jumlah_komposisi = 0
+                if komposisi:
+                    tambahan, jumlah_komposisi = self._tulis_analisa(
+                        conn, id_versi, komposisi, wilayah, jumlah_basis + jumlah_baru, batch_size
+                    )
+                    jumlah_baru += tambahan
+
+                if jumlah_baru == 0:
+                    raise _SnapshotKosong()
+
+                jumlah_item = jumlah_basis + jumlah_baru
+                conn.execute(update(KatalogVersi).where(KatalogVersi.id_versi == id_versi).values(jumlah_item=jumlah_item))
+                if aktifkan:
+                    self._set_aktif(conn, id_versi)
+
+            return {"id_versi": id_versi, "jumlah_item": jumlah_item, "jumlah_baru": jumlah_baru,
+                    "jumlah_komposisi": jumlah_komposisi}
+        except _SnapshotKosong:
+            return {"error": "Tidak ada baris AHSP yang valid untuk disimpan."}
+        except Exception as e:
+            return {"error": str(e)}
+
+    @staticmethod
+    def _salin_komposisi(conn, basis_versi, id_versi, batch_size):
+        """Komposisi versi basis ikut disalin ke header salinannya (urutan id_ahsp sama)"""
+        def id_header(versi):
+            return conn.execute(
+                select(AHSPHeader.id_ahsp).where(AHSPHeader.id_versi == versi).order_by(AHSPHeader.id_ahsp)
+            ).scalars().all()
+
+        peta_id = dict(zip(id_header(basis_versi), id_header(id_versi)))
+        rows = conn.execute(
+            select(AHSPKomposisi.id_ahsp, AHSPKomposisi.tipe_sumber_daya, AHSPKomposisi.id_sumber_daya, AHSPKomposisi.koefisien)
+            .join(AHSPHeader, AHSPHeader.id_ahsp == AHSPKomposisi.id_ahsp).where(AHSPHeader.id_versi == basis_versi)
+        ).all()
+        batch = [
+            {'id_ahsp': peta_id[id_ahsp], 'tipe_sumber_daya': tipe, 'id_sumber_daya': id_sd, 'koefisien': koef}
+            for id_ahsp, tipe, id_sd, koef in rows
+        ]
+        for i in range(0, len(batch), batch_size):
+            conn.execute(insert(AHSPKomposisi), batch[i:i + batch_size])
+
+    def _tulis_analisa(self, conn, id_versi, komposisi, wilayah, nomor_awal, batch_size):
+        """
+        Menulis hasil bedah sheet analisa ke tb_rel_ahsp_komposisi:
+          1. rincian dikelompokkan ke baris 'Utama' analisanya (kode & kategori sama, rincian selalu di atasnya),
+          2. header versi ini dengan kode analisa yang sama dipakai ulang (dari sheet HSP), jika belum ada dibuat,
+          3. komponen di-resolve ke master HSD (baris baru diisi harga dari analisa, harga HSD lama tidak ditimpa).
+        Return: (jumlah header baru, jumlah baris komposisi).
+        """
+        analisa, rincian = [], []
+        for r in komposisi:
+            jenis = r.get('jenis_komponen')
+            if jenis == 'Utama':
+                kunci = (r.get('kode_ahsp'), r.get('kategori'))
+                analisa.append((r, [a for a in rincian if (a.get('kode_ahsp'), a.get('kategori')) == kunci]))
+                rincian = []
+            elif jenis in PETA_SUMBER_DAYA and r.get('koefisien'):
+                rincian.append(r)
+
+        peta_kode = dict(conn.execute(
+            select(AHSPHeader.kode_analisa, func.min(AHSPHeader.id_ahsp))
+            .where(AHSPHeader.id_versi == id_versi).group_by(AHSPHeader.kode_analisa)
+        ).all())
+        header_baru, dipakai_ulang, id_analisa = 0, set(), {}
+        for induk, anak in analisa:
+            kode = str(induk.get('kode_ahsp') or '')
+            sintetis = kode in ('', '-') or kode.startswith('AUTO-')
+            id_ahsp = None if sintetis else peta_kode.get(kode)
+            if id_ahsp is None:
+                header_baru += 1
+                id_ahsp = conn.execute(insert(AHSPHeader).values(
+                    kode_analisa=f"AUTO-{nomor_awal + header_baru}" if sintetis else kode[:50],
+                    uraian_pekerjaan=induk['uraian_pekerjaan'], satuan=induk.get('satuan') or "-",
+                    harga_satuan=induk.get('harga_satuan'), kategori=induk.get('kategori'), id_versi=id_versi,
+                )).inserted_primary_key[0]
+                if not sintetis:
+                    peta_kode[kode] = id_ahsp
+            else:
+                dipakai_ulang.add(id_ahsp)
+            # Analisa dengan kode sama di sheet lain: yang pertama yang dipakai
+            id_analisa.setdefault(id_ahsp, anak)
+
+        id_sumber_daya = self._resolve_sumber_daya(conn, id_analisa.values(), wilayah, batch_size)
+
+        kumpul = {}
+        for id_ahsp, anak in id_analisa.items():
+            for r in anak:
+                tipe = PETA_SUMBER_DAYA[r['jenis_komponen']][0]
+                kunci = (id_ahsp, tipe, id_sumber_daya[(tipe, *_kunci_sumber_daya(r))])
+                # Komponen kembar dalam 1 analisa -> koefisien dijumlah (kunci unik uq_komposisi_item)
+                kumpul[kunci] = kumpul.get(kunci, 0.0) + float(r['koefisien'])
+
+        # Header salinan basis_versi yang dianalisa ulang: komposisi lamanya diganti
+        if dipakai_ulang:
+            conn.execute(delete(AHSPKomposisi).where(AHSPKomposisi.id_ahsp.in_(dipakai_ulang & set(id_analisa))))
+        batch = [
+            {'id_ahsp': id_ahsp, 'tipe_sumber_daya': tipe, 'id_sumber_daya': id_sd, 'koefisien': koef}
+            for (id_ahsp, tipe, id_sd), koef in kumpul.items()
+        ]
+        for i in range(0, len(batch), batch_size):
+            conn.execute(insert(AHSPKomposisi), batch[i:i + batch_size])
+        return header_baru, len(batch)
+
+    @staticmethod
+    def _resolve_sumber_daya(conn, daftar_rincian, wilayah, batch_size, ukuran_chunk=500):
+        """Return: {(tipe, uraian, satuan): id master HSD} untuk semua komponen rincian"""
+        if conn.dialect.name == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as insert_dialek
+        else:
+            from sqlalchemy.dialects.sqlite import insert as insert_dialek
+
+        hasil = {}
+        for jenis, (tipe, model, kolom_id, kolom_uraian) in PETA_SUMBER_DAYA.items():
+            item = {}
+            for anak in daftar_rincian:
+                for r in anak:
+                    if r['jenis_komponen'] == jenis:
+                        item.setdefault(_kunci_sumber_daya(r), r.get('harga_satuan') or 0)
+            if not item:
+                continue
+
+            stmt = insert_dialek(model.__table__).on_conflict_do_nothing(
+                index_elements=['wilayah', kolom_uraian, 'satuan']
+            )
+            baris = [{kolom_uraian: u, 'satuan': s, 'harga_dasar': h, 'wilayah': wilayah} for (u, s), h in item.items()]
+            for i in range(0, len(baris), batch_size):
+                conn.execute(stmt, baris[i:i + batch_size])
+
+            daftar_uraian = list({u for u, _ in item})
+            for i in range(0, len(daftar_uraian), ukuran_chunk):
+                rows = conn.execute(
+                    select(getattr(model, kolom_id), getattr(model, kolom_uraian), model.satuan)
+                    .where(model.wilayah == wilayah, getattr(model, kolom_uraian).in_(daftar_uraian[i:i + ukuran_chunk]))
+                ).all()
+                for id_sd, uraian, satuan in rows:
+                    hasil[(tipe, uraian, satuan)] = id_sd
+        return hasil
+
+    @staticmethod
+    def _set_aktif(conn, id_versi):
+        conn.execute(update(KatalogVersi).where(KatalogVersi.aktif.is_(True)).values(aktif=False))
+        conn.execute(update(KatalogVersi).where(KatalogVersi.id_versi == id_versi).values(aktif=True))
+
+    def aktifkan_versi(self, id_versi):
+        """Kembali ke snapshot lama (misal upload terakhir ternyata salah file)"""
+        with self.engine.begin() as conn:
+            ada = conn.execute(select(KatalogVersi.id_versi).where(KatalogVersi.id_versi == id_versi)).first()
+            if ada is None:
+                return False
+            self._set_aktif(conn, id_versi)
+        return True
+
+    def pangkas_versi(self, simpan_terakhir=5):
+        """Menghapus snapshot lama (versi aktif selalu dipertahankan). Return: jumlah versi dihapus."""
+        with self.engine.begin() as conn:
+            dipertahankan = select(KatalogVersi.id_versi).order_by(KatalogVersi.id_versi.desc()).limit(simpan_terakhir)
+            dihapus = [r[0] for r in conn.execute(
+                select(KatalogVersi.id_versi).where(
+                    KatalogVersi.aktif.is_(False), KatalogVersi.id_versi.not_in(dipertahankan.scalar_subquery())
+                )
+            )]
+            if dihapus:
+                header_dihapus = select(AHSPHeader.id_ahsp).where(AHSPHeader.id_versi.in_(dihapus))
+                conn.execute(delete(AHSPKomposisi).where(AHSPKomposisi.id_ahsp.in_(header_dihapus.scalar_subquery())))
+                conn.execute(delete(AHSPHeader).where(AHSPHeader.id_versi.in_(dihapus)))
+                conn.execute(delete(KatalogVersi).where(KatalogVersi.id_versi.in_(dihapus)))
+        return len(dihapus)
+
+    # ==========================================
+    # 2. QUERY API (HANYA KOLOM & BARIS YANG DIPERLUKAN)
+    # ==========================================
+    def versi_aktif(self):
+        """Metadata snapshot aktif (dict) atau None jika katalog masih kosong"""
+        with self.engine.connect() as conn:
+            baris = conn.execute(select(KatalogVersi).where(KatalogVersi.aktif.is_(True))).mappings().first()
+        return dict(baris) if baris else None
+
+    def daftar_versi(self):
+        with self.engine.connect() as conn:
+            return pd.read_sql(select(KatalogVersi).order_by(KatalogVersi.id_versi.desc()), conn)
+
+    def _id_versi(self, conn, id_versi):
+        if id_versi is not None:
+            return id_versi
+        return conn.execute(select(KatalogVersi.id_versi).where(KatalogVersi.aktif.is_(True))).scalar()
+
+    def ambil_katalog(self, kolom=KOLOM_KATALOG_DEFAULT, kategori=None, kata_kunci=None, limit=None, offset=0,
+                      id_versi=None, label_tampilan=True):
+        """
+        Mengambil sebagian katalog sebagai DataFrame.
+        kolom: subset kolom tb_ahsp_header. kategori/kata_kunci: filter baris.
+        limit/offset: paginasi untuk tabel besar. label_tampilan: ganti nama kolom ke format layar RAB.
+        """
+        kolom = [k for k in kolom if k in AHSPHeader.__table__.columns]
+        with self.engine.connect() as conn:
+            versi = self._id_versi(conn, id_versi)
+            if versi is None:
+                df = pd.DataFrame(columns=kolom)
+            else:
+                query = select(*[getattr(AHSPHeader, k) for k in kolom]).where(AHSPHeader.id_versi == versi)
+                if kategori is not None:
+                    daftar = [kategori] if isinstance(kategori, str) else list(kategori)
+                    query = query.where(AHSPHeader.kategori.in_(daftar))
+                if kata_kunci:
+                    query = query.where(AHSPHeader.uraian_pekerjaan.ilike(f"%{kata_kunci}%"))
+                query = query.order_by(AHSPHeader.id_ahsp).offset(offset)
+                if limit is not None:
+                    query = query.limit(limit)
+                df = pd.read_sql(query, conn)
+
+        if label_tampilan:
+            df = df.rename(columns=NAMA_KOLOM_TAMPILAN)
+        return df
+
+    def daftar_kategori(self, id_versi=None):
+        """Kategori + jumlah item per kategori (untuk filter di UI)"""
+        with self.engine.connect() as conn:
+            versi = self._id_versi(conn, id_versi)
+            rows = conn.execute(
+                select(AHSPHeader.kategori, func.count()).where(AHSPHeader.id_versi == versi)
+                .group_by(AHSPHeader.kategori).order_by(AHSPHeader.kategori)
+            ).all()
+        return {k: n for k, n in rows}
+
+    def jumlah_item(self, id_versi=None):
+        with self.engine.connect() as conn:
+            versi = self._id_versi(conn, id_versi)
+            if versi is None:
+                return 0
+            return conn.execute(select(func.count()).where(AHSPHeader.id_versi == versi)).scalar()
+
+    def cari_harga(self, daftar_uraian, id_versi=None, ukuran_chunk=500):
+        """
+        Harga satuan untuk uraian tertentu saja: {uraian: (satuan, harga)}.
+        Uraian kembar dalam 1 versi -> baris pertama yang dipakai.
+        """
+        unik = list(dict.fromkeys(str(u) for u in daftar_uraian))
+        hasil = {}
+        with self.engine.connect() as conn:
+            versi = self._id_versi(conn, id_versi)
+            if versi is None:
+                return hasil
+            for i in range(0, len(unik), ukuran_chunk):
+                rows = conn.execute(
+                    select(AHSPHeader.uraian_pekerjaan, AHSPHeader.satuan, AHSPHeader.harga_satuan)
+                    .where(AHSPHeader.id_versi == versi, AHSPHeader.uraian_pekerjaan.in_(unik[i:i + ukuran_chunk]))
+                    .order_by(AHSPHeader.id_ahsp)
+                ).all()
+                for uraian, satuan, harga in rows:
+                    hasil.setdefault(uraian, (satuan, harga))
+        return hasil
+
+
+    def ambil_komposisi(self, kode_analisa, id_versi=None):
+        """
+        Rincian 1 analisa (versi aktif): DataFrame [Tipe, Uraian, Satuan, Koefisien, Harga Dasar].
+        Kosong jika analisa hanya berasal dari sheet HSP (tanpa sheet analisa).
+        """
+        baris = []
+        with self.engine.connect() as conn:
+            versi = self._id_versi(conn, id_versi)
+            id_ahsp = conn.execute(
+                select(func.min(AHSPHeader.id_ahsp)).where(AHSPHeader.id_versi == versi, AHSPHeader.kode_analisa == kode_analisa)
+            ).scalar()
+            for tipe, model, kolom_id, kolom_uraian in PETA_SUMBER_DAYA.values():
+                baris.extend(conn.execute(
+                    select(literal(tipe), getattr(model, kolom_uraian), model.satuan, AHSPKomposisi.koefisien, model.harga_dasar)
+                    .join(model, getattr(model, kolom_id) == AHSPKomposisi.id_sumber_daya)
+                    .where(AHSPKomposisi.id_ahsp == id_ahsp, AHSPKomposisi.tipe_sumber_daya == tipe)
+                    .order_by(AHSPKomposisi.id_rel)
+                ).all())
+        df = pd.DataFrame(baris, columns=['Tipe', 'Uraian', 'Satuan', 'Koefisien', 'Harga Dasar'])
+        return df.astype({'Koefisien': float, 'Harga Dasar': float})
+
+
+def _kunci_sumber_daya(r):
+    """(uraian, satuan) komponen sesuai panjang kolom master HSD"""
+    return str(r['uraian_pekerjaan'])[:255], str(r.get('satuan') or "-")[:20]
+
+
+class _SnapshotKosong(Exception):
+    """Dipakai internal untuk membatalkan transaksi snapshot tanpa baris."""
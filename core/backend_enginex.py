@@ -2,23 +2,149 @@ import sqlite3
 import pandas as pd
 import os
 import json
+import re
 from datetime import datetime
 import io
+import time
+import weakref
+import threading
+import itertools
+import hashlib
+import gzip
+import zlib
+
+try:
+    from core.ahsp_catalog import Katalog_AHSP_Engine, KOLOM_KATALOG_DEFAULT
+except ImportError:
+    from ahsp_catalog import Katalog_AHSP_Engine, KOLOM_KATALOG_DEFAULT
+try:
+    from modules.cost.libs_ahsp_parser import parse_ahsp_sheet
+except ImportError:
+    from libs_ahsp_parser import parse_ahsp_sheet
+
+# Skema standar baris master_ahsp (dipakai semua jalur ingest Excel & VIEW master_ahsp)
+KOLOM_MASTER_AHSP = ('URAIAN_PEKERJAAN', 'SATUAN', 'HARGA_SATUAN', 'KATEGORI_SHEET')
+# Kolom riwayat_konsultasi yang ikut backup (id dibuang agar Auto-Increment baru bekerja)
+KOLOM_BACKUP_CHAT = ('tanggal', 'project_name', 'gem_name', 'role', 'content', 'content_hash')
+# Jumlah snapshot katalog AHSP terakhir yang disimpan; snapshot lebih lama dipangkas setiap upload
+SIMPAN_VERSI_KATALOG = 5
+
+
+def _hash_konten(tanggal, project, gem, role, content):
+    """Sidik jari 1 pesan chat (dipakai merge backup agar pesan yang sama tidak dobel)"""
+    teks = "\x1f".join("" if v is None else str(v) for v in (tanggal, project, gem, role, content))
+    return hashlib.sha1(teks.encode("utf-8")).hexdigest()
+
+
+def _tulis_antrean_chat(pool, antrean, lock):
+    """
+    Commit semua pesan di antrean (list, diubah di tempat) dalam SATU transaksi.
+    Fungsi modul (bukan method) agar bisa dipakai weakref.finalize tanpa menahan backend tetap hidup.
+    """
+    with lock:
+        if not antrean or pool is None:
+            return 0
+        batch = antrean[:]
+        del antrean[:]
+        try:
+            conn = pool.koneksi()
+            with conn:
+                conn.executemany(
+                    f"INSERT INTO riwayat_konsultasi ({', '.join(KOLOM_BACKUP_CHAT)}) VALUES (?, ?, ?, ?, ?, ?)",
+                    batch
+                )
+        except Exception as e:
+            # Kembalikan ke antrean agar tidak hilang, dicoba lagi pada flush berikutnya
+            antrean[:0] = batch
+            print(f"❌ Error Simpan Chat: {e}")
+            return 0
+        return len(batch)
+
+
+class Pool_Koneksi_Thread:
+    """
+    Koneksi SQLite per-thread (setiap thread Streamlit memakai koneksinya sendiri).
+    Koneksi milik thread yang sudah selesai dikembalikan ke pool kecil untuk dipakai ulang,
+    sehingga tidak ada satu koneksi yang diperebutkan semua sesi.
+    """
+    def __init__(self, db_path, ukuran=8):
+        self.db_path = db_path
+        self.ukuran = ukuran
+        self._lokal = threading.local()
+        self._cadangan = []
+        self._semua = set()
+        self._lock = threading.Lock()
+
+    def _buka(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=10000")
+        return conn
+
+    def _kembalikan(self, conn):
+        """Dipanggil saat data thread-local dibuang (thread selesai)."""
+        with self._lock:
+            if conn in self._semua and len(self._cadangan) < self.ukuran:
+                self._cadangan.append(conn)
+                return
+            self._semua.discard(conn)
+        conn.close()
+
+    def koneksi(self):
+        pemegang = getattr(self._lokal, 'pemegang', None)
+        if pemegang is not None:
+            return pemegang.conn
+        with self._lock:
+            conn = self._cadangan.pop() if self._cadangan else None
+        if conn is None:
+            conn = self._buka()
+            with self._lock: self._semua.add(conn)
+        pemegang = _Pemegang_Koneksi(conn)
+        weakref.finalize(pemegang, self._kembalikan, conn)
+        self._lokal.pemegang = pemegang
+        return conn
+
+    def tutup_semua(self):
+        with self._lock:
+            daftar = list(self._semua)
+            self._semua.clear()
+            self._cadangan.clear()
+        for conn in daftar:
+            try: conn.close()
+            except Exception: pass
+        self._lokal = threading.local()
+
+
+class _Pemegang_Koneksi:
+    __slots__ = ('conn', '__weakref__')
+    def __init__(self, conn):
+        self.conn = conn
+
 
 class EnginexBackend:
-    def __init__(self, db_path='enginex_core.db'):
+    def __init__(self, db_path='enginex_core.db', batch_commit=32, maks_tunda_detik=2.0,
+                 simpan_versi_katalog=SIMPAN_VERSI_KATALOG):
         """
         Inisialisasi Backend Database.
         Mendukung sistem file 'Ephemeral' di Streamlit Cloud dengan failover ke /tmp
+        batch_commit / maks_tunda_detik: pesan chat ditampung lalu di-commit sekaligus.
+        simpan_versi_katalog: snapshot katalog AHSP yang disimpan (None = tidak pernah dipangkas).
         """
         self.db_path = db_path
-        self.conn = None
-        self.cursor = None
+        self.simpan_versi_katalog = simpan_versi_katalog
+        self.pool = None
+        self.batch_commit = batch_commit
+        self.maks_tunda_detik = maks_tunda_detik
+        self._antrean_chat = []
+        self._waktu_antrean = 0.0
+        self._lock_chat = threading.Lock()
+        self._timer_flush = None
         
         # Coba koneksi ke Database di lokasi utama
         try:
             self._connect_db(self.db_path)
-        except sqlite3.OperationalError:
+        except (sqlite3.OperationalError, OSError):
             # Jika gagal (biasanya karena permission Read-Only di Cloud), pindah ke /tmp
             print("⚠️ Read-Only Filesystem terdeteksi. Beralih ke folder sementara (/tmp)...")
             temp_path = os.path.join('/tmp', os.path.basename(db_path))
@@ -26,61 +152,176 @@ class EnginexBackend:
             self.db_path = temp_path
 
         self.init_db()
+        # Pesan yang masih di antrean tetap tersimpan saat backend dibuang (sesi berakhir) atau
+        # proses berhenti normal. weakref.finalize (bukan atexit per backend) tidak menahan backend lama hidup.
+        self._finalizer = weakref.finalize(self, _tulis_antrean_chat, self.pool, self._antrean_chat, self._lock_chat)
 
     def _connect_db(self, path):
-        """Helper internal untuk melakukan koneksi ke SQLite"""
+        """Helper internal untuk melakukan koneksi ke SQLite (WAL, koneksi per-thread)"""
         # Pastikan folder tujuan ada
         folder = os.path.dirname(path)
         if folder and not os.path.exists(folder):
             os.makedirs(folder, exist_ok=True)
             
-        self.conn = sqlite3.connect(path, check_same_thread=False)
-        self.cursor = self.conn.cursor()
+        pool = Pool_Koneksi_Thread(path)
+        pool.koneksi()
+        self.pool = pool
+
+    @property
+    def conn(self):
+        """Koneksi milik thread yang sedang berjalan"""
+        return self.pool.koneksi() if self.pool else None
+
+    @property
+    def cursor(self):
+        return self.conn.cursor()
 
     def init_db(self):
-        """Membuat tabel riwayat_konsultasi jika belum ada"""
+        """Membuat tabel riwayat_konsultasi (+ indeks proyek/ahli) jika belum ada"""
         try:
-            self.cursor.execute('''
-                CREATE TABLE IF NOT EXISTS riwayat_konsultasi (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    tanggal TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    project_name TEXT,
-                    gem_name TEXT,
-                    role TEXT,
-                    content TEXT
+            with self.conn:
+                self.conn.execute('''
+                    CREATE TABLE IF NOT EXISTS riwayat_konsultasi (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        tanggal TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        project_name TEXT,
+                        gem_name TEXT,
+                        role TEXT,
+                        content TEXT,
+                        content_hash TEXT
+                    )
+                ''')
+                # Migrasi database lama yang belum punya kolom content_hash
+                kolom_ada = [r[1] for r in self.conn.execute("PRAGMA table_info(riwayat_konsultasi)").fetchall()]
+                if 'content_hash' not in kolom_ada:
+                    self.conn.execute("ALTER TABLE riwayat_konsultasi ADD COLUMN content_hash TEXT")
+                # Indeks komposit: load history per proyek & ahli tanpa full scan
+                self.conn.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_riwayat_proyek_gem "
+                    "ON riwayat_konsultasi (project_name, gem_name, id)"
                 )
-            ''')
-            self.conn.commit()
+                self.conn.execute("CREATE INDEX IF NOT EXISTS idx_riwayat_hash ON riwayat_konsultasi (content_hash)")
+
+                # Tabel dokumen proyek (teks hasil ekstraksi PDF/DXF yang diupload)
+                self.conn.execute('''
+                    CREATE TABLE IF NOT EXISTS dokumen_proyek (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        tanggal TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        project_name TEXT,
+                        nama_file TEXT,
+                        jenis TEXT,
+                        bagian INTEGER,
+                        teks TEXT
+                    )
+                ''')
+                self.conn.execute("CREATE INDEX IF NOT EXISTS idx_dokumen_proyek_file ON dokumen_proyek (project_name, nama_file)")
+            self._init_fts()
         except Exception as e:
             print(f"❌ Error Init Database: {e}")
 
+    def _init_fts(self):
+        """
+        Indeks FTS5 (external content) untuk riwayat chat & dokumen proyek.
+        Trigger menjaga indeks tetap sinkron; saat pertama dibuat, data lama di-rebuild sekali.
+        """
+        try:
+            with self.conn:
+                for tabel_fts, tabel_sumber, kolom in (
+                    ("riwayat_fts", "riwayat_konsultasi", ("content",)),
+                    ("dokumen_fts", "dokumen_proyek", ("nama_file", "teks")),
+                ):
+                    sudah_ada = self.conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (tabel_fts,)).fetchone()
+                    daftar = ", ".join(kolom)
+                    baru = ", ".join(f"new.{k}" for k in kolom)
+                    lama = ", ".join(f"old.{k}" for k in kolom)
+                    self.conn.execute(
+                        f"CREATE VIRTUAL TABLE IF NOT EXISTS {tabel_fts} USING fts5({daftar}, "
+                        f"content='{tabel_sumber}', content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+                    )
+                    self.conn.execute(
+                        f"CREATE TRIGGER IF NOT EXISTS {tabel_fts}_ai AFTER INSERT ON {tabel_sumber} BEGIN "
+                        f"INSERT INTO {tabel_fts}(rowid, {daftar}) VALUES (new.id, {baru}); END"
+                    )
+                    self.conn.execute(
+                        f"CREATE TRIGGER IF NOT EXISTS {tabel_fts}_ad AFTER DELETE ON {tabel_sumber} BEGIN "
+                        f"INSERT INTO {tabel_fts}({tabel_fts}, rowid, {daftar}) VALUES ('delete', old.id, {lama}); END"
+                    )
+                    self.conn.execute(
+                        f"CREATE TRIGGER IF NOT EXISTS {tabel_fts}_au AFTER UPDATE OF {daftar} ON {tabel_sumber} BEGIN "
+                        f"INSERT INTO {tabel_fts}({tabel_fts}, rowid, {daftar}) VALUES ('delete', old.id, {lama}); "
+                        f"INSERT INTO {tabel_fts}(rowid, {daftar}) VALUES (new.id, {baru}); END"
+                    )
+                    if not sudah_ada:
+                        self.conn.execute(f"INSERT INTO {tabel_fts}({tabel_fts}) VALUES ('rebuild')")
+        except sqlite3.OperationalError as e:
+            # SQLite tanpa modul FTS5: fitur pencarian dimatikan, fitur lain tetap jalan
+            print(f"⚠️ FTS5 tidak tersedia, pencarian riwayat dinonaktifkan: {e}")
+
     # ==========================================
     # FITUR CHAT (CRUD)
     # ==========================================
     
     def simpan_chat(self, project, gem, role, text):
-        """Menyimpan pesan baru ke database"""
+        """
+        Menyimpan pesan baru ke database.
+        Pesan ditampung dan di-commit per batch (batch_commit pesan / maks_tunda_detik),
+        setiap pembacaan history selalu mem-flush antrean lebih dulu.
+        Timer dijadwalkan saat pesan pertama masuk antrean, jadi batas maks_tunda_detik tetap
+        berlaku walau tidak ada pesan berikutnya.
+        """
         try:
             # Timestamp manual agar konsisten
-            waktu_sekarang = datetime.now()
+            waktu_sekarang = datetime.now().isoformat(" ")
             
-            self.cursor.execute(
-                "INSERT INTO riwayat_konsultasi (tanggal, project_name, gem_name, role, content) VALUES (?, ?, ?, ?, ?)", 
-                (waktu_sekarang, project, gem, role, text)
-            )
-            self.conn.commit()
+            with self._lock_chat:
+                if not self._antrean_chat:
+                    self._waktu_antrean = time.monotonic()
+                    self._jadwalkan_flush()
+                nilai = (waktu_sekarang, project, gem, role, text)
+                self._antrean_chat.append(nilai + (_hash_konten(*nilai),))
+                penuh = len(self._antrean_chat) >= self.batch_commit
+                basi = time.monotonic() - self._waktu_antrean >= self.maks_tunda_detik
+            if penuh or basi:
+                self.flush_chat()
         except Exception as e: 
             print(f"❌ Error Simpan Chat: {e}")
 
-    def get_chat_history(self, project, gem):
-        """Mengambil riwayat chat berdasarkan Proyek & Ahli"""
+    def _jadwalkan_flush(self):
+        """Timer sekali jalan (daemon) yang mem-flush antrean setelah maks_tunda_detik"""
+        timer = threading.Timer(self.maks_tunda_detik, self.flush_chat)
+        timer.daemon = True
+        timer.start()
+        self._timer_flush = timer
+
+    def flush_chat(self):
+        """Commit semua pesan di antrean dalam SATU transaksi"""
+        timer = self._timer_flush
+        if timer is not None and timer is not threading.current_thread():
+            timer.cancel()
+        return _tulis_antrean_chat(self.pool, self._antrean_chat, self._lock_chat)
+
+    def get_chat_history(self, project, gem, limit=None, sebelum_id=None):
+        """
+        Mengambil riwayat chat berdasarkan Proyek & Ahli (urut lama -> baru).
+        limit: hanya N pesan terakhir. sebelum_id: halaman sebelumnya (id pesan tertua yang sudah tampil).
+        """
         try:
-            query = "SELECT role, content FROM riwayat_konsultasi WHERE project_name = ? AND gem_name = ? ORDER BY id ASC"
-            # Menggunakan pandas untuk keamanan query & kemudahan format
-            df = pd.read_sql(query, self.conn, params=(project, gem))
-            
-            # Konversi ke format list of dicts yang diminta Streamlit
-            return df.to_dict(orient='records')
+            self.flush_chat()
+            query = "SELECT id, role, content FROM riwayat_konsultasi WHERE project_name = ? AND gem_name = ?"
+            params = [project, gem]
+            if sebelum_id is not None:
+                query += " AND id < ?"
+                params.append(int(sebelum_id))
+
+            if limit is None:
+                rows = self.conn.execute(query + " ORDER BY id ASC", params).fetchall()
+            else:
+                # Ambil dari yang terbaru lewat indeks, lalu dibalik
+                rows = self.conn.execute(query + " ORDER BY id DESC LIMIT ?", params + [int(limit)]).fetchall()
+                rows.reverse()
+
+            # Format list of dicts yang diminta Streamlit
+            return [{"id": i, "role": role, "content": content} for i, role, content in rows]
         except Exception as e:
             print(f"⚠️ Gagal load history: {e}")
             return []
@@ -88,28 +329,118 @@ class EnginexBackend:
     def clear_chat(self, project, gem):
         """Menghapus chat spesifik (Reset Sesi)"""
         try:
-            self.cursor.execute("DELETE FROM riwayat_konsultasi WHERE project_name = ? AND gem_name = ?", (project, gem))
-            self.conn.commit()
+            self.flush_chat()
+            with self.conn:
+                self.conn.execute("DELETE FROM riwayat_konsultasi WHERE project_name = ? AND gem_name = ?", (project, gem))
         except Exception as e:
             print(f"❌ Error Clear Chat: {e}")
 
     def daftar_proyek(self):
         """List semua nama proyek unik yang ada di database"""
         try:
-            df = pd.read_sql("SELECT DISTINCT project_name FROM riwayat_konsultasi", self.conn)
-            if not df.empty:
-                return df['project_name'].tolist()
-            return []
+            self.flush_chat()
+            rows = self.conn.execute("SELECT DISTINCT project_name FROM riwayat_konsultasi").fetchall()
+            return [r[0] for r in rows]
         except: 
             return []
 
+    # ==========================================
+    # FITUR PENCARIAN (FTS5) RIWAYAT & DOKUMEN
+    # ==========================================
+
+    def indeks_dokumen(self, project, nama_file, teks, jenis=None, ukuran_bagian=4000):
+        """
+        Menyimpan teks hasil ekstraksi dokumen (PDF/DXF) agar ikut dicari oleh search().
+        Teks dipecah per bagian (~4000 karakter) supaya ranking & snippet tetap relevan.
+        Upload ulang file yang sama menimpa indeks lamanya. Return: jumlah bagian.
+        """
+        teks = (teks or "").strip()
+        jenis = jenis or os.path.splitext(str(nama_file))[1].lstrip(".").lower()
+        bagian, buffer, panjang = [], [], 0
+        for paragraf in teks.split("\n"):
+            buffer.append(paragraf)
+            panjang += len(paragraf) + 1
+            if panjang >= ukuran_bagian:
+                bagian.append("\n".join(buffer))
+                buffer, panjang = [], 0
+        if any(p.strip() for p in buffer):
+            bagian.append("\n".join(buffer))
+
+        try:
+            with self.conn:
+                self.conn.execute("DELETE FROM dokumen_proyek WHERE project_name = ? AND nama_file = ?", (project, nama_file))
+                self.conn.executemany(
+                    "INSERT INTO dokumen_proyek (tanggal, project_name, nama_file, jenis, bagian, teks) VALUES (?, ?, ?, ?, ?, ?)",
+                    [(datetime.now().isoformat(" "), project, nama_file, jenis, i, b) for i, b in enumerate(bagian)]
+                )
+            return len(bagian)
+        except Exception as e:
+            print(f"❌ Error Indeks Dokumen: {e}")
+            return 0
+
+    @staticmethod
+    def _query_fts(query):
+        """Teks bebas user -> query FTS5 aman (tiap kata di-quote, kata terakhir prefix)"""
+        kata = re.findall(r"\w+", str(query or ""))
+        if not kata:
+            return None
+        return " ".join(f'"{k}"' for k in kata[:-1]) + (" " if len(kata) > 1 else "") + f'"{kata[-1]}"*'
+
+    def search(self, query, project=None, limit=20, sumber=("chat", "dokumen")):
+        """
+        Pencarian full-text (FTS5, ranking bm25) di riwayat konsultasi & dokumen proyek.
+        project=None berarti lintas semua proyek.
+        Output: list of dict urut relevansi, snippet kata kunci ditandai **tebal**.
+        """
+        q = self._query_fts(query)
+        if q is None:
+            return []
+
+        hasil = []
+        filter_proyek = " AND s.project_name = ?" if project else ""
+        try:
+            self.flush_chat()
+            if "chat" in sumber:
+                rows = self.conn.execute(
+                    "SELECT s.id, s.project_name, s.gem_name, s.role, s.tanggal, "
+                    "snippet(riwayat_fts, 0, '**', '**', '…', 16), bm25(riwayat_fts) "
+                    "FROM riwayat_fts JOIN riwayat_konsultasi s ON s.id = riwayat_fts.rowid "
+                    f"WHERE riwayat_fts MATCH ?{filter_proyek} ORDER BY bm25(riwayat_fts) LIMIT ?",
+                    [q] + ([project] if project else []) + [int(limit)]
+                ).fetchall()
+                hasil += [
+                    {"sumber": "chat", "id": i, "project_name": pr, "judul": gem, "role": role,
+                     "tanggal": tgl, "snippet": snip, "skor": -skor}
+                    for i, pr, gem, role, tgl, snip, skor in rows
+                ]
+            if "dokumen" in sumber:
+                rows = self.conn.execute(
+                    "SELECT s.id, s.project_name, s.nama_file, s.jenis, s.tanggal, "
+                    "snippet(dokumen_fts, 1, '**', '**', '…', 16), bm25(dokumen_fts) "
+                    "FROM dokumen_fts JOIN dokumen_proyek s ON s.id = dokumen_fts.rowid "
+                    f"WHERE dokumen_fts MATCH ?{filter_proyek} ORDER BY bm25(dokumen_fts) LIMIT ?",
+                    [q] + ([project] if project else []) + [int(limit)]
+                ).fetchall()
+                hasil += [
+                    {"sumber": "dokumen", "id": i, "project_name": pr, "judul": nama, "role": jenis,
+                     "tanggal": tgl, "snippet": snip, "skor": -skor}
+                    for i, pr, nama, jenis, tgl, snip, skor in rows
+                ]
+        except sqlite3.OperationalError as e:
+            print(f"⚠️ Gagal mencari: {e}")
+            return []
+
+        hasil.sort(key=lambda h: h["skor"], reverse=True)
+        return hasil[:int(limit)]
+
     # ==========================================
     # FITUR MANAJEMEN DATA (BACKUP & RESTORE)
     # ==========================================
 
     def export_data(self):
-        """Export semua data ke format JSON String untuk Backup"""
+        """Export semua data ke format JSON String untuk Backup (format lama, untuk data kecil)"""
         try:
+            self.flush_chat()
             df = pd.read_sql("SELECT * FROM riwayat_konsultasi", self.conn)
             # Konversi datetime ke string agar valid JSON
             if 'tanggal' in df.columns:
@@ -119,183 +450,445 @@ class EnginexBackend:
         except Exception as e: 
             return json.dumps({"error": str(e)})
 
-    def import_data(self, json_file):
-        """Restore data dari file JSON yang diupload user"""
+    def iter_export_ndjson_gz(self, batch_size=5000):
+        """
+        Backup streaming: baris riwayat_konsultasi dibaca per batch dari cursor dan
+        di-yield sebagai potongan bytes gzip berisi NDJSON (1 pesan = 1 baris JSON).
+        Memori konstan berapapun jumlah pesan; cocok untuk file/response streaming.
+        """
+        self.flush_chat()
+        kompresor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 = format gzip
+        cur = self.conn.execute(f"SELECT {', '.join(KOLOM_BACKUP_CHAT)} FROM riwayat_konsultasi ORDER BY id")
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows: break
+            teks = "".join(json.dumps(dict(zip(KOLOM_BACKUP_CHAT, r)), ensure_ascii=False, default=str) + "\n" for r in rows)
+            potongan = kompresor.compress(teks.encode("utf-8"))
+            if potongan: yield potongan
+        yield kompresor.flush()
+
+    def export_data_ke_file(self, path_output, batch_size=5000):
+        """Menulis backup NDJSON.gz ke file. Return: (status, pesan)"""
         try:
-            # 1. Baca File JSON
-            data = json.load(json_file)
-            
-            # 2. Validasi Data Kosong
-            if not data:
-                return False, "⚠️ File JSON kosong atau format salah."
+            with open(path_output, "wb") as f:
+                for potongan in self.iter_export_ndjson_gz(batch_size):
+                    f.write(potongan)
+            return True, f"✅ Backup tersimpan: {path_output} ({os.path.getsize(path_output) / 1e6:.1f} MB)"
+        except Exception as e:
+            return False, f"❌ Gagal Backup: {str(e)}"
+
+    @staticmethod
+    def _iter_baris_backup(sumber):
+        """
+        Parser inkremental file backup: NDJSON (.gz atau polos) dibaca baris demi baris.
+        Backup format lama (JSON array hasil export_data) tetap didukung.
+        """
+        milik_sendiri = isinstance(sumber, (str, os.PathLike))
+        if milik_sendiri:
+            berkas = open(sumber, "rb")
+        elif isinstance(sumber, (bytes, bytearray)):
+            berkas = io.BytesIO(sumber)
+        else:
+            berkas = sumber
+            berkas.seek(0)
+
+        gzip_magic = berkas.read(2) == b"\x1f\x8b"
+        berkas.seek(0)
+        mentah = gzip.GzipFile(fileobj=berkas) if gzip_magic else berkas
+        teks = io.TextIOWrapper(mentah, encoding="utf-8")
+        try:
+            # Intip baris pertama: '[' berarti backup JSON lama
+            baris_pertama = teks.readline()
+            if baris_pertama.lstrip().startswith("["):
+                data = json.loads(baris_pertama + teks.read())
+                yield from (data if isinstance(data, list) else [])
+                return
+            for baris in itertools.chain([baris_pertama], teks):
+                baris = baris.strip()
+                if baris: yield json.loads(baris)
+        finally:
+            # Lepas wrapper tanpa menutup file upload milik pemanggil
+            teks.detach()
+            if milik_sendiri: berkas.close()
+
+    def import_data_stream(self, sumber, mode="replace", batch_size=5000):
+        """
+        Restore streaming dari backup (path, bytes, atau file upload).
+        mode='replace' : hapus semua riwayat lalu isi ulang (seperti import_data lama).
+        mode='merge'   : gabungkan, pesan yang content_hash-nya sudah ada dilewati.
+        Semua batch executemany berjalan dalam SATU transaksi (rollback jika gagal).
+        """
+        if mode not in ("replace", "merge"):
+            return False, f"❌ Mode restore tidak dikenal: {mode}"
+
+        kolom = ", ".join(KOLOM_BACKUP_CHAT)
+        if mode == "merge":
+            sql = (f"INSERT INTO riwayat_konsultasi ({kolom}) SELECT ?, ?, ?, ?, ?, ? "
+                   f"WHERE NOT EXISTS (SELECT 1 FROM riwayat_konsultasi WHERE content_hash = ?)")
+        else:
+            sql = f"INSERT INTO riwayat_konsultasi ({kolom}) VALUES (?, ?, ?, ?, ?, ?)"
+
+        conn = self.conn
+        try:
+            self.flush_chat()
+            conn.execute("BEGIN")
+            if mode == "replace":
+                # Hapus Database Lama (Clean Slate) - Agar tidak duplikat
+                conn.execute("DELETE FROM riwayat_konsultasi")
+            else:
+                self._isi_hash_lama()
+
+            total = 0
+            sebelum = conn.total_changes
+            batch = []
+            for rec in self._iter_baris_backup(sumber):
+                tanggal = rec.get("tanggal")
+                tanggal = None if tanggal in (None, "NaT", "None") else str(tanggal)
+                nilai = (tanggal, rec.get("project_name"), rec.get("gem_name"), rec.get("role"), rec.get("content"))
+                h = rec.get("content_hash") or _hash_konten(*nilai)
+                batch.append(nilai + (h, h) if mode == "merge" else nilai + (h,))
+                if len(batch) >= batch_size:
+                    conn.executemany(sql, batch)
+                    total += len(batch)
+                    batch = []
+            if batch:
+                conn.executemany(sql, batch)
+                total += len(batch)
+
+            if total == 0:
+                conn.rollback()
+                return False, "⚠️ File backup kosong atau format salah."
+
+            masuk = conn.total_changes - sebelum
+            conn.commit()
+            if mode == "merge":
+                return True, f"✅ Sukses Merge! {masuk} pesan baru ditambahkan, {total - masuk} duplikat dilewati."
+            return True, f"✅ Sukses Restore! {total} pesan dikembalikan."
 
-            # 3. Hapus Database Lama (Clean Slate) - Agar tidak duplikat
-            self.cursor.execute("DELETE FROM riwayat_konsultasi")
-            
-            # 4. Proses DataFrame
-            df = pd.DataFrame(data)
-            
-            # Buang kolom ID lama agar Auto-Increment baru bekerja
-            if 'id' in df.columns:
-                df = df.drop(columns=['id'])
-            
-            # PENTING: Fix Format Tanggal
-            if 'tanggal' in df.columns:
-                df['tanggal'] = pd.to_datetime(df['tanggal'], errors='coerce')
-            
-            # 5. Masukkan ke SQL
-            df.to_sql('riwayat_konsultasi', self.conn, if_exists='append', index=False)
-            
-            self.conn.commit()
-            return True, f"✅ Sukses Restore! {len(df)} pesan dikembalikan."
-            
         except Exception as e:
             # Rollback jika gagal di tengah jalan
-            self.conn.rollback()
+            conn.rollback()
             return False, f"❌ Gagal Restore: {str(e)}"
+
+    def import_data(self, json_file):
+        """Restore data dari file backup yang diupload user (JSON lama atau NDJSON.gz)"""
+        return self.import_data_stream(json_file, mode="replace")
+
+    def _isi_hash_lama(self):
+        """Mengisi content_hash untuk baris lama (sebelum kolom ini ada) langsung di SQLite"""
+        conn = self.conn
+        conn.create_function("hash_konten", 5, _hash_konten, deterministic=True)
+        conn.execute(
+            "UPDATE riwayat_konsultasi SET content_hash = hash_konten(tanggal, project_name, gem_name, role, content) "
+            "WHERE content_hash IS NULL"
+        )
+
     # ==========================================
     # MODUL SAAS: MANAJEMEN DATABASE AHSP (SUPER EXTRACTOR)
     # ==========================================
-    def proses_dan_simpan_multi_excel(self, list_file_excel):
-        """Membaca banyak file Excel, mengekstrak Sheet HSP, dan menggabungkannya"""
-        import pandas as pd
-        import streamlit as st
-        
-        semua_data = []
-        
+    @staticmethod
+    def _iter_sheet_excel(file):
+        """
+        Membuka workbook SEKALI dan mengalirkan baris per sheet (tanpa memuat seluruh sheet ke RAM).
+        Yield: (nama_sheet, iterator baris berupa tuple nilai sel)
+        """
+        try:
+            import openpyxl
+            if hasattr(file, 'seek'): file.seek(0)
+            wb = openpyxl.load_workbook(file, read_only=True, data_only=True)
+        except Exception:
+            # Fallback format lama (.xls) yang tidak didukung openpyxl: tetap 1x baca per sheet
+            if hasattr(file, 'seek'): file.seek(0)
+            xls = pd.ExcelFile(file)
+            for sheet_name in xls.sheet_names:
+                df_raw = pd.read_excel(xls, sheet_name=sheet_name, header=None)
+                yield sheet_name, df_raw.itertuples(index=False, name=None)
+            return
+
+        try:
+            for ws in wb.worksheets:
+                yield ws.title, ws.iter_rows(values_only=True)
+        finally:
+            wb.close()
+
+    @staticmethod
+    def _cari_header(baris_teks):
+        """
+        Deteksi baris judul tabel PUPR ('Uraian' + 'Harga'/'Satuan').
+        Return: (idx_uraian, idx_satuan, idx_harga, idx_kode) atau None jika bukan baris header.
+        idx_kode: kolom 'Kode' / 'No. Analisa' (None jika sheet tidak mencantumkan kode analisa).
+        """
+        gabung = " ".join(baris_teks).upper()
+        if "URAIAN" not in gabung or ("HARGA" not in gabung and "SATUAN" not in gabung):
+            return None
+        kolom = [t.upper() for t in baris_teks]
+        idx_uraian = next((i for i, c in enumerate(kolom) if 'URAIAN' in c), None)
+        idx_harga = next((i for i, c in enumerate(kolom) if 'HARGA' in c), None)
+        idx_satuan = next((i for i, c in enumerate(kolom) if 'SATUAN' in c and i != idx_harga), None)
+        idx_kode = next((i for i, c in enumerate(kolom) if ('KODE' in c or 'NO. ANALISA' in c) and i != idx_uraian), None)
+        if idx_uraian is None:
+            return None
+        return idx_uraian, idx_satuan, idx_harga, idx_kode
+
+    @staticmethod
+    def _teks_sel(val):
+        if val is None: return ""
+        if isinstance(val, float) and val != val: return ""  # NaN
+        return str(val).strip()
+
+    @staticmethod
+    def _harga_sel(val):
+        """Membersihkan harga dari teks/spasi (hanya digit & titik dipertahankan), gagal -> NULL"""
+        if val is None or isinstance(val, bool): return None
+        if isinstance(val, (int, float)):
+            return None if val != val else float(val)
+        try:
+            return float(re.sub(r'[^\d.]', '', str(val)))
+        except ValueError:
+            return None
+
+    @classmethod
+    def _stream_baris_standar(cls, rows, kategori, header=None):
+        """
+        Generator baris terstandarisasi (URAIAN_PEKERJAAN, SATUAN, HARGA_SATUAN, KATEGORI_SHEET, kode_analisa).
+        Header dideteksi sambil jalan; baris sebelum header dilewati.
+        header: posisi kolom (idx_uraian, idx_satuan, idx_harga, idx_kode) jika sudah diketahui.
+        """
+        for row in rows:
+            if header is None:
+                header = cls._cari_header([cls._teks_sel(v) for v in row])
+                continue
+
+            idx_uraian, idx_satuan, idx_harga, idx_kode = header
+            if idx_uraian >= len(row): continue
+            uraian = cls._teks_sel(row[idx_uraian])
+            if uraian == "" or uraian.lower() in ('nan', 'none'): continue
+
+            satuan = cls._teks_sel(row[idx_satuan]) if idx_satuan is not None and idx_satuan < len(row) else ""
+            harga = cls._harga_sel(row[idx_harga]) if idx_harga is not None and idx_harga < len(row) else None
+            kode = cls._teks_sel(row[idx_kode]) if idx_kode is not None and idx_kode < len(row) else ""
+            yield (uraian, satuan or "-", harga, kategori, kode or None)
+
+    @classmethod
+    def _bedah_sheet(cls, nama_sheet, rows, kategori, komposisi):
+        """
+        Generator baris katalog dari 1 sheet workbook.
+        Sheet HSP dialirkan langsung. Sheet analisa (nama memuat 'AHS' / 'ANALISA') dibedah
+        libs_ahsp_parser; hasilnya (rincian + baris 'Utama') ditampung di list `komposisi`
+        untuk ditulis katalog ke tb_rel_ahsp_komposisi. Sheet 'AHSP' yang ternyata daftar HSP
+        (tanpa blok analisa) tetap dibaca sebagai HSP.
+        """
+        nama = nama_sheet.upper()
+        if "AHS" in nama or "ANALISA" in nama:
+            # Parser analisa butuh 1 sheet utuh (state machine lintas baris)
+            rows = list(rows)
+            hasil = parse_ahsp_sheet(pd.DataFrame(rows), kategori) if rows else []
+            if any(r['jenis_komponen'] == 'Utama' for r in hasil):
+                komposisi.extend(hasil)
+                return
+        # KITA HANYA INCAR SHEET YANG MENGANDUNG KATA "HSP"
+        if "HSP" not in nama:
+            return
+        yield from cls._stream_baris_standar(rows, kategori)
+
+    @property
+    def katalog(self):
+        """Katalog AHSP ternormalisasi & ber-versi (file database yang sama, via SQLAlchemy)"""
+        if getattr(self, '_katalog', None) is None:
+            self._katalog = Katalog_AHSP_Engine(f"sqlite:///{os.path.abspath(self.db_path)}")
+            self._migrasi_master_lama()
+        return self._katalog
+
+    def _migrasi_master_lama(self):
+        """
+        Tabel master_ahsp lama (hasil upload versi sebelumnya) dipindah sekali menjadi
+        snapshot katalog, lalu diganti VIEW master_ahsp ke versi aktif agar query lama tetap jalan.
+        Tabel lama hanya di-DROP jika kosong atau snapshot-nya berhasil ditulis; selain itu
+        (format kolom lain / snapshot gagal) tabel di-rename menjadi master_ahsp_legacy.
+        """
+        jenis = self.conn.execute("SELECT type FROM sqlite_master WHERE name = 'master_ahsp'").fetchone()
+        if jenis and jenis[0] == 'table':
+            kolom_ada = [r[1] for r in self.conn.execute("PRAGMA table_info(master_ahsp)").fetchall()]
+            jumlah = self.conn.execute("SELECT COUNT(*) FROM master_ahsp").fetchone()[0]
+            hasil = {"error": f"Kolom master_ahsp lama tidak sesuai {KOLOM_MASTER_AHSP}"}
+            if jumlah and set(KOLOM_MASTER_AHSP).issubset(kolom_ada):
+                rows = self.conn.execute(f"SELECT {', '.join(KOLOM_MASTER_AHSP)} FROM master_ahsp")
+                hasil = self._katalog.simpan_snapshot(rows, label="Migrasi tabel master_ahsp lama", sumber="master_ahsp")
+
+            with self.conn:
+                if jumlah == 0 or "error" not in hasil:
+                    self.conn.execute("DROP TABLE master_ahsp")
+                else:
+                    nama_legacy = self._nama_tabel_bebas("master_ahsp_legacy")
+                    self.conn.execute(f"ALTER TABLE master_ahsp RENAME TO {nama_legacy}")
+                    print(f"[!] master_ahsp lama ({jumlah} baris) disimpan sebagai {nama_legacy}: {hasil['error']}")
+            jenis = None
+        if not jenis:
+            with self.conn:
+                self.conn.execute('''
+                    CREATE VIEW IF NOT EXISTS master_ahsp AS
+                    SELECT h.uraian_pekerjaan AS URAIAN_PEKERJAAN, h.satuan AS SATUAN,
+                           h.harga_satuan AS HARGA_SATUAN, h.kategori AS KATEGORI_SHEET
+                    FROM tb_ahsp_header h JOIN tb_katalog_versi v ON v.id_versi = h.id_versi
+                    WHERE v.aktif = 1
+                ''')
+
+    def _nama_tabel_bebas(self, nama):
+        """Nama tabel yang belum dipakai (nama, nama_2, nama_3, ...)"""
+        kandidat, n = nama, 1
+        while self.conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (kandidat,)).fetchone():
+            n += 1
+            kandidat = f"{nama}_{n}"
+        return kandidat
+
+    @staticmethod
+    def _pesan_snapshot(hasil, jumlah_file):
+        pesan = (f"✅ Sukses! {hasil['jumlah_baru']} Item Pekerjaan dari {jumlah_file} File berhasil disedot ke Database! "
+                 f"(Katalog versi #{hasil['id_versi']})")
+        if hasil.get('jumlah_komposisi'):
+            pesan += f" + {hasil['jumlah_komposisi']} baris komposisi analisa"
+        return pesan
+
+    def _pangkas_katalog(self, pesan):
+        """Pangkas snapshot lama setelah upload sukses agar database tidak tumbuh tiap upload"""
+        if not self.simpan_versi_katalog:
+            return pesan
         try:
+            jumlah = self.katalog.pangkas_versi(simpan_terakhir=self.simpan_versi_katalog)
+        except Exception as e:
+            print(f"⚠️ Gagal memangkas versi katalog lama: {e}")
+            return pesan
+        if jumlah:
+            pesan += f" 🧹 {jumlah} versi katalog lama dipangkas (disimpan {self.simpan_versi_katalog} terakhir)."
+        return pesan
+
+    @staticmethod
+    def _kategori_sumber(nama_file):
+        """Penanda asal sumber data dari nama file (misal '1. AHS 182 ...xlsx')"""
+        return nama_file.split('.')[1][:15] if len(nama_file.split('.')) > 1 else "Master"
+
+    def proses_dan_simpan_multi_excel(self, list_file_excel):
+        """
+        Membaca banyak file Excel, mengekstrak Sheet HSP (+ rincian sheet analisa), dan menggabungkannya.
+        Streaming: tiap workbook dibuka 1x (openpyxl read_only), baris ditulis per batch
+        sebagai SATU snapshot katalog baru (versi lama tetap tersimpan untuk rollback).
+        """
+        nama_file = [os.path.basename(getattr(f, 'name', str(f))) for f in list_file_excel]
+        komposisi = []
+
+        def aliran_baris():
             for file in list_file_excel:
-                # Baca semua sheet dalam 1 file excel
-                xls = pd.ExcelFile(file)
-                
-                for sheet_name in xls.sheet_names:
-                    # KITA HANYA INCAR SHEET YANG MENGANDUNG KATA "HSP"
-                    if "HSP" in sheet_name.upper():
-                        # Baca sheet mentah
-                        df_raw = pd.read_excel(xls, sheet_name=sheet_name)
-                        
-                        # ALGORITMA PENCARI HEADER (Karena baris judul tiap Excel beda-beda)
-                        header_row_idx = None
-                        for i, row in df_raw.iterrows():
-                            # Cari baris yang mengandung kata 'Uraian' dan 'Harga'
-                            row_str = str(row.values).lower()
-                            if 'uraian' in row_str and ('harga' in row_str or 'satuan' in row_str):
-                                header_row_idx = i
-                                break
-                        
-                        if header_row_idx is not None:
-                            # Jadikan baris tersebut sebagai Header yang benar
-                            df_bersih = pd.read_excel(xls, sheet_name=sheet_name, header=header_row_idx + 1)
-                            
-                            # Bersihkan kolom yang tidak bernama (Unamed) dan baris kosong
-                            df_bersih = df_bersih.loc[:, ~df_bersih.columns.str.contains('^Unnamed')]
-                            df_bersih = df_bersih.dropna(subset=[df_bersih.columns[1]]) # Asumsi kolom 1 adalah Uraian
-                            
-                            # Tambahkan penanda asal sumber data
-                            df_bersih['Kategori_Sumber'] = file.name.split('.')[1][:15] if len(file.name.split('.'))>1 else "Master"
-                            
-                            semua_data.append(df_bersih)
-
-            if not semua_data:
-                return False, "❌ Tidak ditemukan sheet bernama 'HSP' atau format tidak sesuai."
-
-            # Gabungkan semua data dari 5 file menjadi 1 Tabel Raksasa
-            df_final = pd.concat(semua_data, ignore_index=True)
-            
-            # Kunci ke Database SQLite secara permanen
-            df_final.to_sql('master_ahsp', self.conn, if_exists='replace', index=False)
-            
-            return True, f"✅ Sukses! {len(df_final)} Item Pekerjaan dari {len(list_file_excel)} File berhasil disedot ke Database!"
+                kategori = self._kategori_sumber(getattr(file, 'name', str(file)))
+                for sheet_name, rows in self._iter_sheet_excel(file):
+                    yield from self._bedah_sheet(sheet_name, rows, kategori, komposisi)
+
+        try:
+            hasil = self.katalog.simpan_snapshot(
+                aliran_baris(), label=f"Upload {len(list_file_excel)} workbook", sumber=", ".join(nama_file),
+                komposisi=komposisi
+            )
+            if "error" in hasil:
+                if hasil["error"].startswith("Tidak ada baris"):
+                    return False, "❌ Tidak ditemukan sheet 'HSP' / analisa AHSP atau format tidak sesuai."
+                return False, f"Terjadi kesalahan saat memproses Excel: {hasil['error']}"
+            return True, self._pangkas_katalog(self._pesan_snapshot(hasil, len(list_file_excel)))
+
+        except Exception as e:
+            return False, f"Terjadi kesalahan saat memproses Excel: {e}"
+
+    def proses_dan_simpan_multi_excel_paralel(self, list_file_excel, max_workers=None, callback=None):
+        """
+        Versi paralel proses_dan_simpan_multi_excel: tiap workbook dibedah di ProcessPoolExecutor,
+        lalu hasilnya digabung menjadi SATU snapshot katalog oleh satu penulis (proses utama).
+        Semua workbook selesai dibedah DULU, baru transaksi tulis dibuka -> kunci tulis SQLite
+        tidak ditahan selama parsing (flush chat / sesi lain tidak ikut menunggu).
+        callback(nama_file, selesai, total_file, jumlah_baris) opsional untuk progress UI.
+        """
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+
+        # Ambil isi file sekali di proses utama (objek upload tidak bisa di-pickle)
+        daftar_file = []
+        for file in list_file_excel:
+            if hasattr(file, 'getvalue'):
+                isi = file.getvalue()
+            elif hasattr(file, 'read'):
+                if hasattr(file, 'seek'): file.seek(0)
+                isi = file.read()
+            else:
+                with open(file, 'rb') as f: isi = f.read()
+            daftar_file.append((os.path.basename(getattr(file, 'name', str(file))), isi))
+
+        if not daftar_file:
+            return False, "❌ Tidak ada file yang diproses."
+
+        gagal = []
+        baris_katalog = []
+        komposisi = []
+
+        try:
+            n_worker = max_workers or min(len(daftar_file), os.cpu_count() or 1)
+            with ProcessPoolExecutor(max_workers=max(1, n_worker)) as pool:
+                futures = {pool.submit(_parse_workbook_proses, nama, isi): nama for nama, isi in daftar_file}
+                for selesai, fut in enumerate(as_completed(futures), start=1):
+                    nama_file = futures[fut]
+                    try:
+                        hasil, rincian = fut.result()
+                    except Exception as e:
+                        gagal.append(f"{nama_file}: {e}")
+                        hasil, rincian = [], []
+                    baris_katalog.extend(hasil)
+                    komposisi.extend(rincian)
+                    if callback: callback(nama_file, selesai, len(daftar_file), len(hasil))
+
+            hasil = self.katalog.simpan_snapshot(
+                baris_katalog, label=f"Upload {len(daftar_file)} workbook (paralel)",
+                sumber=", ".join(nama for nama, _ in daftar_file), komposisi=komposisi
+            )
+
+            if "error" in hasil:
+                if hasil["error"].startswith("Tidak ada baris"):
+                    return False, "❌ Tidak ditemukan sheet 'HSP' / analisa AHSP atau format tidak sesuai."
+                return False, f"Terjadi kesalahan saat memproses Excel: {hasil['error']}"
+
+            pesan = self._pesan_snapshot(hasil, len(daftar_file))
+            if gagal:
+                pesan += f" ⚠️ {len(gagal)} file gagal: " + "; ".join(gagal)
+            return True, self._pangkas_katalog(pesan)
 
         except Exception as e:
             return False, f"Terjadi kesalahan saat memproses Excel: {e}"
 
-    def get_master_ahsp_permanen(self):
-        """Memanggil database AHSP saat aplikasi pertama kali dibuka"""
-        import pandas as pd
+    def get_master_ahsp_permanen(self, kolom=KOLOM_KATALOG_DEFAULT, kategori=None, kata_kunci=None, limit=None):
+        """
+        Memanggil sebagian katalog AHSP aktif (filter kategori / kata kunci + limit).
+        Hanya kolom yang diminta (default: Uraian, Satuan, Harga) - bukan SELECT * seluruh katalog.
+        """
         try:
-            df = pd.read_sql_query("SELECT * FROM master_ahsp", self.conn)
-            return df
+            return self.katalog.ambil_katalog(kolom=kolom, kategori=kategori, kata_kunci=kata_kunci, limit=limit)
         except Exception:
             return pd.DataFrame()
-    def close(self):
-        """Tutup koneksi database"""
-        if self.conn:
-            self.conn.close()
-    def proses_dan_simpan_dataframe(self, df, nama_sheet):
-        """Memproses 1 DataFrame, menstandarkan kolomnya, dan memasukkannya ke SQLite secara aman"""
-        import pandas as pd
-        import numpy as np
+
+    def jumlah_ahsp_permanen(self):
+        """Jumlah item katalog AHSP aktif (cek cepat saat aplikasi dibuka, tanpa memuat katalog)"""
         try:
-            # 1. Bersihkan Data (Drop baris kosong)
-            df = df.dropna(how='all')
-            
-            # 2. Cari Baris Header Otomatis (Mendeteksi format Excel PUPR)
-            header_idx = None
-            for idx, row in df.iterrows():
-                row_str = " ".join(row.astype(str).str.upper())
-                if "URAIAN" in row_str and ("HARGA" in row_str or "SATUAN" in row_str):
-                    header_idx = idx
-                    break
-                    
-            if header_idx is not None:
-                # Jadikan baris tersebut sebagai Header yang sah
-                df.columns = df.iloc[header_idx]
-                df = df.iloc[header_idx + 1:].reset_index(drop=True)
-            
-            # Rapikan nama kolom
-            df.columns = [str(c).upper().strip() for c in df.columns]
-            
-            # 3. Identifikasi Kolom Utama yang Wajib Ada
-            col_uraian = next((c for c in df.columns if 'URAIAN' in c), None)
-            col_harga = next((c for c in df.columns if 'HARGA' in c), None)
-            col_satuan = next((c for c in df.columns if 'SATUAN' in c and c != col_harga), None)
-            
-            # Jika kolom Uraian tidak ada, berarti ini sheet kosong/sampah
-            if not col_uraian:
-                return False, 0
-                
-            # 4. BUAT DATAFRAME BARU TERSTANDARISASI (Solusi agar SQLite tidak error)
-            df_clean = pd.DataFrame()
-            df_clean['URAIAN_PEKERJAAN'] = df[col_uraian].astype(str)
-            
-            if col_satuan:
-                df_clean['SATUAN'] = df[col_satuan].astype(str)
-            else:
-                df_clean['SATUAN'] = "-"
-                
-            if col_harga:
-                # Bersihkan harga dari teks, spasi, dll secara lembut tanpa menghapus barisnya
-                harga_bersih = df[col_harga].astype(str).str.replace(r'[^\d.]', '', regex=True)
-                df_clean['HARGA_SATUAN'] = pd.to_numeric(harga_bersih, errors='coerce')
-            else:
-                df_clean['HARGA_SATUAN'] = np.nan
-                
-            # 5. Filter Data Kosong
-            # Hanya hapus baris yang Uraian Pekerjaannya benar-benar kosong/NaN
-            df_clean = df_clean[df_clean['URAIAN_PEKERJAAN'].str.lower() != 'nan']
-            df_clean = df_clean[df_clean['URAIAN_PEKERJAAN'].str.strip() != '']
-            
-            # 6. Tambahkan Kategori
-            df_clean['KATEGORI_SHEET'] = nama_sheet
-            
-            # 7. SIMPAN KE SQLITE DENGAN FITUR AUTO-HEALING
-            try:
-                # Coba tambahkan ke tabel yang sudah ada
-                df_clean.to_sql('master_ahsp', con=self.conn, if_exists='append', index=False)
-            except Exception as sql_e:
-                # Jika gagal karena tabel lama rusak, hancurkan tabel lama dan buat baru (Self-Healing)
-                print(f"[!] Memperbaiki database yang rusak... Membuat ulang tabel master_ahsp.")
-                df_clean.to_sql('master_ahsp', con=self.conn, if_exists='replace', index=False)
-            
-            jumlah_baris_berhasil = len(df_clean)
-            return True, jumlah_baris_berhasil
-            
-        except Exception as e:
-            print(f"[-] Error fatal pada sheet {nama_sheet}: {e}")
-            return False, 0
-    
-        
-    
-        
+            return self.katalog.jumlah_item()
+        except Exception:
+            return 0
+    def close(self):
+        """Flush antrean chat lalu tutup semua koneksi database"""
+        if self.pool:
+            self.flush_chat()
+            self.pool.tutup_semua()
+
 
+def _parse_workbook_proses(nama_file, isi_file):
+    """
+    Pekerja ProcessPool: membedah 1 workbook (sheet HSP + sheet analisa) menjadi baris terstandarisasi.
+    Dijalankan di proses terpisah, jadi input berupa bytes (bukan objek upload Streamlit).
+    Return: (baris katalog, baris komposisi hasil parser analisa).
+    """
+    kategori = EnginexBackend._kategori_sumber(nama_file)
+    hasil, komposisi = [], []
+    for sheet_name, rows in EnginexBackend._iter_sheet_excel(io.BytesIO(isi_file)):
+        hasil.extend(EnginexBackend._bedah_sheet(sheet_name, rows, kategori, komposisi))
+    return hasil, komposisi
@@ -0,0 +1,188 @@
+# ==============================================================================
+# 📄 NAMA FILE: schema_ahsp.py
+# 📍 LOKASI: core/schema_ahsp.py
+# 🛠️ FUNGSI: Skema ORM Master Data AHSP (Ternormalisasi, Ber-Indeks, Ber-Versi)
+# ==============================================================================
+
+from datetime import datetime
+
+from sqlalchemy import (
+    Column, Integer, String, Numeric, Float, Text, Boolean, DateTime, ForeignKey, Index,
+    inspect, text
+)
+from sqlalchemy.orm import declarative_base
+
+Base = declarative_base()
+
+
+# ==============================================================================
+# 1. MASTER SUMBER DAYA (HSD: TENAGA, BAHAN, ALAT)
+# ==============================================================================
+class MasterTenaga(Base):
+    __tablename__ = 'tb_mst_tenaga'
+    id_tenaga = Column(Integer, primary_key=True, autoincrement=True)
+    kode_tenaga = Column(String(10), nullable=True)
+    uraian_tenaga = Column(String(255), nullable=False, index=True)
+    satuan = Column(String(20), nullable=False, default='OH')
+    harga_dasar = Column(Numeric(15, 2), nullable=False, default=0)
+    wilayah = Column(String(100), nullable=False, default='', server_default='')
+
+    __table_args__ = (
+        # Kunci upsert ETL: 1 harga per (wilayah, uraian, satuan)
+        Index('uq_mst_tenaga_item', 'wilayah', 'uraian_tenaga', 'satuan', unique=True),
+    )
+
+class MasterBahan(Base):
+    __tablename__ = 'tb_mst_bahan'
+    id_bahan = Column(Integer, primary_key=True, autoincrement=True)
+    uraian_bahan = Column(String(255), nullable=False, index=True)
+    satuan = Column(String(20), nullable=False)
+    harga_dasar = Column(Numeric(15, 2), nullable=False, default=0)
+    wilayah = Column(String(100), nullable=False, default='', server_default='')
+
+    __table_args__ = (
+        Index('uq_mst_bahan_item', 'wilayah', 'uraian_bahan', 'satuan', unique=True),
+    )
+
+class MasterAlat(Base):
+    __tablename__ = 'tb_mst_alat'
+    id_alat = Column(Integer, primary_key=True, autoincrement=True)
+    uraian_alat = Column(String(255), nullable=False, index=True)
+    satuan = Column(String(20), nullable=False)
+    harga_dasar = Column(Numeric(15, 2), nullable=False, default=0)
+    wilayah = Column(String(100), nullable=False, default='', server_default='')
+
+    __table_args__ = (
+        Index('uq_mst_alat_item', 'wilayah', 'uraian_alat', 'satuan', unique=True),
+    )
+
+
+# ==============================================================================
+# 2. KATALOG AHSP BER-VERSI (SETIAP UPLOAD = 1 SNAPSHOT)
+# ==============================================================================
+class KatalogVersi(Base):
+    __tablename__ = 'tb_katalog_versi'
+    id_versi = Column(Integer, primary_key=True, autoincrement=True)
+    label = Column(String(255), nullable=False)
+    sumber = Column(Text)
+    dibuat = Column(DateTime, nullable=False, default=datetime.now)
+    jumlah_item = Column(Integer, nullable=False, default=0)
+    aktif = Column(Boolean, nullable=False, default=False, index=True)
+
+class AHSPHeader(Base):
+    __tablename__ = 'tb_ahsp_header'
+    id_ahsp = Column(Integer, primary_key=True, autoincrement=True)
+    kode_analisa = Column(String(50), nullable=False, index=True)
+    uraian_pekerjaan = Column(Text, nullable=False)
+    satuan = Column(String(20), nullable=False)
+    divisi_pupr = Column(String(50))
+    id_versi = Column(Integer, ForeignKey('tb_katalog_versi.id_versi', ondelete="CASCADE"))
+    kategori = Column(String(100))
+    harga_satuan = Column(Float)
+
+    __table_args__ = (
+        # Layar RAB/Admin selalu memfilter per versi (lalu per kategori / uraian)
+        Index('idx_ahsp_header_versi_kategori', 'id_versi', 'kategori'),
+        Index('idx_ahsp_header_versi_uraian', 'id_versi', 'uraian_pekerjaan'),
+    )
+
+class AHSPKomposisi(Base):
+    __tablename__ = 'tb_rel_ahsp_komposisi'
+    id_rel = Column(Integer, primary_key=True, autoincrement=True)
+    id_ahsp = Column(Integer, ForeignKey('tb_ahsp_header.id_ahsp', ondelete="CASCADE"), index=True)
+    tipe_sumber_daya = Column(String(10)) # 'TENAGA', 'BAHAN', atau 'ALAT'
+    id_sumber_daya = Column(Integer, nullable=False)
+    koefisien = Column(Numeric(10, 4), nullable=False)
+
+    __table_args__ = (
+        # Repricing: "analisa mana saja yang memakai semen?"
+        Index('idx_komposisi_sumber_daya', 'tipe_sumber_daya', 'id_sumber_daya'),
+        Index('uq_komposisi_item', 'id_ahsp', 'tipe_sumber_daya', 'id_sumber_daya', unique=True),
+    )
+
+
+# ==============================================================================
+# 3. MIGRASI SKEMA (IDEMPOTEN)
+# ==============================================================================
+def migrasi_skema(engine):
+    """
+    Membuat / melengkapi skema secara idempoten (aman dipanggil berulang kali):
+      - tabel yang belum ada dibuat,
+      - kolom baru ditambahkan ke tabel lama (ALTER TABLE ADD COLUMN),
+      - indeks yang belum ada dibuat.
+    Tidak pernah menghapus data: indeks UNIQUE yang terhalang baris kembar dilewati
+    (lihat dedup_kunci_unik, langkah ETL eksplisit).
+    Return: list langkah yang dijalankan (kosong = skema sudah mutakhir).
+    """
+    langkah = []
+    with engine.begin() as conn:
+        tabel_ada = set(inspect(conn).get_table_names())
+        Base.metadata.create_all(conn, checkfirst=True)
+
+        for tabel in Base.metadata.sorted_tables:
+            if tabel.name not in tabel_ada:
+                langkah.append(f"CREATE TABLE {tabel.name}")
+                continue
+
+            # Tabel lama (misal buatan skrip ETL versi awal): lengkapi kolomnya
+            kolom_ada = {k['name'] for k in inspect(conn).get_columns(tabel.name)}
+            for kolom in tabel.columns:
+                if kolom.name in kolom_ada: continue
+                ddl = f'ALTER TABLE {tabel.name} ADD COLUMN {kolom.name} {kolom.type.compile(dialect=conn.dialect)}'
+                if kolom.server_default is not None:
+                    # Baris lama langsung terisi nilai default (syarat NOT NULL di SQLite)
+                    ddl += f" DEFAULT '{kolom.server_default.arg}'"
+                    if not kolom.nullable: ddl += " NOT NULL"
+                conn.execute(text(ddl))
+                langkah.append(f"ADD COLUMN {tabel.name}.{kolom.name}")
+
+            indeks_ada = {i['name'] for i in inspect(conn).get_indexes(tabel.name)}
+            for indeks in tabel.indexes:
+                if indeks.name in indeks_ada: continue
+                if indeks.unique:
+                    # Data lama hasil append berulang: indeks ditunda sampai dedup dijalankan
+                    kembar = _jumlah_baris_kembar(conn, tabel, indeks)
+                    if kembar:
+                        langkah.append(
+                            f"LEWATI INDEX {indeks.name}: {kembar} baris kembar di {tabel.name} "
+                            f"(jalankan setup_database_etl.py --dedup)"
+                        )
+                        continue
+                indeks.create(conn, checkfirst=True)
+                langkah.append(f"CREATE INDEX {indeks.name}")
+    return langkah
+
+
+def _sql_baris_kembar(tabel, indeks):
+    """SELECT baris yang BUKAN baris terbaru (PK terbesar) untuk kunci indeks UNIQUE"""
+    pk = list(tabel.primary_key.columns)[0].name
+    kunci = ", ".join(k.name for k in indeks.columns)
+    return f"FROM {tabel.name} WHERE {pk} NOT IN (SELECT MAX({pk}) FROM {tabel.name} GROUP BY {kunci})"
+
+
+def _jumlah_baris_kembar(conn, tabel, indeks):
+    return conn.execute(text(f"SELECT COUNT(*) {_sql_baris_kembar(tabel, indeks)}")).scalar()
+
+
+def dedup_kunci_unik(engine, terapkan=False):
+    """
+    Langkah ETL eksplisit (bukan bagian migrasi otomatis): mencari baris kembar pada kunci
+    indeks UNIQUE yang belum terpasang, menyisakan 1 baris terbaru (PK terbesar) per kunci.
+    terapkan=False -> hanya laporan (dry-run), tidak ada baris yang dihapus.
+    Return: Dictionary {nama_tabel: list baris (dict) yang dihapus / akan dihapus}.
+    """
+    hasil = {}
+    with engine.begin() as conn:
+        tabel_ada = set(inspect(conn).get_table_names())
+        for tabel in Base.metadata.sorted_tables:
+            if tabel.name not in tabel_ada: continue
+            indeks_ada = {i['name'] for i in inspect(conn).get_indexes(tabel.name)}
+            for indeks in tabel.indexes:
+                if not indeks.unique or indeks.name in indeks_ada: continue
+                sql = _sql_baris_kembar(tabel, indeks)
+                baris = [dict(r) for r in conn.execute(text(f"SELECT * {sql}")).mappings()]
+                if not baris: continue
+                if terapkan:
+                    conn.execute(text(f"DELETE {sql}"))
+                hasil.setdefault(tabel.name, []).extend(baris)
+    return hasil
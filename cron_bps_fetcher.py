@@ -3,7 +3,15 @@
 # 🛠️ FUNGSI: Background Worker (ETL) untuk menarik API BPS secara Asinkron
 # ==============================================================================
 
+import asyncio
+import json
+import os
 import sqlite3
+import threading
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 import pandas as pd
 from datetime import datetime
 import time
@@ -11,6 +19,19 @@ import time
 # Konfigurasi Database Utama SaaS
 DB_PATH = 'enginex_core.db'
 
+# 38 Provinsi Indonesia (target sinkronisasi harian)
+DAFTAR_PROVINSI = [
+    "Aceh", "Sumatera Utara", "Sumatera Barat", "Riau", "Kepulauan Riau", "Jambi",
+    "Sumatera Selatan", "Kepulauan Bangka Belitung", "Bengkulu", "Lampung",
+    "DKI Jakarta", "Jawa Barat", "Banten", "Jawa Tengah", "DI Yogyakarta", "Jawa Timur",
+    "Bali", "Nusa Tenggara Barat", "Nusa Tenggara Timur",
+    "Kalimantan Barat", "Kalimantan Tengah", "Kalimantan Selatan", "Kalimantan Timur", "Kalimantan Utara",
+    "Sulawesi Utara", "Gorontalo", "Sulawesi Tengah", "Sulawesi Barat", "Sulawesi Selatan", "Sulawesi Tenggara",
+    "Maluku", "Maluku Utara",
+    "Papua", "Papua Barat", "Papua Barat Daya", "Papua Tengah", "Papua Pegunungan", "Papua Selatan"
+]
+KOLOM_CACHE = ["id_material", "nama_material", "satuan", "harga_dasar", "provinsi", "sumber", "last_updated"]
+
 def init_cache_table(cursor):
     """Menyiapkan tabel penampungan terpusat di SQLite"""
     cursor.execute("""
@@ -24,59 +45,179 @@ def init_cache_table(cursor):
             last_updated TIMESTAMP
         )
     """)
+    # Indeks untuk pembacaan per provinsi + cek versi MAX(last_updated) di libs_bps
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_cache_harga_provinsi ON cache_harga_material (provinsi, last_updated)")
+    # Kunci upsert: buang duplikat lama (hasil DELETE + append versi sebelumnya) sebelum indeks UNIQUE dibuat
+    cursor.execute("""
+        DELETE FROM cache_harga_material WHERE rowid NOT IN (
+            SELECT MAX(rowid) FROM cache_harga_material GROUP BY id_material, provinsi
+        )
+    """)
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_cache_harga_material_kunci ON cache_harga_material (id_material, provinsi)")
 
-def fetch_bps_data(provinsi="Lampung"):
-    """
-    Simulasi ekstraksi JSON dari payload BPS dan ESSH.
-    """
-    print(f"[{datetime.now()}] 📡 Menghubungi peladen BPS untuk wilayah {provinsi}...")
-    time.sleep(2) # Simulasi latensi jaringan
-    
-    bps_data = [
+def data_contoh_bps(provinsi):
+    """Payload contoh API BPS (dipakai simulasi & stub server)."""
+    return [
         {"id_material": "BPS-001", "nama_material": "Semen Portland Tipe 1", "satuan": "kg", "harga_dasar": 1400, "provinsi": provinsi, "sumber": "API BPS Pusat"},
         {"id_material": "BPS-002", "nama_material": "Pasir Pasang", "satuan": "m3", "harga_dasar": 285000, "provinsi": provinsi, "sumber": "API BPS Pusat"},
         {"id_material": "BPS-003", "nama_material": "Bata Merah", "satuan": "bh", "harga_dasar": 850, "provinsi": provinsi, "sumber": "API BPS Pusat"},
         {"id_material": "BPS-004", "nama_material": "Pekerja (Tukang)", "satuan": "OH", "harga_dasar": 150000, "provinsi": provinsi, "sumber": "API BPS Pusat"}
     ]
-    
-    essh_data = [
+
+def data_contoh_essh(provinsi):
+    """Payload contoh ESSH PUPR daerah (dipakai simulasi & stub server)."""
+    return [
         {"id_material": "ESH-001", "nama_material": "Semen Portland Tipe 1", "satuan": "kg", "harga_dasar": 1650, "provinsi": provinsi, "sumber": f"ESSH PUPR {provinsi}"},
         {"id_material": "ESH-002", "nama_material": "Besi Beton Polos", "satuan": "kg", "harga_dasar": 13500, "provinsi": provinsi, "sumber": f"ESSH PUPR {provinsi}"},
         {"id_material": "ESH-003", "nama_material": "Batu Kali", "satuan": "m3", "harga_dasar": 250000, "provinsi": provinsi, "sumber": f"ESSH PUPR {provinsi}"}
     ]
 
-    df_bps = pd.DataFrame(bps_data)
-    df_essh = pd.DataFrame(essh_data)
-    
-    essh_materials = df_essh['nama_material'].str.lower().tolist()
-    df_bps_filtered = df_bps[~df_bps['nama_material'].str.lower().isin(essh_materials)]
-    
-    df_final = pd.concat([df_essh, df_bps_filtered], ignore_index=True)
-    df_final['last_updated'] = datetime.now()
-    
+def gabung_essh_bps(df_bps, df_essh):
+    """ESSH daerah menimpa BPS untuk material yang sama (nama dibandingkan tanpa beda huruf besar/kecil)."""
+    if df_essh.empty: return df_bps.reset_index(drop=True)
+    if df_bps.empty: return df_essh.reset_index(drop=True)
+    df_bps_filtered = df_bps[~df_bps['nama_material'].str.lower().isin(df_essh['nama_material'].str.lower())]
+    return pd.concat([df_essh, df_bps_filtered], ignore_index=True)
+
+# ==========================================
+# FETCHER ASINKRON MULTI-PROVINSI
+# ==========================================
+def _ambil_json(url, timeout):
+    with urllib.request.urlopen(url, timeout=timeout) as resp:
+        return json.loads(resp.read().decode("utf-8"))
+
+async def fetch_provinsi_async(base_url, provinsi, semaphore, executor=None, timeout=30):
+    """Menarik BPS & ESSH satu provinsi secara bersamaan (dibatasi semaphore global)."""
+    loop = asyncio.get_running_loop()
+    q = urllib.parse.quote(provinsi)
+    async with semaphore:
+        data_bps, data_essh = await asyncio.gather(
+            loop.run_in_executor(executor, _ambil_json, f"{base_url}/bps?provinsi={q}", timeout),
+            loop.run_in_executor(executor, _ambil_json, f"{base_url}/essh?provinsi={q}", timeout),
+        )
+    df_final = gabung_essh_bps(pd.DataFrame(data_bps, columns=KOLOM_CACHE[:-1]), pd.DataFrame(data_essh, columns=KOLOM_CACHE[:-1]))
+    df_final['provinsi'] = provinsi
+    df_final['last_updated'] = datetime.now().isoformat(sep=' ')
     return df_final
 
-def run_cron_job():
-    """Fungsi utama yang dieksekusi oleh Task Scheduler/Cron"""
+def upsert_provinsi(conn, provinsi, df_baru):
+    """
+    Satu transaksi per provinsi: upsert berdasarkan (id_material, provinsi),
+    lalu hapus material yang sudah tidak dikirim lagi. Pembaca tidak pernah melihat tabel kosong.
+    """
+    kolom = ", ".join(KOLOM_CACHE)
+    update = ", ".join(f"{k} = excluded.{k}" for k in KOLOM_CACHE if k not in ("id_material", "provinsi"))
+    baris = list(df_baru[KOLOM_CACHE].itertuples(index=False, name=None))
+    id_baru = [b[0] for b in baris]
+    with conn:
+        conn.executemany(
+            f"INSERT INTO cache_harga_material ({kolom}) VALUES ({', '.join('?' for _ in KOLOM_CACHE)}) "
+            f"ON CONFLICT (id_material, provinsi) DO UPDATE SET {update}",
+            baris
+        )
+        conn.execute(
+            f"DELETE FROM cache_harga_material WHERE provinsi = ? AND id_material NOT IN ({', '.join('?' for _ in id_baru)})",
+            [provinsi] + id_baru
+        )
+    return len(baris)
+
+async def sinkronisasi_semua_provinsi(base_url, db_path=DB_PATH, daftar_provinsi=None, max_concurrent=8):
+    """
+    Menarik seluruh provinsi secara konkuren (asyncio + semaphore), lalu menulis
+    tiap provinsi begitu datanya tiba (penulis tunggal di event loop).
+    Output: Dictionary laporan (sukses, gagal, jumlah baris, durasi).
+    """
+    daftar_provinsi = daftar_provinsi or DAFTAR_PROVINSI
+    semaphore = asyncio.Semaphore(max_concurrent)
+    t_mulai = time.perf_counter()
+
+    # Thread I/O khusus: 2 request (BPS + ESSH) per provinsi yang sedang aktif
+    executor = ThreadPoolExecutor(max_workers=2 * max_concurrent)
+    conn = sqlite3.connect(db_path)
+    try:
+        init_cache_table(conn.cursor())
+        conn.commit()
+
+        async def tugas(provinsi):
+            try:
+                return provinsi, await fetch_provinsi_async(base_url, provinsi, semaphore, executor), None
+            except Exception as e:
+                return provinsi, None, str(e)
+
+        laporan = {"Provinsi_Sukses": 0, "Provinsi_Gagal": {}, "Total_Baris": 0}
+        for selesai in asyncio.as_completed([tugas(p) for p in daftar_provinsi]):
+            provinsi, df_baru, error = await selesai
+            if error is not None or df_baru.empty:
+                laporan["Provinsi_Gagal"][provinsi] = error or "Data kosong"
+                continue
+            laporan["Total_Baris"] += upsert_provinsi(conn, provinsi, df_baru)
+            laporan["Provinsi_Sukses"] += 1
+    finally:
+        conn.close()
+        executor.shutdown(wait=False)
+
+    laporan["Durasi_Detik"] = round(time.perf_counter() - t_mulai, 3)
+    return laporan
+
+# ==========================================
+# STUB SERVER HTTP LOKAL (UJI BEBAN OFFLINE)
+# ==========================================
+class _Stub_BPS_Handler(BaseHTTPRequestHandler):
+    """Meniru endpoint /bps dan /essh dengan latensi buatan."""
+    latensi = 0.0
+
+    def do_GET(self):
+        url = urllib.parse.urlparse(self.path)
+        provinsi = urllib.parse.parse_qs(url.query).get("provinsi", ["Lampung"])[0]
+        if url.path == "/bps":
+            payload = data_contoh_bps(provinsi)
+        elif url.path == "/essh":
+            payload = data_contoh_essh(provinsi)
+        else:
+            self.send_error(404)
+            return
+        time.sleep(self.latensi)
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Senyapkan log per request
+
+def jalankan_stub_server(port=0, latensi=0.0):
+    """Menyalakan stub server di thread latar. Return: (server, base_url). Matikan dengan server.shutdown()."""
+    handler = type("Stub_BPS_Handler", (_Stub_BPS_Handler,), {"latensi": latensi})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+def run_cron_job(base_url=None, daftar_provinsi=None, latensi_stub=2.0):
+    """
+    Fungsi utama yang dieksekusi oleh Task Scheduler/Cron.
+    base_url: alamat API (default env BPS_API_URL). Tanpa API, stub lokal dipakai sebagai simulasi.
+    """
     try:
         print("==================================================")
         print(f"Memulai Sinkronisasi Database BPS Terpusat...")
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
+        base_url = base_url or os.environ.get("BPS_API_URL")
+        server = None
+        if not base_url:
+            server, base_url = jalankan_stub_server(latensi=latensi_stub)
+            print(f"[{datetime.now()}] 🧪 BPS_API_URL kosong, memakai stub lokal {base_url}")
         
-        init_cache_table(cursor)
-        df_target = fetch_bps_data("Lampung")
+        try:
+            laporan = asyncio.run(sinkronisasi_semua_provinsi(base_url, DB_PATH, daftar_provinsi))
+        finally:
+            if server is not None: server.shutdown()
         
-        # Hapus data usang untuk provinsi tersebut
-        cursor.execute("DELETE FROM cache_harga_material WHERE provinsi = ?", ("Lampung",))
-        
-        # Injeksi data baru ke SQLite
-        df_target.to_sql('cache_harga_material', conn, if_exists='append', index=False)
-        
-        conn.commit()
-        conn.close()
-        print(f"✅ Selesai! {len(df_target)} material berhasil diperbarui ke database lokal.")
+        print(f"✅ Selesai! {laporan['Total_Baris']} material dari {laporan['Provinsi_Sukses']} provinsi diperbarui dalam {laporan['Durasi_Detik']} detik.")
+        for provinsi, error in laporan["Provinsi_Gagal"].items():
+            print(f"⚠️ {provinsi}: {error}")
         print("==================================================")
+        return laporan
     except Exception as e:
         print(f"❌ Gagal mengeksekusi Cron Job: {e}")
 
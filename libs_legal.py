@@ -4,6 +4,7 @@
 # 🛠️ FUNGSI: Administrasi Kontrak, Draft SPK, RKK, & Evaluasi Tender
 # ==============================================================================
 
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
 
@@ -63,6 +64,112 @@ class Legal_Contract_Engine:
         except Exception as e:
             return {"error": f"Gagal mengevaluasi tender: {str(e)}"}
 
+    @staticmethod
+    def _kunci_item(seri_nama):
+        """Kunci hash 64-bit nama pekerjaan (dinormalisasi: spasi & huruf besar/kecil diabaikan)."""
+        normal = seri_nama.astype(str).str.strip().str.casefold().str.replace(r'\s+', ' ', regex=True)
+        return pd.util.hash_pandas_object(normal, index=False).to_numpy()
+
+    def evaluasi_tender_massal(self, df_oe, df_penawaran, kolom_penyedia='Nama Penyedia', batas_z=3.5, min_deviasi_persen=20,
+                               min_penyedia_z=5):
+        """
+        Evaluasi seluruh peserta tender sekaligus (ribuan item x banyak penyedia).
+        Input:
+        - df_oe: kolom 'Nama Pekerjaan' dan 'Total Harga' (HPS per item)
+        - df_penawaran: format panjang, kolom [kolom_penyedia, 'Nama Pekerjaan', 'Total Harga']
+        Item dicocokkan lewat kunci hash, status dihitung dengan np.select, dan harga timpang
+        (unbalanced bid) ditandai dengan robust z-score rasio per item antar penyedia
+        (hanya jika selisihnya dari median juga material, >= min_deviasi_persen poin).
+        Item dengan penawar < min_penyedia_z (MAD tidak bermakna) juga ditandai timpang jika
+        rasionya menyimpang >= min_deviasi_persen poin dari HPS (100%).
+        Rasio total = penawaran item HPS / TOTAL HPS penuh. Penawaran yang tidak menawar semua
+        item HPS ditolak, dan hanya penawaran lengkap yang diterima yang diberi peringkat.
+        Output: Dictionary berisi ringkasan per penyedia dan detail evaluasi per item.
+        """
+        try:
+            # 1. PENYELARASAN ITEM VIA KUNCI HASH
+            oe = df_oe.assign(_kunci=self._kunci_item(df_oe['Nama Pekerjaan'])).drop_duplicates('_kunci', keep='last')
+            harga_oe = oe['Total Harga'].astype(float).to_numpy()
+
+            df_eval = df_penawaran[[kolom_penyedia, 'Nama Pekerjaan', 'Total Harga']].copy()
+            df_eval = df_eval.rename(columns={'Total Harga': 'Total Harga_Penawaran'})
+            posisi = pd.Index(oe['_kunci']).get_indexer(self._kunci_item(df_eval['Nama Pekerjaan']))
+            ada_di_hps = posisi >= 0
+            df_eval['Total Harga_OE'] = np.where(ada_di_hps, harga_oe[posisi], np.nan)
+
+            # 2. RASIO & STATUS (VEKTOR)
+            penawaran = df_eval['Total Harga_Penawaran'].astype(float).to_numpy()
+            with np.errstate(divide='ignore', invalid='ignore'):
+                rasio = penawaran / df_eval['Total Harga_OE'].to_numpy() * 100
+            df_eval['Selisih (Rp)'] = penawaran - df_eval['Total Harga_OE'].to_numpy()
+            df_eval['Rasio (%)'] = rasio
+            df_eval['Status Evaluasi'] = np.select(
+                [~ada_di_hps, rasio > self.batas_atas_wajar * 100, rasio < self.batas_bawah_wajar * 100],
+                ["⚪ TIDAK ADA DI HPS", "🔴 GUGUR (Melebihi HPS)", "🟡 KLARIFIKASI (Terlalu Rendah)"],
+                default="🟢 WAJAR"
+            )
+
+            # 3. DETEKSI HARGA TIMPANG: robust z-score rasio tiap item terhadap median semua penyedia
+            kunci_item = pd.Series(np.where(ada_di_hps, posisi, -1), index=df_eval.index)
+            seri_rasio = pd.Series(np.where(ada_di_hps, rasio, np.nan), index=df_eval.index)
+            median = seri_rasio.groupby(kunci_item).transform('median')
+            deviasi = (seri_rasio - median).abs()
+            mad = deviasi.groupby(kunci_item).transform('median')
+            mean_ad = deviasi.groupby(kunci_item).transform('mean')
+            # MAD = 0 (mayoritas penyedia sama persis) -> pakai Mean Absolute Deviation (Iglewicz-Hoaglin)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                z = np.where(mad > 0, 0.6745 * deviasi / mad, np.where(mean_ad > 0, deviasi / (1.253314 * mean_ad), 0.0))
+            df_eval['Robust Z'] = np.round(z, 2)
+            timpang_z = (np.nan_to_num(z) > batas_z) & (deviasi.fillna(0).to_numpy() >= min_deviasi_persen)
+            # Tender kecil: pembanding = HPS itu sendiri (120% & 20% HPS tetap terdeteksi walau z rendah)
+            sedikit_penawar = (seri_rasio.groupby(kunci_item).transform('count') < min_penyedia_z).to_numpy()
+            with np.errstate(invalid='ignore'):
+                timpang_hps = sedikit_penawar & (np.abs(rasio - 100) >= min_deviasi_persen)
+            df_eval['Harga Timpang'] = ada_di_hps & (timpang_z | timpang_hps)
+
+            # 4. RINGKASAN PER PENYEDIA (SATU KALI GROUPBY)
+            df_eval['_oe_cocok'] = np.where(ada_di_hps, df_eval['Total Harga_OE'], 0.0)
+            df_eval['_tawar_cocok'] = np.where(ada_di_hps, penawaran, 0.0)
+            df_eval['_item_cocok'] = np.where(ada_di_hps, kunci_item, np.nan)
+            grup = df_eval.groupby(kolom_penyedia, sort=False)
+            ringkasan = grup.agg(
+                Total_Penawaran_Rp=('Total Harga_Penawaran', 'sum'),
+                Total_Penawaran_HPS_Rp=('_tawar_cocok', 'sum'),
+                Total_OE_Rp=('_oe_cocok', 'sum'),
+                Jumlah_Item=('Nama Pekerjaan', 'size'),
+                Item_Cocok_HPS=('_item_cocok', 'nunique'),
+                Item_Timpang=('Harga Timpang', 'sum'),
+            )
+            status = pd.crosstab(df_eval[kolom_penyedia], df_eval['Status Evaluasi'])
+            ringkasan = ringkasan.join(status).fillna(0)
+
+            ringkasan['Item_Tidak_Ditawar'] = len(oe) - ringkasan['Item_Cocok_HPS']
+            # Pembanding = TOTAL HPS penuh (penawaran parsial tidak boleh terlihat "lebih murah")
+            with np.errstate(divide='ignore', invalid='ignore'):
+                rasio_total = ringkasan['Total_Penawaran_HPS_Rp'] / harga_oe.sum() * 100
+            ringkasan['Rasio_Penawaran_Total'] = rasio_total.round(2)
+            ringkasan['Rekomendasi_Panitia'] = np.select(
+                [ringkasan['Item_Tidak_Ditawar'] > 0, rasio_total > self.batas_atas_wajar * 100,
+                 rasio_total < self.batas_bawah_wajar * 100, ringkasan['Item_Timpang'] > 0],
+                ["TENDER DITOLAK (Penawaran Tidak Lengkap)", "TENDER DITOLAK (Melebihi Total HPS)",
+                 "TAHAN (Wajib Klarifikasi Kewajaran Harga/Dumping)", "TAHAN (Klarifikasi Harga Timpang)"],
+                default="TENDER DITERIMA"
+            )
+            # Peringkat hanya untuk penawaran lengkap & diterima; sisanya tanpa peringkat (NA)
+            diterima = ringkasan['Rekomendasi_Panitia'] == "TENDER DITERIMA"
+            ringkasan['Peringkat'] = ringkasan['Total_Penawaran_Rp'].where(diterima).rank(method='min').astype('Int64')
+            ringkasan = ringkasan.sort_values(['Peringkat', 'Total_Penawaran_Rp'], na_position='last').reset_index()
+
+            return {
+                "Jumlah_Penyedia": len(ringkasan),
+                "Jumlah_Item_HPS": len(oe),
+                "Total_OE_Rp": float(harga_oe.sum()),
+                "Ringkasan_Penyedia": ringkasan,
+                "Detail_Evaluasi": df_eval.drop(columns=['_oe_cocok', '_tawar_cocok', '_item_cocok'])
+            }
+        except Exception as e:
+            return {"error": f"Gagal mengevaluasi tender massal: {str(e)}"}
+
     # ==========================================
     # 2. AUTO-DRAFTING SURAT PERINTAH KERJA (SPK)
     # ==========================================
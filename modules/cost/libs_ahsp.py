@@ -73,9 +73,10 @@ class AHSP_Engine:
         # ======================================================
         self.koefisien = {**self.koefisien_ck, **self.koefisien_bm, **self.koefisien_sda}
 
-    def hitung_hsp(self, kode_analisa, harga_bahan_dasar, harga_upah_dasar, bidang="Cipta Karya"):
+    def resolve_analisa(self, kode_analisa, bidang="Cipta Karya"):
         """
-        Kecerdasan Pemilihan Koefisien berdasarkan Bidang Proyek
+        Mencari data koefisien untuk sebuah kode analisa (dengan fallback kecocokan kata).
+        Returns: (kode_terpakai, data) atau (None, None) jika tidak ditemukan.
         """
         # 1. Tentukan kamus mana yang mau dipakai
         if bidang == "Bina Marga":
@@ -97,27 +98,53 @@ class AHSP_Engine:
                 if target_kode in self.koefisien:
                     db_aktif = self.koefisien
                 else:
-                    return 0 
+                    return None, None
+            
+        return target_kode, db_aktif[target_kode]
+
+    def kunci_harga_bahan(self, item):
+        """
+        Menerjemahkan nama komponen bahan (misal 'Semen (kg)') ke kunci kamus harga dasar.
+        Returns: (kunci, harga_default)
+        """
+        key_clean = item.split(" (")[0].lower()
+        if "semen" in key_clean: return 'semen', 0
+        elif "pasir" in key_clean: return 'pasir beton', 0 # Sesuaikan dengan penamaan BPS
+        elif "split" in key_clean: return 'kerikil', 0
+        elif "excavator" in key_clean: return 'sewa excavator', 500000
+        return key_clean, 0
+
+    def komponen_harga(self, kode_analisa, bidang="Cipta Karya"):
+        """
+        Daftar sumber daya pembentuk HSP: [(jenis, kunci_harga, koefisien, harga_default), ...]
+        jenis = 'bahan' (dibaca dari harga_bahan_dasar) atau 'upah' (dari harga_upah_dasar).
+        """
+        _, data = self.resolve_analisa(kode_analisa, bidang)
+        if data is None: return []
+        
+        komponen = []
+        for item, koef in data['bahan'].items():
+            kunci, default = self.kunci_harga_bahan(item)
+            komponen.append(('bahan', kunci, koef, default))
+        for item, koef in data['upah'].items():
+            komponen.append(('upah', item.lower(), koef, 0))
+        return komponen
+
+    def hitung_hsp(self, kode_analisa, harga_bahan_dasar, harga_upah_dasar, bidang="Cipta Karya"):
+        """
+        Kecerdasan Pemilihan Koefisien berdasarkan Bidang Proyek
+        """
+        komponen = self.komponen_harga(kode_analisa, bidang)
+        if not komponen: return 0
             
-        data = db_aktif[target_kode]
         total_bahan = 0
         total_upah = 0
         
         # 3. Eksekusi Perhitungan
-        for item, koef in data['bahan'].items():
-            key_clean = item.split(" (")[0].lower()
-            h_satuan = 0
-            if "semen" in key_clean: h_satuan = harga_bahan_dasar.get('semen', 0)
-            elif "pasir" in key_clean: h_satuan = harga_bahan_dasar.get('pasir beton', 0) # Sesuaikan dengan penamaan BPS
-            elif "split" in key_clean: h_satuan = harga_bahan_dasar.get('kerikil', 0)
-            elif "excavator" in key_clean: h_satuan = harga_bahan_dasar.get('sewa excavator', 500000)
-            else: h_satuan = harga_bahan_dasar.get(key_clean, 0)
-            
-            total_bahan += koef * h_satuan
-            
-        for item, koef in data['upah'].items():
-            h_upah = harga_upah_dasar.get(item.lower(), 0)
-            total_upah += koef * h_upah
+        for jenis, kunci, koef, default in komponen:
+            if jenis == 'bahan':
+                total_bahan += koef * harga_bahan_dasar.get(kunci, default)
+            else:
+                total_upah += koef * harga_upah_dasar.get(kunci, default)
             
         return total_bahan + total_upah
-
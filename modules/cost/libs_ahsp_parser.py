@@ -0,0 +1,215 @@
+# ==============================================================================
+# 📄 NAMA FILE: libs_ahsp_parser.py
+# 📍 LOKASI: modules/cost/libs_ahsp_parser.py
+# 🛠️ FUNGSI: Parser AHSP Excel (State Machine Tervektorisasi, Tanpa iterrows)
+# ==============================================================================
+
+import numpy as np
+import pandas as pd
+
+# Pola Kode Analisa PUPR (contoh: 2.2.1.3a)
+POLA_KODE_AHSP = r'^\d+(\.\d+)+[a-zA-Z]?$'
+# Pola Satuan Induk dari Uraian (contoh: "1 m3 Galian Tanah")
+POLA_SATUAN_INDUK = r"1\s*(m3|m2|m'|m|bh|buah|unit|set|ls|titik|kg|ton)"
+KATA_URAIAN_INDUK = ["1 m", "1 bh", "1 titik", "1 unit", "1 kg", "1 ton", "1 ls", "1 set"]
+HURUF_SEKSI = ['A', 'B', 'C', 'D', 'E', 'F']
+# Literal float yang diterima float() (dipakai untuk konversi massal yang presisinya identik)
+POLA_ANGKA = r'[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?'
+
+
+def clean_number_series(series):
+    """
+    Pembersih angka kolom-per-kolom (kebal koma, titik, NaN, dan Rp).
+    Input: Series teks (hasil str(x).strip()). Output: Series float (gagal parse = 0.0).
+    """
+    s = series.astype(object).where(series.notna(), '').astype(str)
+    s = s.str.replace('Rp', '', regex=False).str.replace(' ', '', regex=False).str.strip()
+    kosong = s.str.lower().isin(['', '-', 'nan'])
+
+    # Adaptasi desimal gaya Indonesia vs Internasional
+    ada_koma = s.str.contains(',', regex=False)
+    ada_titik = s.str.contains('.', regex=False)
+    gaya_indo = ada_koma & ada_titik
+    s = s.mask(gaya_indo, s.str.replace('.', '', regex=False))
+    s = s.mask(ada_koma, s.str.replace(',', '.', regex=False))
+
+    # astype(float) memakai strtod yang sama dengan float(), sehingga hasilnya identik per bit
+    valid = s.str.fullmatch(POLA_ANGKA) & ~kosong
+    angka = pd.Series(0.0, index=series.index)
+    angka[valid] = s[valid].astype(float)
+    return angka
+
+
+def _teks_matriks(df_excel):
+    """Mengubah seluruh sel menjadi teks ter-strip (NaN -> 'nan'), setara str(x).strip()."""
+    df_obj = df_excel.astype(object)
+    df_obj = df_obj.where(df_excel.notna(), 'nan')
+    return df_obj.astype(str).apply(lambda kolom: kolom.str.strip())
+
+
+def _peta_kolom_per_segmen(df_lower, mask_header):
+    """
+    Setiap baris header ('Uraian', 'Sat', 'Koefisien', ...) mengubah posisi kolom untuk
+    baris-baris sesudahnya. Hanya baris header yang diiterasi (jumlahnya sedikit).
+    Returns: list posisi kolom per segmen [(idx_uraian, idx_sat, idx_koef, idx_hs, idx_jml), ...]
+    """
+    idx = [1, 2, 3, 4, 5]  # Default Indeks Kolom
+    peta = [tuple(idx)]
+    for nilai_header in df_lower[mask_header].itertuples(index=False):
+        for i, val in enumerate(nilai_header):
+            if "uraian" in val: idx[0] = i
+            elif "sat" in val or "satuan" in val: idx[1] = i
+            elif "koefisien" in val: idx[2] = i
+            elif "harga" in val and "jumlah" not in val: idx[3] = i
+            elif "jumlah" in val: idx[4] = i
+        peta.append(tuple(idx))
+    return peta
+
+
+def _ambil_kolom(df_teks, segmen, peta, posisi):
+    """Mengambil satu kolom logis (misal 'Uraian') yang posisinya bisa berbeda antar segmen."""
+    n_kolom = df_teks.shape[1]
+    kolom_idx = np.array([p[posisi] for p in peta])[segmen]
+    valid = kolom_idx < n_kolom
+    nilai = df_teks.to_numpy()
+    hasil = np.full(len(df_teks), 'nan', dtype=object)
+    baris = np.nonzero(valid)[0]
+    hasil[baris] = nilai[baris, kolom_idx[baris]]
+    return pd.Series(hasil, index=df_teks.index, dtype=object)
+
+
+def parse_ahsp_sheet(df_excel, nama_kategori):
+    """
+    Mesin State Machine + Dynamic Header Mapper (Versi Tervektorisasi).
+    Klasifikasi baris (Header, Induk Analisa, Seksi A/B/C/D, Rincian, Harga Satuan Pekerjaan)
+    dihitung sekaligus dengan operasi string pandas, lalu konteks induk di-forward-fill.
+    Output: list of dict siap disuntik ke tabel ahsp_master.
+    """
+    if df_excel is None or df_excel.empty:
+        return []
+
+    df_teks = _teks_matriks(df_excel)
+    df_lower = df_teks.apply(lambda kolom: kolom.str.lower())
+    n_kolom = df_teks.shape[1]
+
+    # =======================================================
+    # 1. KLASIFIKASI BARIS HEADER & SEGMEN POSISI KOLOM
+    # =======================================================
+    mask_header = ((df_lower == "uraian") | (df_lower == "uraian pekerjaan")).any(axis=1).to_numpy()
+    segmen = np.cumsum(mask_header)
+    peta = _peta_kolom_per_segmen(df_lower, mask_header)
+
+    col_no = df_teks.iloc[:, 0] if n_kolom > 0 else pd.Series('nan', index=df_teks.index)
+    col_uraian = _ambil_kolom(df_teks, segmen, peta, 0)
+    col_satuan = _ambil_kolom(df_teks, segmen, peta, 1)
+    koef = clean_number_series(_ambil_kolom(df_teks, segmen, peta, 2))
+    hs = clean_number_series(_ambil_kolom(df_teks, segmen, peta, 3))
+    jml_ada = np.array([p[4] for p in peta])[segmen] < n_kolom
+    jml = pd.Series(np.where(jml_ada, clean_number_series(_ambil_kolom(df_teks, segmen, peta, 4)), koef * hs), index=df_teks.index)
+
+    # Amankan baris yang terlalu pendek (indeks kolom melewati lebar sheet)
+    terlalu_pendek = np.array([n_kolom <= max(p[:4]) for p in peta])[segmen]
+
+    uraian_lower = col_uraian.str.lower()
+    uraian_upper = col_uraian.str.upper()
+    no_upper = col_no.str.upper()
+
+    aktif = ~mask_header & ~terlalu_pendek & ~uraian_lower.isin(['', 'nan']).to_numpy()
+
+    # =======================================================
+    # 2. DETEKSI INDUK PEKERJAAN (KODE AHSP / JUDUL PEKERJAAN)
+    # =======================================================
+    is_kode = col_no.str.match(POLA_KODE_AHSP).fillna(False).to_numpy()
+    is_uraian_utama = np.zeros(len(df_teks), dtype=bool)
+    for kata in KATA_URAIAN_INDUK:
+        is_uraian_utama |= uraian_lower.str.contains(kata, regex=False).to_numpy()
+    is_induk = aktif & (is_kode | (is_uraian_utama & ~no_upper.isin(HURUF_SEKSI).to_numpy()))
+
+    # =======================================================
+    # 3. DETEKSI JENIS KOMPONEN (Tenaga Kerja, Bahan, Alat)
+    # =======================================================
+    sisa = aktif & ~is_induk
+    seksi_a = (no_upper == 'A') | uraian_upper.str.contains("TENAGA KERJA", regex=False)
+    seksi_b = (no_upper == 'B') | uraian_upper.str.contains("BAHAN", regex=False)
+    seksi_c = (no_upper == 'C') | uraian_upper.str.contains("PERALATAN", regex=False)
+    seksi_d = (no_upper == 'D') | uraian_upper.str.contains("JUMLAH", regex=False)
+    jenis_seksi = np.select(
+        [seksi_a.to_numpy(), seksi_b.to_numpy(), seksi_c.to_numpy(), seksi_d.to_numpy()],
+        ["Tenaga Kerja", "Bahan", "Peralatan", ""], default=None
+    )
+    is_seksi = sisa & pd.notna(jenis_seksi)
+    is_rincian = sisa & ~is_seksi
+    is_final = is_rincian & ((no_upper == 'F') | uraian_upper.str.contains("HARGA SATUAN PEKERJAAN", regex=False)).to_numpy()
+
+    # =======================================================
+    # 4. FORWARD-FILL KONTEKS INDUK (STATE SESUDAH BARIS -> SEBELUM BARIS)
+    # =======================================================
+    index_label = pd.Series(df_teks.index.astype(str), index=df_teks.index)
+    kode_induk = col_no.where(pd.Series(is_kode, index=df_teks.index), "AUTO-" + index_label)
+    satuan_induk = uraian_lower.str.extract(POLA_SATUAN_INDUK, expand=False).fillna("Ls")
+
+    def state_sebelum(nilai_induk, nilai_final, awal):
+        sesudah = pd.Series(np.nan, index=df_teks.index, dtype=object)
+        sesudah[is_induk] = nilai_induk[is_induk] if isinstance(nilai_induk, pd.Series) else nilai_induk
+        if nilai_final is not None:
+            sesudah[is_final] = nilai_final
+        return sesudah.ffill().shift(1).fillna(awal)
+
+    state_kode = state_sebelum(kode_induk, "-", "-")
+    state_uraian = state_sebelum(col_uraian, "", "")
+    state_satuan = state_sebelum(satuan_induk, None, "")
+
+    jenis_sesudah = pd.Series(np.nan, index=df_teks.index, dtype=object)
+    jenis_sesudah[is_induk] = ""
+    jenis_sesudah[is_seksi] = jenis_seksi[is_seksi]
+    state_jenis = jenis_sesudah.ffill().shift(1).fillna("")
+
+    # =======================================================
+    # 5. REKAM RINCIAN (ANAK) & HARGA SATUAN PEKERJAAN (INDUK)
+    # =======================================================
+    mask_anak = is_rincian & (state_jenis != "").to_numpy() & (state_uraian != "").to_numpy() & (koef > 0).to_numpy()
+    satuan_anak = col_satuan.str.slice(0, 20).where(col_satuan.str.lower() != 'nan', "-")
+
+    df_anak = pd.DataFrame({
+        "kategori": str(nama_kategori)[:100],
+        "kode_ahsp": state_kode.astype(str).str.slice(0, 50),
+        "uraian_pekerjaan": col_uraian.str.slice(0, 500),
+        "satuan": satuan_anak,
+        "koefisien": koef,
+        "harga_satuan": hs,
+        "jumlah_harga": jml,
+        "jenis_komponen": state_jenis,
+        "_baris": np.arange(len(df_teks)),
+        "_urutan": 0
+    })[mask_anak]
+
+    # Cari harga dari kanan ke kiri (hanya pada baris final yang jumlahnya sedikit)
+    harga_total = pd.Series(0.0, index=df_teks.index)
+    if is_final.any():
+        angka_final = df_teks[is_final].apply(clean_number_series)
+        positif = angka_final.to_numpy() > 0
+        ada = positif.any(axis=1)
+        kolom_kanan = positif.shape[1] - 1 - np.argmax(positif[:, ::-1], axis=1)
+        nilai = angka_final.to_numpy()[np.arange(len(angka_final)), kolom_kanan]
+        harga_total[is_final] = np.where(ada, nilai, 0.0)
+
+    mask_induk = is_final & (state_uraian != "").to_numpy() & (harga_total > 0).to_numpy()
+    df_induk = pd.DataFrame({
+        "kategori": str(nama_kategori)[:100],
+        "kode_ahsp": state_kode.astype(str).str.slice(0, 50),
+        "uraian_pekerjaan": state_uraian.astype(str).str.slice(0, 500),
+        "satuan": state_satuan.astype(str).str.slice(0, 20),
+        "koefisien": None,
+        "harga_satuan": harga_total,
+        "jumlah_harga": harga_total,
+        "jenis_komponen": "Utama",
+        "_baris": np.arange(len(df_teks)),
+        "_urutan": 1
+    })[mask_induk]
+
+    # Urutan keluaran sama dengan pembacaan baris demi baris
+    df_hasil = pd.concat([df_anak, df_induk])
+    df_hasil = df_hasil.sort_values(['_baris', '_urutan'], kind='stable').drop(columns=['_baris', '_urutan'])
+
+    df_hasil = df_hasil.astype(object).where(df_hasil.notna(), None)
+    return df_hasil.to_dict(orient='records')
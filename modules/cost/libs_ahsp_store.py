@@ -0,0 +1,217 @@
+# ==============================================================================
+# 📄 NAMA FILE: libs_ahsp_store.py
+# 📍 LOKASI: modules/cost/libs_ahsp_store.py
+# 🛠️ FUNGSI: Adapter Penyimpanan AHSP (Supabase / SQLite Lokal) + Upload Paralel Ber-Retry
+# ==============================================================================
+
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Kunci idempoten: baris dengan kombinasi ini ditimpa, bukan diduplikasi
+KUNCI_UPSERT = ("kode_ahsp", "kategori", "uraian_pekerjaan")
+KOLOM_AHSP = (
+    "kategori", "kode_ahsp", "uraian_pekerjaan", "satuan",
+    "koefisien", "harga_satuan", "jumlah_harga", "jenis_komponen"
+)
+
+# PRASYARAT SUPABASE: on_conflict PostgREST wajib punya UNIQUE constraint pada KUNCI_UPSERT.
+# Jalankan SEKALI di Supabase SQL Editor (langkah 1 menghapus baris kembar lama secara eksplisit).
+DDL_SUPABASE = """
+-- 1. Baris kembar hasil upload lama (sisakan id terbesar) - cek dulu jumlahnya dengan SELECT yang sama
+DELETE FROM public.{tabel} a USING public.{tabel} b
+WHERE a.kode_ahsp = b.kode_ahsp AND a.kategori = b.kategori
+  AND a.uraian_pekerjaan = b.uraian_pekerjaan AND a.id < b.id;
+
+-- 2. Constraint yang dipakai upsert(on_conflict="kode_ahsp,kategori,uraian_pekerjaan")
+ALTER TABLE public.{tabel}
+  ADD CONSTRAINT uq_{tabel}_upsert UNIQUE (kode_ahsp, kategori, uraian_pekerjaan);
+"""
+# Error yang layak dicoba ulang: HTTP 429 / 5xx dan putus koneksi / timeout
+STATUS_SEMENTARA = {429} | set(range(500, 600))
+NAMA_ERROR_JARINGAN = {
+    'TimeoutException', 'ConnectTimeout', 'ReadTimeout', 'WriteTimeout', 'PoolTimeout',
+    'NetworkError', 'ConnectError', 'ReadError', 'WriteError', 'RemoteProtocolError',
+}
+
+
+# ==========================================
+# 1. ADAPTER PENYIMPANAN
+# ==========================================
+class AHSP_Store_Supabase:
+    """
+    Adapter tabel ahsp_master di Supabase (PostgREST upsert).
+    Prasyarat: UNIQUE constraint pada KUNCI_UPSERT -> lihat ddl() / DDL_SUPABASE.
+    """
+    def __init__(self, client, nama_tabel="ahsp_master"):
+        self.client = client
+        self.nama_tabel = nama_tabel
+
+    def ddl(self):
+        """SQL migrasi (dijalankan manual di Supabase SQL Editor) untuk tabel ini"""
+        return DDL_SUPABASE.format(tabel=self.nama_tabel)
+
+    def upsert_chunk(self, chunk):
+        try:
+            self.client.table(self.nama_tabel).upsert(chunk, on_conflict=",".join(KUNCI_UPSERT)).execute()
+        except Exception as e:
+            # 42P10: tidak ada unique constraint yang cocok dengan ON CONFLICT (prasyarat belum dijalankan)
+            if getattr(e, 'code', None) == '42P10' or '42P10' in str(e):
+                raise RuntimeError(
+                    f"Tabel {self.nama_tabel} belum punya UNIQUE ({', '.join(KUNCI_UPSERT)}). "
+                    f"Jalankan AHSP_Store_Supabase.ddl() di Supabase SQL Editor. Detail: {e}"
+                ) from e
+            raise
+
+
+class AHSP_Store_SQLite:
+    """
+    Pengganti lokal (offline) untuk tabel ahsp_master.
+    Perilaku upsert meniru PostgREST: konflik pada KUNCI_UPSERT -> baris diperbarui.
+    """
+    def __init__(self, db_path=":memory:", nama_tabel="ahsp_master"):
+        self.db_path = db_path
+        self.nama_tabel = nama_tabel
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._init_tabel()
+
+    def _init_tabel(self):
+        with self._lock, self.conn:
+            self.conn.execute(f'''
+                CREATE TABLE IF NOT EXISTS {self.nama_tabel} (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    kategori TEXT,
+                    kode_ahsp TEXT,
+                    uraian_pekerjaan TEXT,
+                    satuan TEXT,
+                    koefisien REAL,
+                    harga_satuan REAL,
+                    jumlah_harga REAL,
+                    jenis_komponen TEXT
+                )
+            ''')
+            self.conn.execute(
+                f"CREATE UNIQUE INDEX IF NOT EXISTS idx_{self.nama_tabel}_upsert "
+                f"ON {self.nama_tabel} ({', '.join(KUNCI_UPSERT)})"
+            )
+
+    def upsert_chunk(self, chunk):
+        kolom = ", ".join(KOLOM_AHSP)
+        tanda = ", ".join("?" for _ in KOLOM_AHSP)
+        update = ", ".join(f"{k} = excluded.{k}" for k in KOLOM_AHSP if k not in KUNCI_UPSERT)
+        sql = (
+            f"INSERT INTO {self.nama_tabel} ({kolom}) VALUES ({tanda}) "
+            f"ON CONFLICT ({', '.join(KUNCI_UPSERT)}) DO UPDATE SET {update}"
+        )
+        with self._lock, self.conn:
+            self.conn.executemany(sql, [tuple(baris.get(k) for k in KOLOM_AHSP) for baris in chunk])
+
+    def hitung_baris(self):
+        with self._lock:
+            return self.conn.execute(f"SELECT COUNT(*) FROM {self.nama_tabel}").fetchone()[0]
+
+
+# ==========================================
+# 2. UPLOADER PARALEL + EXPONENTIAL BACKOFF
+# ==========================================
+def _dedup_kunci(data):
+    """
+    Satu perintah upsert tidak boleh menyentuh kunci yang sama dua kali (ditolak Postgres),
+    jadi baris dengan kunci kembar disatukan lebih dulu (yang terakhir menang, urutan awal tetap).
+    Return: (baris unik, daftar kunci yang punya kembaran) -> dilaporkan, bukan dibuang diam-diam.
+    """
+    unik = {}
+    kembar = {}
+    for baris in data:
+        kunci = tuple(baris.get(k) for k in KUNCI_UPSERT)
+        if kunci in unik:
+            kembar[kunci] = None
+        unik[kunci] = baris
+    return list(unik.values()), list(kembar)
+
+
+def _error_sementara(e):
+    """
+    True jika kegagalan bersifat sementara (timeout, koneksi putus, HTTP 429 / 5xx, SQLite terkunci).
+    Error data / skema (4xx lain, constraint, kolom salah) langsung dilaporkan tanpa retry.
+    """
+    if isinstance(e, (TimeoutError, ConnectionError)):
+        return True
+    if isinstance(e, sqlite3.OperationalError):
+        return 'locked' in str(e) or 'busy' in str(e)
+    if any(k.__name__ in NAMA_ERROR_JARINGAN for k in type(e).__mro__):
+        return True
+    for status in (getattr(e, 'status_code', None), getattr(getattr(e, 'response', None), 'status_code', None),
+                   getattr(e, 'code', None)):
+        try:
+            if int(status) in STATUS_SEMENTARA:
+                return True
+        except (TypeError, ValueError):
+            continue
+    return False
+
+
+def upload_bulk(store, data, chunk_size=500, max_workers=4, max_retry=4, backoff_dasar=0.5, callback=None):
+    """
+    Mengirim data ke store dalam potongan (chunk) secara paralel lewat thread pool terbatas.
+    Chunk yang gagal karena error sementara (timeout, 429, 5xx) dicoba ulang dengan jeda
+    eksponensial (0.5s, 1s, 2s, ...); error lain langsung dicatat sebagai chunk gagal.
+    callback(selesai, total_chunk) opsional, misal untuk st.progress.
+    Output: Dictionary laporan throughput & kegagalan. Total_Baris = baris yang dikirim (setelah
+    kunci kembar disatukan); Baris_Kembar_Dibuang = Baris_Input - Total_Baris.
+    """
+    t_mulai = time.perf_counter()
+    data = list(data)
+    jumlah_input = len(data)
+    data, kunci_kembar = _dedup_kunci(data)
+    chunks = [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
+
+    laporan = {
+        "Baris_Input": jumlah_input,
+        "Baris_Kembar_Dibuang": jumlah_input - len(data),
+        "Kunci_Kembar": [dict(zip(KUNCI_UPSERT, k)) for k in kunci_kembar],
+        "Total_Baris": len(data),
+        "Total_Chunk": len(chunks),
+        "Chunk_Sukses": 0,
+        "Chunk_Gagal": 0,
+        "Baris_Gagal": 0,
+        "Jumlah_Retry": 0,
+        "Durasi_Detik": 0.0,
+        "Baris_per_Detik": 0.0,
+        "Error": []
+    }
+    if not chunks:
+        return laporan
+
+    def kirim(chunk):
+        retry = 0
+        while True:
+            try:
+                store.upsert_chunk(chunk)
+                return retry, None
+            except Exception as e:
+                if retry >= max_retry or not _error_sementara(e):
+                    return retry, str(e)
+                time.sleep(backoff_dasar * (2 ** retry))
+                retry += 1
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks)))) as pool:
+        futures = {pool.submit(kirim, chunk): len(chunk) for chunk in chunks}
+        for selesai, fut in enumerate(as_completed(futures), start=1):
+            retry, error = fut.result()
+            laporan["Jumlah_Retry"] += retry
+            if error is None:
+                laporan["Chunk_Sukses"] += 1
+            else:
+                laporan["Chunk_Gagal"] += 1
+                laporan["Baris_Gagal"] += futures[fut]
+                laporan["Error"].append(error)
+            if callback: callback(selesai, len(chunks))
+
+    durasi = time.perf_counter() - t_mulai
+    laporan["Durasi_Detik"] = round(durasi, 3)
+    baris_sukses = laporan["Total_Baris"] - laporan["Baris_Gagal"]
+    laporan["Baris_per_Detik"] = round(baris_sukses / durasi, 1) if durasi > 0 else 0.0
+    return laporan
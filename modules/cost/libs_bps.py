@@ -4,39 +4,143 @@
 # 🛠️ FUNGSI: Membaca Centralized Cache dari Database Internal (Zero Latency)
 # ==============================================================================
 
-import pandas as pd
+import os
+import queue
 import sqlite3
+import threading
+from contextlib import contextmanager
+
+import pandas as pd
 import streamlit as st
 
+
+class Pool_Koneksi_Baca:
+    """
+    Pool koneksi SQLite read-only (mode=ro) yang dipakai bersama semua sesi.
+    Menghindari biaya sqlite3.connect/close di setiap render RAB.
+    """
+    def __init__(self, db_path, ukuran=4):
+        self.db_path = db_path
+        self.ukuran = ukuran
+        self._antrean = queue.LifoQueue(maxsize=ukuran)
+        self._dibuat = 0
+        self._lock = threading.Lock()
+
+    def _buka(self):
+        uri = f"file:{os.path.abspath(self.db_path)}?mode=ro"
+        return sqlite3.connect(uri, uri=True, check_same_thread=False)
+
+    @contextmanager
+    def pinjam(self):
+        try:
+            conn = self._antrean.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                buat_baru = self._dibuat < self.ukuran
+                if buat_baru: self._dibuat += 1
+            if buat_baru:
+                try:
+                    conn = self._buka()
+                except Exception:
+                    with self._lock: self._dibuat -= 1
+                    raise
+            else:
+                conn = self._antrean.get()
+        try:
+            yield conn
+        finally:
+            self._antrean.put(conn)
+
+
+# Cache tingkat proses: {path_db: pool} dan {(path_db, provinsi): (versi, DataFrame)}
+_POOL = {}
+_CACHE_PROVINSI = {}
+_TANDA_FILE = {}
+_LOCK_CACHE = threading.Lock()
+
+
+def _get_pool(db_path):
+    kunci = os.path.abspath(db_path)
+    with _LOCK_CACHE:
+        if kunci not in _POOL:
+            _POOL[kunci] = Pool_Koneksi_Baca(kunci)
+        return _POOL[kunci]
+
+
+def _tanda_file(db_path):
+    """Sidik file DB + WAL (mtime & ukuran). Hanya stat(), tidak membaca isi file."""
+    tanda = []
+    for path in (db_path, db_path + "-wal"):
+        try:
+            st_file = os.stat(path)
+            tanda.append((st_file.st_mtime_ns, st_file.st_size))
+        except FileNotFoundError:
+            tanda.append(None)
+    return tuple(tanda)
+
+
+def clear_bps_cache():
+    """Kosongkan cache harga regional (misal setelah sinkronisasi manual)."""
+    with _LOCK_CACHE:
+        _CACHE_PROVINSI.clear()
+        _TANDA_FILE.clear()
+
+
 class BPS_Database_Engine:
     """
     Engine Klien Pasif.
     Hanya mengeksekusi Query SQL ke database sentral. Tidak ada interaksi HTTP.
     Sesuai dengan arsitektur SaaS yang *scalable* dan anti-lag.
+    Read-through cache: DataFrame per provinsi disimpan di RAM dan hanya dimuat ulang
+    jika versi data (MAX(last_updated)) berubah.
     """
     def __init__(self, db_path='enginex_core.db'):
         self.db_path = db_path
 
+    def _muat_provinsi(self, provinsi):
+        """
+        Mengembalikan DataFrame provinsi dari cache, atau memuat ulang dari SQLite.
+        File DB yang tidak berubah (mtime sama) -> langsung dari RAM tanpa query sama sekali.
+        """
+        path = os.path.abspath(self.db_path)
+        kunci = (path, provinsi)
+        tanda = _tanda_file(path)
+
+        with _LOCK_CACHE:
+            tersimpan = _CACHE_PROVINSI.get(kunci)
+            if tersimpan is not None and _TANDA_FILE.get(kunci) == tanda:
+                return tersimpan[1]
+
+        with _get_pool(path).pinjam() as conn:
+            versi = conn.execute(
+                "SELECT MAX(last_updated), COUNT(*) FROM cache_harga_material WHERE provinsi = ?", (provinsi,)
+            ).fetchone()
+            if tersimpan is not None and tersimpan[0] == versi:
+                df_cache = tersimpan[1]
+            else:
+                # Ambil data spesifik wilayah untuk klien yang sedang aktif
+                query = "SELECT * FROM cache_harga_material WHERE provinsi = ?"
+                df_cache = pd.read_sql(query, conn, params=(provinsi,))
+
+        with _LOCK_CACHE:
+            _CACHE_PROVINSI[kunci] = (versi, df_cache)
+            _TANDA_FILE[kunci] = tanda
+        return df_cache
+
     def get_regional_prices(self, provinsi="Lampung"):
         """
-        Menarik data seketika (instant fetch) dari SQLite.
+        Menarik data seketika (instant fetch) dari cache RAM / SQLite.
         """
         try:
-            # Buka koneksi statis ke database terpusat
-            conn = sqlite3.connect(self.db_path)
-            
-            # Ambil data spesifik wilayah untuk klien yang sedang aktif
-            query = "SELECT * FROM cache_harga_material WHERE provinsi = ?"
-            df_cache = pd.read_sql(query, conn, params=(provinsi,))
-            
-            conn.close()
+            df_cache = self._muat_provinsi(provinsi)
             
             if df_cache.empty:
                 # Fallback proteksi jika Cron Job di server belum pernah berjalan
                 st.warning(f"⚠️ Cache Harga Material untuk wilayah '{provinsi}' belum tersedia. Menunggu sinkronisasi Cron-Job oleh Administrator.")
                 return pd.DataFrame()
                 
-            return df_cache
+            # Salinan agar pemanggil tidak merusak cache bersama
+            return df_cache.copy()
 
         except sqlite3.OperationalError:
             # Handle jika tabel belum dibuat oleh backend
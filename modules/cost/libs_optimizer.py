@@ -24,68 +24,226 @@ class BeamOptimizer:
         self.h_baja = harga_satuan.get('baja', 14000)
         self.h_bekisting = harga_satuan.get('bekisting', 150000)
 
+    # Grid pencarian (sama dengan loop brute force versi awal)
+    RANGE_B = np.arange(200, 650, 50)       # Lebar b: 200mm s/d 600mm
+    N_H = len(range(300, 1050, 50))         # Maks jumlah kandidat tinggi h per balok
+    DS = 40 + 10 + 6                        # Selimut(40) + Sengkang(10) + 1/2 D_tulangan(6)
+
     def cari_dimensi_optimal(self, Mu_kNm, bentang_m):
         """
         Mencari dimensi b x h yang paling murah namun Aman secara struktur.
         Returns: List of Dictionary (Top 5 opsi terbaik)
         """
-        options = []
-        
-        # Range Lebar (b): 200mm s/d 600mm
-        range_b = range(200, 650, 50)
-        
-        # Rule of thumb tinggi balok (L/12 s/d L/15) sebagai batas bawah pencarian
-        h_min_rec = int(bentang_m * 1000 / 15) 
-        # Range Tinggi (h): Mulai dari h_min s/d 1000mm
-        range_h = range(max(300, h_min_rec), 1050, 50)
-        
-        # [CRITICAL FIX] Memanggil Class SNI 2019 yang BENAR (Sesuai file libs_sni.py)
-        engine_sni = sni.SNI_Concrete_2019(self.fc, self.fy)
-
-        # Loop Brute Force (Mencoba semua kombinasi ukuran)
-        for b in range_b:
-            for h in range_h:
-                # Filter Geometri Wajar
-                if h < b: continue # Balok pipih tidak disarankan untuk struktur utama
-                if h > 3 * b: continue # Terlalu langsing (Bahaya tekuk lateral)
-                
-                # Estimasi tinggi efektif (d)
-                ds = 40 + 10 + 6 # Selimut(40) + Sengkang(10) + 1/2 D_tulangan(6)
-                d = h - ds
-                
-                try:
-                    # Cek Kebutuhan Tulangan menggunakan Engine SNI
-                    As_req = engine_sni.hitung_tulangan_perlu(Mu_kNm, d, b)
-                except: 
-                    continue
-                
-                # Cek Rasio Tulangan (Rho)
-                rho = As_req / (b * d)
-                
-                # Filter Rho Wajar (Ekonomis)
-                if rho > 0.025: continue # Maks 2.5% (Terlalu boros besi)
-                if rho < 0.0018: continue # Min 0.18% (Minimum tulangan susut)
-                
-                # Hitung Estimasi Biaya per Meter Lari
-                vol_beton = (b/1000) * (h/1000) * 1.0 # m3
-                berat_baja = (As_req * 1.0 * 7850) / 1e6 * 1.3 # kg (Faktor 1.3 untuk overlap & tekuk)
-                luas_bekisting = (2 * (h/1000)) + (b/1000) # m2 (Kiri + Kanan + Bawah)
-                
-                biaya = (vol_beton * self.h_beton) + (berat_baja * self.h_baja) + (luas_bekisting * self.h_bekisting)
-                        
-                options.append({
-                    'b (mm)': b, 
-                    'h (mm)': h, 
-                    'As Perlu (mm2)': round(As_req, 2), 
-                    'Biaya/m': int(biaya), 
-                    'Rho (%)': round(rho * 100, 2)
-                })
+        df_opt = self.cari_dimensi_optimal_batch([Mu_kNm], [bentang_m], top_k=5)
         
         # Jika tidak ada opsi yang memenuhi syarat
-        if not options: return None
+        if df_opt.empty: return None
         
-        # Urutkan berdasarkan Biaya Termurah (Ascending)
-        df_opt = pd.DataFrame(options).sort_values(by='Biaya/m', ascending=True)
-        
-        # Kembalikan 5 opsi terbaik sebagai dictionary
-        return df_opt.head(5).to_dict('records')
+        return df_opt.drop(columns=['ID Balok', 'Peringkat']).to_dict('records')
+
+    def _evaluasi_grid(self, Mu_kNm, bentang_m):
+        """
+        Evaluasi seluruh grid (balok x b x h) sekaligus dengan broadcasting NumPy.
+        Returns: (b, h, As_req, rho, biaya, valid) masing-masing berbentuk (n_balok, n_b, n_h)
+        """
+        Mu = np.asarray(Mu_kNm, dtype=float).reshape(-1, 1, 1)
+        L = np.asarray(bentang_m, dtype=float).reshape(-1, 1, 1)
+
+        # Rule of thumb tinggi balok (L/15) sebagai batas bawah pencarian, lalu naik per 50mm s/d 1000mm
+        h_min_rec = np.trunc(L * 1000 / 15).astype(np.int64)
+        h = np.maximum(300, h_min_rec) + 50 * np.arange(self.N_H).reshape(1, 1, -1)
+        b = self.RANGE_B.reshape(1, -1, 1)
+
+        # Filter Geometri Wajar: tidak pipih (h >= b), tidak terlalu langsing (h <= 3b)
+        valid = (h < 1050) & (h >= b) & (h <= 3 * b)
+
+        # Kebutuhan tulangan (SNI_Concrete_2019.hitung_tulangan_perlu versi array)
+        d = (h - self.DS).astype(float)
+        As_req = sni.SNI_Concrete_2019(self.fc, self.fy).hitung_tulangan_perlu_array(Mu, d, b)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rho = As_req / (b * d)
+
+        # Filter Rho Wajar (Ekonomis): 0.18% s/d 2.5%
+        valid &= np.isfinite(rho) & (rho <= 0.025) & (rho >= 0.0018)
+
+        # Hitung Estimasi Biaya per Meter Lari
+        vol_beton = (b/1000) * (h/1000) * 1.0 # m3
+        berat_baja = (As_req * 1.0 * 7850) / 1e6 * 1.3 # kg (Faktor 1.3 untuk overlap & tekuk)
+        luas_bekisting = (2 * (h/1000)) + (b/1000) # m2 (Kiri + Kanan + Bawah)
+        biaya = (vol_beton * self.h_beton) + (berat_baja * self.h_baja) + (luas_bekisting * self.h_bekisting)
+
+        bentuk = valid.shape
+        return np.broadcast_to(b, bentuk), np.broadcast_to(h, bentuk), As_req, rho, biaya, valid
+
+    def cari_dimensi_optimal_batch(self, list_Mu_kNm, list_bentang_m, top_k=5, id_balok=None):
+        """
+        Mode Batch (Seluruh Gedung / Model IFC): semua balok dioptimasi dalam 1 panggilan.
+        Input: array Mu (kNm) dan bentang (m) per balok, opsional id_balok (misal GlobalId IFC).
+        Returns: DataFrame panjang [ID Balok, Peringkat, b, h, As, Biaya/m, Rho] berisi top-k per balok.
+        """
+        n_balok = len(list_Mu_kNm)
+        id_balok = list(range(n_balok)) if id_balok is None else list(id_balok)
+        kolom = ['ID Balok', 'Peringkat', 'b (mm)', 'h (mm)', 'As Perlu (mm2)', 'Biaya/m', 'Rho (%)']
+        if n_balok == 0:
+            return pd.DataFrame(columns=kolom)
+
+        b, h, As_req, rho, biaya, valid = self._evaluasi_grid(list_Mu_kNm, list_bentang_m)
+
+        # Ratakan grid per balok (urutan b lalu h, sama dengan loop lama) dan urutkan biaya termurah
+        biaya_int = np.where(valid, np.trunc(np.where(valid, biaya, 0)), np.inf).reshape(n_balok, -1)
+        urutan = np.argsort(biaya_int, axis=1, kind='stable')[:, :top_k]
+        baris = np.repeat(np.arange(n_balok), urutan.shape[1])
+        kolom_grid = urutan.ravel()
+        terpakai = np.isfinite(biaya_int[baris, kolom_grid])
+        baris, kolom_grid = baris[terpakai], kolom_grid[terpakai]
+
+        ambil = lambda arr: arr.reshape(n_balok, -1)[baris, kolom_grid]
+        peringkat = np.arange(len(baris)) - np.searchsorted(baris, baris) # baris sudah terurut per balok
+        return pd.DataFrame({
+            'ID Balok': [id_balok[i] for i in baris],
+            'Peringkat': peringkat + 1,
+            'b (mm)': ambil(b).astype(int),
+            'h (mm)': ambil(h).astype(int),
+            'As Perlu (mm2)': [round(x, 2) for x in ambil(As_req).tolist()],
+            'Biaya/m': biaya_int[baris, kolom_grid].astype(np.int64),
+            'Rho (%)': [round(x * 100, 2) for x in ambil(rho).tolist()],
+        }, columns=kolom)
+
+
+# ==========================================
+# OPTIMASI MULTI-OBJEKTIF: BIAYA vs KARBON
+# ==========================================
+try:
+    from modules.struktur.libs_sustainability import CarbonCalculator
+except ImportError:
+    from libs_sustainability import CarbonCalculator
+
+# Mutu beton kandidat: fc (MPa) -> (pengali harga, pengali emisi) relatif terhadap beton acuan (fc 25 / K-300)
+# Estimasi: kenaikan mutu = kenaikan kadar semen, sehingga harga & emisi naik lebih cepat dari kekuatan.
+MUTU_BETON_DEFAULT = {
+    20: (0.93, 0.90),
+    25: (1.00, 1.00),
+    30: (1.08, 1.12),
+    35: (1.17, 1.25),
+    40: (1.27, 1.38),
+}
+
+_CACHE_RUANG_DESAIN = {}
+_MAKS_CACHE_RUANG_DESAIN = 32
+
+
+def pareto_front(biaya, karbon):
+    """
+    Non-dominated sort 2 objektif (minimasi keduanya) dalam O(n log n):
+    urutkan biaya (lalu karbon), kemudian sapu sambil menyimpan karbon minimum sejauh ini.
+    Returns: mask boolean titik yang berada di Pareto front.
+    """
+    biaya = np.asarray(biaya, dtype=float)
+    karbon = np.asarray(karbon, dtype=float)
+    mask = np.zeros(len(biaya), dtype=bool)
+    if len(biaya) == 0:
+        return mask
+    urutan = np.lexsort((karbon, biaya))
+    karbon_urut = karbon[urutan]
+    min_sebelumnya = np.concatenate(([np.inf], np.minimum.accumulate(karbon_urut)[:-1]))
+    mask[urutan[karbon_urut < min_sebelumnya]] = True
+    return mask
+
+
+class ParetoOptimizer:
+    """
+    Penjelajah Ruang Desain Balok: Biaya/m dan Embodied Carbon/m dinilai bersamaan
+    atas grid mutu beton x b x h x rasio tulangan. Ruang desain (tidak bergantung Mu)
+    di-cache per (mutu, fy, vektor harga, faktor emisi), sehingga pertanyaan what-if klien
+    cukup memfilter kapasitas lalu mengambil Pareto front.
+    """
+    RANGE_B = np.arange(200, 650, 50)
+    RANGE_H = np.arange(300, 1050, 50)
+    RANGE_RHO = np.linspace(0.0018, 0.025, 24)
+    DS = BeamOptimizer.DS
+
+    def __init__(self, fy, harga_satuan, mutu_beton=None, faktor_emisi=None):
+        self.fy = float(fy) if float(fy) > 0 else 400.0
+        self.h_beton = harga_satuan.get('beton', 1100000)
+        self.h_baja = harga_satuan.get('baja', 14000)
+        self.h_bekisting = harga_satuan.get('bekisting', 150000)
+        self.mutu_beton = dict(mutu_beton or MUTU_BETON_DEFAULT)
+        self.ef = dict(CarbonCalculator().ef)
+        self.ef.update(faktor_emisi or {})
+
+    def _kunci_cache(self):
+        return (
+            tuple(sorted(self.mutu_beton.items())), self.fy,
+            (self.h_beton, self.h_baja, self.h_bekisting),
+            tuple(sorted(self.ef.items()))
+        )
+
+    def ruang_desain(self):
+        """
+        Seluruh kandidat (fc, b, h, rho) beserta kapasitas, biaya, dan karbon per meter lari.
+        Returns: DataFrame (di-cache, jangan diubah langsung).
+        """
+        kunci = self._kunci_cache()
+        if kunci in _CACHE_RUANG_DESAIN:
+            return _CACHE_RUANG_DESAIN[kunci]
+
+        daftar_fc = np.array(sorted(self.mutu_beton), dtype=float)
+        pengali = np.array([self.mutu_beton[fc] for fc in sorted(self.mutu_beton)], dtype=float)
+        fc, b, h, rho = np.meshgrid(daftar_fc, self.RANGE_B, self.RANGE_H, self.RANGE_RHO, indexing='ij')
+        idx_fc = np.broadcast_to(np.arange(len(daftar_fc)).reshape(-1, 1, 1, 1), fc.shape)
+
+        # Filter Geometri Wajar (sama dengan BeamOptimizer)
+        valid = (h >= b) & (h <= 3 * b)
+        fc, b, h, rho, idx_fc = fc[valid], b[valid], h[valid], rho[valid], idx_fc[valid]
+
+        # Kapasitas lentur blok Whitney: phi*Mn = 0.9 * As * fy * (d - a/2)
+        d = (h - self.DS).astype(float)
+        As = rho * b * d
+        a = (As * self.fy) / (0.85 * fc * b)
+        phi_Mn = 0.9 * As * self.fy * (d - a / 2) / 1e6  # kNm
+
+        # Kuantitas per meter lari
+        vol_beton = (b / 1000) * (h / 1000) * 1.0               # m3
+        berat_baja = (As * 1.0 * 7850) / 1e6 * 1.3              # kg (Faktor 1.3 untuk overlap & tekuk)
+        luas_bekisting = (2 * (h / 1000)) + (b / 1000)          # m2
+
+        biaya = (vol_beton * self.h_beton * pengali[idx_fc, 0]) + (berat_baja * self.h_baja) + (luas_bekisting * self.h_bekisting)
+        karbon = (vol_beton * self.ef['beton_k300'] * pengali[idx_fc, 1]) + (berat_baja * self.ef['baja']) + (luas_bekisting * self.ef['bekisting'])
+
+        df = pd.DataFrame({
+            'Mutu (fc MPa)': fc,
+            'b (mm)': b.astype(int),
+            'h (mm)': h.astype(int),
+            'Rho (%)': np.round(rho * 100, 3),
+            'As (mm2)': np.round(As, 2),
+            'phiMn (kNm)': phi_Mn,
+            'Biaya/m': biaya,
+            'Karbon (kgCO2e/m)': karbon,
+        }).sort_values('phiMn (kNm)', kind='stable').reset_index(drop=True)
+
+        if len(_CACHE_RUANG_DESAIN) >= _MAKS_CACHE_RUANG_DESAIN:
+            _CACHE_RUANG_DESAIN.pop(next(iter(_CACHE_RUANG_DESAIN)))
+        _CACHE_RUANG_DESAIN[kunci] = df
+        return df
+
+    def cari_pareto(self, Mu_kNm, bentang_m=None):
+        """
+        Pareto front Biaya vs Karbon untuk satu momen rencana.
+        bentang_m opsional: menerapkan batas bawah tinggi balok L/15.
+        Returns: DataFrame opsi non-dominated, urut dari termurah (= karbon tertinggi) ke terhijau.
+        """
+        df = self.ruang_desain()
+        # Ruang desain terurut kapasitas -> cukup potong dengan searchsorted
+        awal = np.searchsorted(df['phiMn (kNm)'].to_numpy(), Mu_kNm, side='left')
+        kandidat = df.iloc[awal:]
+        if bentang_m is not None:
+            kandidat = kandidat[kandidat['h (mm)'] >= max(300, int(bentang_m * 1000 / 15))]
+        if kandidat.empty:
+            return kandidat.copy()
+
+        mask = pareto_front(kandidat['Biaya/m'].to_numpy(), kandidat['Karbon (kgCO2e/m)'].to_numpy())
+        front = kandidat[mask].sort_values('Biaya/m', kind='stable').reset_index(drop=True)
+        front['Biaya/m'] = front['Biaya/m'].astype(np.int64)
+        front['Karbon (kgCO2e/m)'] = front['Karbon (kgCO2e/m)'].round(2)
+        front['phiMn (kNm)'] = front['phiMn (kNm)'].round(2)
+        return front
@@ -1,8 +1,96 @@
 import statistics
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+
+# ==========================================
+# CACHE HARGA BERSAMA (SATU PROSES, LINTAS SESI)
+# ==========================================
+class LRU_TTL_Cache:
+    """
+    Cache ber-batas (LRU) dengan masa berlaku (TTL) per entri, aman dipakai lintas thread.
+    Dipakai bersama oleh semua instance PriceEngine3Tier (semua sesi Streamlit dalam 1 proses).
+    """
+    def __init__(self, maxsize=4096, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            nilai, kedaluwarsa = item
+            if kedaluwarsa < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return nilai
+
+    def set(self, key, nilai):
+        with self._lock:
+            self._data[key] = (nilai, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __len__(self):
+        return len(self._data)
+
+
+_CACHE_HARGA = LRU_TTL_Cache(maxsize=4096, ttl=3600)
+
+
+def clear_price_cache():
+    """Kosongkan cache harga bersama (misal setelah Cron BPS memperbarui harga dasar)."""
+    _CACHE_HARGA.clear()
+
+
+class Material_Trie:
+    """
+    Trie karakter atas nama material dasar.
+    Mencari SEMUA nama material yang muncul sebagai substring query dengan biaya
+    sebanding panjang query (bukan jumlah material), lalu memilih yang urutannya paling awal
+    (sama persis dengan perilaku loop 'if key_bahan in query' sebelumnya).
+    """
+    def __init__(self, daftar_kunci):
+        self.akar = {}
+        for urutan, kunci in enumerate(daftar_kunci):
+            node = self.akar
+            for huruf in kunci:
+                node = node.setdefault(huruf, {})
+            node.setdefault(None, (urutan, kunci))  # Penanda akhir kata
+
+    def cari(self, query):
+        terbaik = None
+        for awal in range(len(query)):
+            node = self.akar
+            for huruf in query[awal:]:
+                node = node.get(huruf)
+                if node is None: break
+                akhir = node.get(None)
+                if akhir is not None and (terbaik is None or akhir[0] < terbaik[0]):
+                    terbaik = akhir
+            if terbaik is not None and terbaik[0] == 0: break  # Tidak mungkin ada yang lebih awal
+        return terbaik[1] if terbaik else None
+
 
 class PriceEngine3Tier:
     def __init__(self):
-        self.price_cache = {}
+        # Cache bersama lintas instance/sesi (LRU + TTL), bukan dict per instance lagi
+        self.price_cache = _CACHE_HARGA
         
         # 1. Database Indeks Kemahalan Konstruksi (IKK) BPS
         # Jakarta sebagai Baseline / Harga Dasar (Indeks 1.00)
@@ -41,38 +129,60 @@ class PriceEngine3Tier:
             "asbes": 45000,
             "papan nama": 450000
         }
+        self._trie = Material_Trie(self.base_prices_national.keys())
 
     def get_best_price(self, nama_material, lokasi="Lampung"):
         query = str(nama_material).strip().lower()
-        cache_key = f"{query}_{lokasi}" # Cache dipisah berdasarkan lokasi
+        return self._harga_query(query, lokasi)
+
+    def _harga_query(self, query, lokasi):
+        cache_key = (query, lokasi) # Cache dipisah berdasarkan lokasi
         
-        if cache_key in self.price_cache:
-            return self.price_cache[cache_key]
+        hasil = self.price_cache.get(cache_key)
+        if hasil is not None:
+            return hasil
 
         # ==========================================
         # PRIORITAS UTAMA: API BPS + IKK REGIONAL
         # ==========================================
         harga_bps, sumber_bps = self._search_bps_ikk(query, lokasi)
         if harga_bps > 0:
-            self.price_cache[cache_key] = (harga_bps, sumber_bps)
+            self.price_cache.set(cache_key, (harga_bps, sumber_bps))
             return (harga_bps, sumber_bps)
 
         # ==========================================
         # FALLBACK: MARKETPLACE SCRAPING
         # ==========================================
         harga_market, sumber_market = self._search_marketplace_median(query)
-        self.price_cache[cache_key] = (harga_market, sumber_market)
+        self.price_cache.set(cache_key, (harga_market, sumber_market))
         return (harga_market, sumber_market)
 
+    def get_prices(self, names, lokasi="Lampung"):
+        """
+        API massal: menghargai seluruh daftar material BOQ dalam 1 panggilan.
+        Nama dinormalisasi sekaligus (vektor), dan tiap nama unik hanya dicari sekali.
+        Output: DataFrame [nama_material, harga, sumber] dengan urutan sama seperti input.
+        """
+        seri_nama = pd.Series(list(names), dtype=object)
+        query = seri_nama.astype(str).str.strip().str.lower()
+        hasil_unik = {q: self._harga_query(q, lokasi) for q in query.unique()}
+
+        return pd.DataFrame({
+            "nama_material": seri_nama,
+            "harga": query.map(lambda q: hasil_unik[q][0]).astype(float),
+            "sumber": query.map(lambda q: hasil_unik[q][1]),
+        })
+
     def _search_bps_ikk(self, query, lokasi):
         """ Mencari Harga Dasar dan mengalikannya dengan IKK BPS """
         ikk = self.ikk_bps.get(lokasi, 1.00) # Jika provinsi tidak ada, pakai standar 1.00
         
-        for key_bahan, harga_dasar in self.base_prices_national.items():
-            if key_bahan in query:
-                harga_regional = harga_dasar * ikk
-                sumber = f"API BPS (Base) x IKK {lokasi} ({ikk:.2f})"
-                return harga_regional, sumber
+        # Trie: kandidat ditemukan tanpa memindai seluruh daftar material
+        key_bahan = self._trie.cari(query)
+        if key_bahan is not None:
+            harga_regional = self.base_prices_national[key_bahan] * ikk
+            sumber = f"API BPS (Base) x IKK {lokasi} ({ikk:.2f})"
+            return harga_regional, sumber
         
         return 0, ""
 
@@ -1,4 +1,5 @@
 import math
+import numpy as np
 import pandas as pd
 
 class RAB_Engine:
@@ -118,3 +119,139 @@ class RAB_Engine:
                 "Galian_Tanah": round(area_outer * panjang * 1.2, 2)
             }
         }
+
+    # =========================================
+    # 4. MODE BATCH (INVENTARIS JARINGAN IRIGASI)
+    # =========================================
+    # Satuan tiap komponen volume (untuk BOQ)
+    SATUAN_KOMPONEN = {
+        "Beton_K225": "m3", "Beton_K350": "m3", "Pasangan_Batu": "m3", "Galian_Tanah": "m3",
+        "Bekisting": "m2", "Plesteran": "m2", "Besi_Polos": "kg", "Besi_Ulir": "kg"
+    }
+
+    @staticmethod
+    def _kolom(df, nama, default=None):
+        """Ambil kolom numerik sebagai array float; pakai default jika kolom tidak ada."""
+        if nama in df.columns:
+            return pd.to_numeric(df[nama], errors='coerce').to_numpy(dtype=float)
+        if default is None:
+            raise KeyError(f"Kolom '{nama}' wajib ada pada data ruas")
+        return np.full(len(df), float(default))
+
+    def hitung_volume_saluran_beton_batch(self, df_ruas):
+        """
+        Versi array dari hitung_volume_saluran_beton untuk ribuan ruas sekaligus.
+        Input: DataFrame kolom b, h, m, panjang (tebal_cm opsional, default 15).
+        Output: DataFrame volume per ruas (indeks sama dengan input).
+        """
+        b, h, m, panjang = (self._kolom(df_ruas, k) for k in ("b", "h", "m", "panjang"))
+        t_m = self._kolom(df_ruas, "tebal_cm", 15) / 100.0
+
+        sisi_miring = h * np.sqrt(1 + m**2)
+        vol_beton = (b + 2 * sisi_miring) * t_m * panjang
+
+        lebar_galian_bawah = b + (2 * t_m) + 0.4
+        tinggi_galian = h + t_m + 0.1
+        lebar_galian_atas = lebar_galian_bawah + (2 * m * tinggi_galian)
+        vol_galian = ((lebar_galian_bawah + lebar_galian_atas) / 2) * tinggi_galian * panjang
+
+        return pd.DataFrame({
+            "Item": "Saluran Beton P=" + pd.Series(panjang, index=df_ruas.index).astype(str) + "m",
+            "Beton_K225": np.round(vol_beton, 2),
+            "Galian_Tanah": np.round(vol_galian, 2),
+            "Bekisting": np.round((2 * sisi_miring) * panjang, 2),
+            "Besi_Polos": np.round(vol_beton * 100.0, 2)
+        }, index=df_ruas.index)
+
+    def hitung_volume_terjunan_hybrid_batch(self, df_terjunan):
+        """
+        Versi array dari hitung_volume_terjunan_hybrid.
+        Input: DataFrame kolom H_total, B_saluran (n_trap opsional, default 2).
+        """
+        H_total, B_saluran = self._kolom(df_terjunan, "H_total"), self._kolom(df_terjunan, "B_saluran")
+        n_trap = self._kolom(df_terjunan, "n_trap", 2)
+
+        H_per_trap = H_total / n_trap
+        L_total = n_trap * (2.5 * H_per_trap + 1.0)
+        vol_beton = L_total * B_saluran * 0.30 + n_trap * (B_saluran * 0.4 * 0.4)
+        h_dinding_avg = H_per_trap + 0.5
+        vol_batu = 2 * (((0.3 + 0.5) / 2) * h_dinding_avg * L_total)
+
+        return pd.DataFrame({
+            "Item": "Terjunan Hybrid Multi-Step",
+            "Beton_K225": np.round(vol_beton, 2),
+            "Pasangan_Batu": np.round(vol_batu, 2),
+            "Galian_Tanah": np.round((vol_beton + vol_batu) * 1.3, 2),
+            "Besi_Polos": np.round(vol_beton * 80, 2),
+            "Plesteran": np.round(2 * L_total * h_dinding_avg, 2)
+        }, index=df_terjunan.index)
+
+    def hitung_volume_box_culvert_batch(self, df_box):
+        """
+        Versi array dari hitung_volume_box_culvert.
+        Input: DataFrame kolom b, h, panjang.
+        """
+        b, h, panjang = (self._kolom(df_box, k) for k in ("b", "h", "panjang"))
+        tebal = 0.20
+        area_outer = (b + 2*tebal) * (h + 2*tebal)
+        vol_beton = (area_outer - b * h) * panjang
+
+        return pd.DataFrame({
+            "Item": "Box Culvert " + pd.Series(b, index=df_box.index).astype(str) + "x" + pd.Series(h, index=df_box.index).astype(str) + "m",
+            "Beton_K350": np.round(vol_beton, 2),
+            "Besi_Ulir": np.round(vol_beton * 150.0, 2),
+            "Bekisting": np.round((2*b + 2*h) * panjang, 2),
+            "Galian_Tanah": np.round(area_outer * panjang * 1.2, 2)
+        }, index=df_box.index)
+
+    def hitung_boq_jaringan(self, harga_satuan, df_saluran=None, df_terjunan=None, df_box=None, izinkan_tanpa_harga=False):
+        """
+        BOQ seluruh jaringan irigasi dalam 1 panggilan:
+        volume batch semua struktur -> format panjang -> join harga satuan per komponen.
+        harga_satuan: dict {Komponen: Harga} atau DataFrame kolom [Komponen, Harga Satuan].
+        Komponen bervolume tanpa harga satuan -> {"error", "Komponen_Tanpa_Harga"}; dengan
+        izinkan_tanpa_harga=True dihitung tanpa komponen tersebut (harga NaN, tidak dianggap Rp 0).
+        Output: Dictionary {Detail (per struktur), Rekap (per komponen), Grand_Total_Rp, Komponen_Tanpa_Harga}
+        """
+        bagian = []
+        for jenis, df, fungsi in (
+            ("Saluran", df_saluran, self.hitung_volume_saluran_beton_batch),
+            ("Terjunan", df_terjunan, self.hitung_volume_terjunan_hybrid_batch),
+            ("Box Culvert", df_box, self.hitung_volume_box_culvert_batch),
+        ):
+            if df is None or len(df) == 0: continue
+            df_vol = fungsi(df)
+            df_vol.insert(0, "ID Struktur", df["ID Ruas"].to_numpy() if "ID Ruas" in df.columns else df.index.to_numpy())
+            df_vol.insert(0, "Jenis", jenis)
+            bagian.append(df_vol.melt(id_vars=["Jenis", "ID Struktur", "Item"], var_name="Komponen", value_name="Volume").dropna(subset=["Volume"]))
+
+        if not bagian:
+            return {"error": "Tidak ada data struktur untuk dihitung."}
+
+        if isinstance(harga_satuan, dict):
+            harga_satuan = pd.DataFrame(list(harga_satuan.items()), columns=["Komponen", "Harga Satuan"])
+
+        df_detail = pd.concat(bagian, ignore_index=True)
+        df_detail["Satuan"] = df_detail["Komponen"].map(self.SATUAN_KOMPONEN)
+        df_detail = df_detail.merge(harga_satuan[["Komponen", "Harga Satuan"]], on="Komponen", how="left")
+        tanpa_harga = df_detail["Harga Satuan"].isna() & (df_detail["Volume"] != 0)
+        komponen_tanpa_harga = df_detail.loc[tanpa_harga, "Komponen"].unique().tolist()
+        if komponen_tanpa_harga and not izinkan_tanpa_harga:
+            return {
+                "error": f"Harga satuan belum tersedia untuk: {', '.join(komponen_tanpa_harga)}",
+                "Komponen_Tanpa_Harga": komponen_tanpa_harga
+            }
+        df_detail["Total Harga"] = df_detail["Volume"] * df_detail["Harga Satuan"]
+
+        df_rekap = df_detail.groupby(["Komponen", "Satuan"], as_index=False, sort=False, dropna=False).agg(
+            Volume=("Volume", "sum"), Harga_Satuan=("Harga Satuan", "first"), Total_Harga=("Total Harga", "sum")
+        ).rename(columns={"Harga_Satuan": "Harga Satuan", "Total_Harga": "Total Harga"})
+        # sum() mengubah NaN menjadi 0: komponen tanpa harga tetap NaN di rekap
+        df_rekap.loc[df_rekap["Harga Satuan"].isna(), "Total Harga"] = np.nan
+
+        return {
+            "Detail": df_detail,
+            "Rekap": df_rekap,
+            "Grand_Total_Rp": float(df_detail["Total Harga"].sum()),
+            "Komponen_Tanpa_Harga": komponen_tanpa_harga
+        }
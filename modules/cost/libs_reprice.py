@@ -0,0 +1,194 @@
+# ==============================================================================
+# 📄 NAMA FILE: libs_reprice.py
+# 📍 LOKASI: modules/cost/libs_reprice.py
+# 🛠️ FUNGSI: Repricing Inkremental RAB (Hanya Hitung Ulang Item yang Terdampak)
+# ==============================================================================
+
+import numpy as np
+import pandas as pd
+
+try:
+    from modules.cost.libs_ahsp import AHSP_Engine
+except ImportError:
+    from libs_ahsp import AHSP_Engine
+
+
+class Incremental_Repricing_Engine:
+    """
+    Mesin Repricing Berbasis Dependensi.
+    Menyimpan indeks terbalik: Sumber Daya (Semen, Pekerja, dst) -> Analisa AHSP -> Baris BOQ.
+    Saat satu harga dasar berubah (misal hasil Cron BPS harian), hanya HSP dan baris RAB
+    yang memakai sumber daya tersebut yang dihitung ulang.
+    """
+    def __init__(self, harga_bahan_dasar, harga_upah_dasar, bidang="Cipta Karya", ahsp_engine=None):
+        self.ahsp = ahsp_engine if ahsp_engine is not None else AHSP_Engine()
+        self.bidang = bidang
+        self.harga_bahan = dict(harga_bahan_dasar)
+        self.harga_upah = dict(harga_upah_dasar)
+
+        # Indeks Terbalik: ('bahan', 'semen') -> {kode_analisa, ...}
+        self.indeks_sumber_daya = {}
+        # Indeks Baris: kode_analisa -> array posisi baris BOQ
+        self.indeks_baris = {}
+
+        self.hsp = {}
+        self.df_rab = pd.DataFrame()
+        self._volume = np.zeros(0)
+        self._harga_satuan = np.zeros(0)
+        self._total = np.zeros(0)
+
+    # ==========================================
+    # 1. REGISTRASI BOQ & HITUNG PENUH (SEKALI)
+    # ==========================================
+    def daftarkan_boq(self, df_boq, kolom_kode='Kode Analisa', kolom_volume='Volume'):
+        """
+        Mendaftarkan BOQ lalu menghitung RAB penuh satu kali sebagai baseline.
+        df_boq minimal memiliki kolom kode analisa AHSP dan volume.
+        """
+        df = df_boq.reset_index(drop=True).copy()
+        kode = df[kolom_kode].astype(str)
+        self._volume = pd.to_numeric(df[kolom_volume], errors='coerce').fillna(0).to_numpy(dtype=float, copy=True)
+
+        self.indeks_sumber_daya = {}
+        self.indeks_baris = {}
+        self.hsp = {}
+
+        # Posisi baris per kode (groupby.indices = dict kode -> array posisi)
+        for kd, posisi in kode.groupby(kode).indices.items():
+            self.indeks_baris[kd] = np.asarray(posisi)
+            for jenis, kunci, _, _ in self.ahsp.komponen_harga(kd, self.bidang):
+                self.indeks_sumber_daya.setdefault((jenis, kunci), set()).add(kd)
+            self.hsp[kd] = self._hitung_hsp(kd)
+
+        self._harga_satuan = kode.map(self.hsp).fillna(0).to_numpy(dtype=float, copy=True)
+        self._total = self._volume * self._harga_satuan
+
+        df['Harga Satuan (Rp)'] = self._harga_satuan
+        df['Total Harga (Rp)'] = self._total
+        self.df_rab = df
+        return self.df_rab
+
+    def _hitung_hsp(self, kode):
+        return self.ahsp.hitung_hsp(kode, self.harga_bahan, self.harga_upah, bidang=self.bidang)
+
+    @property
+    def grand_total(self):
+        return float(self._total.sum())
+
+    # ==========================================
+    # 2. UPDATE HARGA INKREMENTAL
+    # ==========================================
+    def analisa_terdampak(self, perubahan_bahan=None, perubahan_upah=None):
+        """Mengembalikan himpunan kode analisa yang memakai sumber daya yang berubah."""
+        terdampak = set()
+        for jenis, perubahan in (('bahan', perubahan_bahan or {}), ('upah', perubahan_upah or {})):
+            for kunci in perubahan:
+                terdampak |= self.indeks_sumber_daya.get((jenis, str(kunci).lower()), set())
+        return terdampak
+
+    def kunci_tidak_dikenal(self, perubahan_bahan=None, perubahan_upah=None):
+        """Kunci perubahan yang tidak ada di indeks terbalik (tidak akan me-reprice apa pun)"""
+        return sorted(
+            f"{jenis}:{kunci}"
+            for jenis, perubahan in (('bahan', perubahan_bahan or {}), ('upah', perubahan_upah or {}))
+            for kunci in perubahan
+            if (jenis, str(kunci).lower()) not in self.indeks_sumber_daya
+        )
+
+    def update_harga(self, perubahan_bahan=None, perubahan_upah=None):
+        """
+        Menerapkan perubahan harga dasar dan hanya menghitung ulang item yang terdampak.
+        Input: dict {kunci_harga: harga_baru}, misal {'semen': 1650}.
+        Output: Dictionary laporan delta (per analisa, per baris RAB, dan total proyek).
+        """
+        perubahan_bahan = {str(k).lower(): v for k, v in (perubahan_bahan or {}).items()}
+        perubahan_upah = {str(k).lower(): v for k, v in (perubahan_upah or {}).items()}
+
+        terdampak = self.analisa_terdampak(perubahan_bahan, perubahan_upah)
+        self.harga_bahan.update(perubahan_bahan)
+        self.harga_upah.update(perubahan_upah)
+
+        total_lama = self.grand_total
+        delta_analisa = []
+        posisi_terdampak = []
+
+        for kd in sorted(terdampak):
+            hsp_lama = self.hsp.get(kd, 0.0)
+            hsp_baru = self._hitung_hsp(kd)
+            self.hsp[kd] = hsp_baru
+            if hsp_baru == hsp_lama: continue
+
+            posisi = self.indeks_baris.get(kd, np.zeros(0, dtype=int))
+            self._harga_satuan[posisi] = hsp_baru
+            self._total[posisi] = self._volume[posisi] * hsp_baru
+            posisi_terdampak.append(posisi)
+
+            delta_analisa.append({
+                "Kode Analisa": kd,
+                "HSP Lama (Rp)": hsp_lama,
+                "HSP Baru (Rp)": hsp_baru,
+                "Selisih HSP (Rp)": hsp_baru - hsp_lama,
+                "Jumlah Baris BOQ": len(posisi)
+            })
+
+        # Sinkronkan tampilan DataFrame hanya pada baris yang berubah
+        if posisi_terdampak:
+            idx = np.concatenate(posisi_terdampak)
+            total_lama_baris = self.df_rab['Total Harga (Rp)'].to_numpy()[idx]
+            self.df_rab.loc[idx, 'Harga Satuan (Rp)'] = self._harga_satuan[idx]
+            self.df_rab.loc[idx, 'Total Harga (Rp)'] = self._total[idx]
+
+            df_delta_baris = self.df_rab.loc[idx].copy()
+            df_delta_baris['Total Lama (Rp)'] = total_lama_baris
+            df_delta_baris['Selisih (Rp)'] = df_delta_baris['Total Harga (Rp)'] - total_lama_baris
+        else:
+            df_delta_baris = self.df_rab.iloc[0:0].copy()
+
+        total_baru = self.grand_total
+        return {
+            "Analisa_Terdampak": len(terdampak),
+            "Baris_Terdampak": len(df_delta_baris),
+            "Total_Lama_Rp": total_lama,
+            "Total_Baru_Rp": total_baru,
+            "Selisih_Total_Rp": total_baru - total_lama,
+            "Delta_Analisa": pd.DataFrame(delta_analisa),
+            "Delta_Baris_RAB": df_delta_baris,
+            "Kunci_Tidak_Dikenal": self.kunci_tidak_dikenal(perubahan_bahan, perubahan_upah)
+        }
+
+    def update_harga_snapshot(self, df_lama, df_baru, kolom_nama='nama_material', kolom_harga='harga_dasar'):
+        """
+        Diff dua snapshot harga bahan (misal sebelum & sesudah Cron BPS) lalu repricing inkremental.
+        Nama material dipetakan dengan kunci_harga_bahan milik AHSP engine yang sama dengan indeks terbalik.
+        """
+        perubahan = diff_harga(
+            df_lama, df_baru, kolom_nama, kolom_harga,
+            fungsi_kunci=lambda nama: self.ahsp.kunci_harga_bahan(nama)[0]
+        )
+        return self.update_harga(perubahan_bahan=perubahan)
+
+
+def diff_harga(df_lama, df_baru, kolom_nama='nama_material', kolom_harga='harga_dasar', fungsi_kunci=None):
+    """
+    Membandingkan dua snapshot harga (misal tabel cache_harga_material sebelum & sesudah
+    Cron BPS) dan mengembalikan hanya material yang harganya berubah: {kunci_harga: harga_baru}.
+    fungsi_kunci: nama material -> kunci kamus harga dasar. Default AHSP_Engine.kunci_harga_bahan,
+    kunci yang sama dengan indeks terbalik (misal 'Semen Portland Tipe 1' -> 'semen').
+    Beberapa nama dengan kunci yang sama -> baris terakhir yang dipakai.
+    """
+    if fungsi_kunci is None:
+        ahsp = AHSP_Engine()
+        fungsi_kunci = lambda nama: ahsp.kunci_harga_bahan(nama)[0]
+
+    lama = df_lama[[kolom_nama, kolom_harga]].copy()
+    baru = df_baru[[kolom_nama, kolom_harga]].copy()
+    for df in (lama, baru):
+        nama = df[kolom_nama].astype(str).str.strip()
+        df['kunci'] = nama.map({n: str(fungsi_kunci(n)).lower() for n in nama.unique()})
+
+    gabung = baru.drop_duplicates('kunci', keep='last').merge(
+        lama.drop_duplicates('kunci', keep='last')[['kunci', kolom_harga]],
+        on='kunci', how='left', suffixes=('', '_lama')
+    )
+    berubah = gabung[gabung[kolom_harga] != gabung[f"{kolom_harga}_lama"]]
+    return dict(zip(berubah['kunci'], berubah[kolom_harga].astype(float)))
@@ -1,5 +1,7 @@
 import math
 
+import numpy as np
+
 class SNI_Concrete_2019:
     """
     Engine Perhitungan Struktur Beton Bertulang.
@@ -164,27 +166,37 @@ class SNI_Concrete_2019:
         """
         if d <= 0: return 0
         
-        Mu_nmm = Mu * 1e6 # Konversi kNm ke Nmm
+        As_final = float(self.hitung_tulangan_perlu_array(Mu, d, b))
+        # Pembagian nol (b = 0, dst) -> 0.0 seperti sebelumnya
+        return As_final if math.isfinite(As_final) else 0.0
+
+    def hitung_tulangan_perlu_array(self, Mu, d, b):
+        """
+        Versi array hitung_tulangan_perlu (rumus yang sama, dipakai optimizer grid balok).
+        Args: Mu (kNm), d & b (mm) - skalar atau array NumPy yang bisa di-broadcast.
+        Output: Array As perlu (mm2). d <= 0 -> 0; pembagian nol -> nan (tanpa exception).
+        """
+        d = np.asarray(d, dtype=float)
+        Mu_nmm = np.asarray(Mu, dtype=float) * 1e6 # Konversi kNm ke Nmm
         phi = 0.9 # Asumsi awal terkontrol tarik
         
         # Pendekatan Iteratif Sederhana (Blok Tekan Whitney)
         # Asumsi awal a = 0.2 * d
         a = 0.2 * d
         
-        # Rumus: As = Mu / (phi * fy * (d - a/2))
-        try:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # Rumus: As = Mu / (phi * fy * (d - a/2))
             As = Mu_nmm / (phi * self.fy * (d - a/2))
             
             # Koreksi nilai 'a' berdasarkan As yang didapat
             # a = (As * fy) / (0.85 * fc * b)
-            a_recalc = (As * self.fy) / (0.85 * self.fc * b)
+            a_recalc = (As * self.fy) / (0.85 * self.fc * np.asarray(b, dtype=float))
             
             # Hitung ulang As dengan 'a' yang lebih presisi
             As_final = Mu_nmm / (phi * self.fy * (d - a_recalc/2))
-            
-            return As_final
-        except ZeroDivisionError:
-            return 0.0
+            As_final = np.where(np.isfinite(As) & np.isfinite(a_recalc), As_final, np.nan)
+        
+        return np.where(d > 0, As_final, 0.0)
             
 # [PATCH UPGRADE] libs_sni.py
 class SNILoadCombos:
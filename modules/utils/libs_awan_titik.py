@@ -0,0 +1,167 @@
+# ==============================================================================
+# 📄 NAMA FILE: libs_awan_titik.py
+# 📍 LOKASI: modules/utils/libs_awan_titik.py
+# 🛠️ FUNGSI: Ingest Awan Titik (Point Cloud) Topografi: Buffer NumPy, Dedup Tervektorisasi,
+#            Artefak .npy (Memory-Mapped) / Parquet yang Bisa Dibuka Ulang Tanpa Parsing DXF
+# ==============================================================================
+
+import json
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+FOLDER_ARTEFAK = os.path.join(tempfile.gettempdir(), "smartbim_titik")
+KOLOM_XYZ = ['X', 'Y', 'Z']
+
+
+# ==========================================
+# 1. BUFFER TITIK (ARRAY FLOAT64 YANG TUMBUH)
+# ==========================================
+class Buffer_Titik:
+    """
+    Penampung koordinat (X, Y, Z) dalam satu array float64 (N, 3) yang kapasitasnya
+    digandakan saat penuh -> 24 byte per titik, tanpa tuple Python per titik.
+    """
+    def __init__(self, kapasitas_awal=65536, desimal=3):
+        self.desimal = desimal
+        self._data = np.empty((max(1, kapasitas_awal), 3), dtype=np.float64)
+        self._jumlah = 0
+
+    def _pastikan(self, tambahan):
+        perlu = self._jumlah + tambahan
+        if perlu > len(self._data):
+            baru = np.empty((max(perlu, 2 * len(self._data)), 3), dtype=np.float64)
+            baru[:self._jumlah] = self._data[:self._jumlah]
+            self._data = baru
+
+    def tambah(self, x, y, z):
+        self._pastikan(1)
+        self._data[self._jumlah] = (x, y, z)
+        self._jumlah += 1
+
+    def tambah_banyak(self, xyz):
+        xyz = np.asarray(xyz, dtype=np.float64).reshape(-1, 3)
+        self._pastikan(len(xyz))
+        self._data[self._jumlah:self._jumlah + len(xyz)] = xyz
+        self._jumlah += len(xyz)
+
+    def __len__(self):
+        return self._jumlah
+
+    def ke_array(self, unik=False):
+        """Array (N, 3) float64 dibulatkan `desimal` (urutan sesuai file); unik=True membuang titik kembar"""
+        data = self._data[:self._jumlah]
+        return titik_unik(data, self.desimal) if unik else np.round(data, self.desimal)
+
+    def ke_dataframe(self, unik=True):
+        """DataFrame [X, Y, Z]; unik=True membuang titik kembar (setelah pembulatan)"""
+        return pd.DataFrame(self.ke_array(unik=unik), columns=KOLOM_XYZ)
+
+
+# ==========================================
+# 2. DEDUP TERVEKTORISASI (KUANTISASI INTEGER)
+# ==========================================
+def titik_unik(xyz, desimal=3):
+    """
+    Membuang titik kembar setelah dibulatkan `desimal` angka:
+    koordinat dikuantisasi ke int64 (x * 10^desimal) lalu np.unique -> tanpa set/tuple Python.
+    Jika rentang ketiga sumbu muat dalam 63 bit (umumnya survei lapangan), X/Y/Z dipadatkan
+    menjadi SATU kunci int64; jika tidak, tiap baris dilihat sebagai satu blok 24 byte.
+    Urutan kemunculan pertama dipertahankan. Return: Array (M, 3) float64.
+    """
+    xyz = np.asarray(xyz, dtype=np.float64).reshape(-1, 3)
+    if not len(xyz):
+        return xyz.copy()
+    skala = 10.0 ** desimal
+    kuantum = np.ascontiguousarray(np.rint(xyz * skala).astype(np.int64))
+    relatif = kuantum - kuantum.min(axis=0)
+    bit = [int(m).bit_length() for m in relatif.max(axis=0)]
+    if sum(bit) <= 63:
+        kunci = (relatif[:, 0] << (bit[1] + bit[2])) | (relatif[:, 1] << bit[2]) | relatif[:, 2]
+    else:
+        kunci = kuantum.view(np.dtype((np.void, kuantum.itemsize * 3))).ravel()
+    # = np.unique(return_index=True), tetapi dengan argsort tidak-stabil (lebih cepat):
+    # indeks pertama tiap kelompok kunci kembar diambil lewat minimum.reduceat
+    urutan = np.argsort(kunci)
+    terurut = kunci[urutan]
+    awal = np.flatnonzero(np.r_[True, terurut[1:] != terurut[:-1]])
+    indeks = np.sort(np.minimum.reduceat(urutan, awal))
+    return kuantum[indeks] / skala
+
+
+# ==========================================
+# 3. ARTEFAK DISK (.npy MEMORY-MAPPED / PARQUET)
+# ==========================================
+def path_artefak(kode_hash, ekstensi='npy', folder=FOLDER_ARTEFAK):
+    """Path artefak awan titik untuk satu file sumber (kunci: hash isi file)"""
+    return os.path.join(folder, f"titik_{kode_hash[:32]}.{ekstensi}")
+
+
+def _path_meta(path):
+    return os.path.splitext(path)[0] + ".json"
+
+
+def simpan_artefak(xyz, path, meta=None, batas_folder_mb=1024):
+    """
+    Menyimpan awan titik (N, 3) ke `.npy` atau `.parquet` (sesuai ekstensi) + metadata JSON.
+    Ditulis ke file sementara lalu di-rename (atomik), kemudian artefak lama dibuang jika folder melebihi batas.
+    Return: path artefak.
+    """
+    folder = os.path.dirname(path) or "."
+    os.makedirs(folder, exist_ok=True)
+    sementara = f"{path}.{os.getpid()}.tmp"
+    if path.endswith('.parquet'):
+        pd.DataFrame(np.asarray(xyz, dtype=np.float64), columns=KOLOM_XYZ).to_parquet(sementara, index=False)
+    else:
+        with open(sementara, 'wb') as f:
+            np.save(f, np.ascontiguousarray(xyz, dtype=np.float64))
+    os.replace(sementara, path)
+
+    with open(_path_meta(path), 'w', encoding='utf-8') as f:
+        json.dump(dict(meta or {}, Jumlah_Titik=int(len(xyz))), f)
+    _bersihkan_folder(folder, batas_folder_mb, lindungi=path)
+    return path
+
+
+def buka_artefak(path):
+    """
+    Membuka ulang artefak tanpa parsing DXF. `.npy` dibuka memory-mapped (read-only):
+    halaman file baru dibaca dari disk saat kolomnya dipakai. Return: Array (N, 3) float64.
+    """
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path, columns=KOLOM_XYZ).to_numpy(dtype=np.float64)
+    return np.load(path, mmap_mode='r')
+
+
+def baca_meta(path):
+    """Metadata artefak (Dictionary), atau None jika artefak belum ada / rusak"""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(_path_meta(path), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _bersihkan_folder(folder, batas_mb, lindungi=None):
+    """Buang artefak yang paling lama tidak diubah jika total folder melebihi batas"""
+    try:
+        daftar = [os.path.join(folder, n) for n in os.listdir(folder) if n.endswith(('.npy', '.parquet'))]
+        daftar = sorted((st.st_mtime, st.st_size, p) for p, st in ((p, os.stat(p)) for p in daftar))
+    except OSError:
+        return
+    total = sum(ukuran for _, ukuran, _ in daftar)
+    for _, ukuran, path in daftar:
+        if total <= batas_mb * 1024 * 1024:
+            break
+        if path == lindungi:
+            continue
+        for p in (path, _path_meta(path)):
+            try:
+                os.remove(p)
+            except OSError:
+                pass
+        total -= ukuran
@@ -1,19 +1,38 @@
 import ezdxf
-from ezdxf.addons.drawing import RenderContext, Frontend
-from ezdxf.addons.drawing.matplotlib import MatplotlibBackend
-import matplotlib.pyplot as plt
 import io
 import logging
+import os
 import re
+import tempfile
+
+try:
+    from modules.utils import libs_pratinjau
+except ImportError:
+    import libs_pratinjau
 
 # Matikan log ezdxf yang berisik
 logging.getLogger("ezdxf").setLevel(logging.ERROR)
 
+def teks_blok(block_layout, cache_blok):
+    """
+    Teks satu definisi blok (termasuk blok bersarang), digali SEKALI per nama blok.
+    Insert berikutnya dari blok yang sama cukup mengambil hasil dari cache.
+    """
+    nama = block_layout.name
+    if nama not in cache_blok:
+        cache_blok[nama] = ()  # Penanda sedang digali (cegah referensi blok melingkar)
+        isi = []
+        for sub_entity in block_layout:
+            extract_text_recursive(sub_entity, isi, cache_blok)
+        cache_blok[nama] = tuple(isi)
+    return cache_blok[nama]
+
 def extract_text_recursive(entity, container_list, visited_blocks=None):
     """
     Menggali teks di dalam Block/Group secara rekursif.
+    visited_blocks: cache {nama_blok: teks} yang dipakai bersama seluruh entitas satu gambar.
     """
-    if visited_blocks is None: visited_blocks = set()
+    if visited_blocks is None: visited_blocks = {}
 
     try:
         dxftype = entity.dxftype()
@@ -36,13 +55,10 @@ def extract_text_recursive(entity, container_list, visited_blocks=None):
             
         # 3. INSERT (BLOCK)
         elif dxftype == 'INSERT':
-            block_name = entity.dxf.name
-            if block_name not in visited_blocks:
-                visited_blocks.add(block_name)
-                if entity.doc:
-                    block_layout = entity.block()
-                    for sub_entity in block_layout:
-                        extract_text_recursive(sub_entity, container_list, visited_blocks)
+            if entity.doc:
+                block_layout = entity.block()
+                if block_layout is not None:
+                    container_list.extend(teks_blok(block_layout, visited_blocks))
     except:
         pass
 
@@ -84,24 +100,24 @@ def process_dxf_for_ai(dxf_file_bytes):
         doc = ezdxf.read(io.StringIO(dxf_content_str))
         msp = doc.modelspace()
         
-        # A. Coba Render Gambar
+        # A. Gambar dari cache / worker latar belakang (tidak render ulang setiap rerun)
+        tmp_path = None
         try:
-            fig = plt.figure(facecolor='#2d2d2d')
-            ax = fig.add_axes([0, 0, 1, 1])
-            ctx = RenderContext(doc)
-            out = MatplotlibBackend(ax)
-            Frontend(ctx, out).draw_layout(msp, finalize=True)
-            
-            img_buffer = io.BytesIO()
-            fig.savefig(img_buffer, format='png', dpi=150, facecolor='#2d2d2d')
-            img_buffer.seek(0)
-            plt.close(fig)
+            with tempfile.NamedTemporaryFile(delete=False, suffix=".dxf") as tmp:
+                tmp.write(dxf_file_bytes)
+                tmp_path = tmp.name
+            img_buffer, catatan = libs_pratinjau.PRATINJAU.pratinjau(
+                tmp_path, dpi=150, ukuran=(6.4, 4.8), latar='#2d2d2d'
+            )
+            if catatan: status_msg += f"[{catatan.lstrip('- ').strip()}] "
         except Exception as e:
             status_msg += f"[Visual Gagal: {str(e)}] "
             img_buffer = None
+        finally:
+            if tmp_path and os.path.exists(tmp_path): os.remove(tmp_path)
 
         # B. Ekstrak Teks Terstruktur
-        visited = set()
+        visited = {}
         for entity in msp:
             extract_text_recursive(entity, extracted_texts, visited)
             
@@ -0,0 +1,373 @@
+# ==============================================================================
+# 📄 NAMA FILE: libs_dxf_stream.py
+# 📍 LOKASI: modules/utils/libs_dxf_stream.py
+# 🛠️ FUNGSI: Pembaca DXF Streaming (Entitas Satu per Satu, Tanpa Memuat Seluruh Gambar)
+# ==============================================================================
+
+import io
+
+import numpy as np
+import ezdxf
+from ezdxf.addons import iterdxf
+from ezdxf.entities import factory
+from ezdxf.entities.subentity import entity_linker
+from ezdxf.filemanagement import dxf_file_info
+from ezdxf.lldxf.extendedtags import ExtendedTags
+from ezdxf.lldxf.tagger import ascii_tags_loader, tag_compiler
+from ezdxf.lldxf.validator import is_binary_dxf_file
+from ezdxf.math import Matrix44, Vec3
+
+try:
+    from modules.utils import libs_awan_titik
+except ImportError:
+    import libs_awan_titik
+
+TIPE_TITIK = ('POINT', 'LWPOLYLINE', 'POLYLINE', '3DFACE')
+TIPE_TEKS = ('TEXT', 'MTEXT')
+# Kedalaman maksimum blok bersarang (pengaman referensi blok melingkar)
+MAKS_KEDALAMAN_BLOK = 16
+
+
+# ==========================================
+# 1. ITERATOR ENTITAS (STREAMING) & CACHE GEOMETRI BLOK
+# ==========================================
+def iter_modelspace(path, types=None):
+    """
+    Entitas modelspace satu per satu via ezdxf.addons.iterdxf (memori tidak tumbuh
+    mengikuti ukuran file). DXF biner tidak didukung iterdxf -> fallback ezdxf.readfile.
+    """
+    if is_binary_dxf_file(path):
+        msp = ezdxf.readfile(path).modelspace()
+        entitas = msp.query(" ".join(types)) if types else msp
+        yield from entitas
+    else:
+        yield from iterdxf.modelspace(path, types=types)
+
+
+def baca_blok(path, types=None):
+    """
+    Membaca definisi blok (section BLOCKS) secara streaming, berhenti di akhir section.
+    Return: Dictionary {nama_blok: (base_point Vec3, [entitas])} - hanya tipe yang diminta + INSERT bersarang.
+    """
+    diminta = set(types) | {'INSERT'} if types else None
+
+    if is_binary_dxf_file(path):
+        doc = ezdxf.readfile(path)
+        return {
+            blok.name: (Vec3(blok.block.dxf.base_point),
+                        [e for e in blok if diminta is None or e.dxftype() in diminta])
+            for blok in doc.blocks
+        }
+
+    info = dxf_file_info(str(path))
+    hasil = {}
+    with open(path, mode="rt", encoding=info.encoding, errors="surrogateescape") as fp:
+        di_blocks = False
+        prev = (None, None)
+        tags = []
+        nama, base, isi = None, Vec3(), []
+        linked_entity = entity_linker()
+
+        def tutup_entitas():
+            nonlocal nama, base, isi
+            if not tags:
+                return
+            tipe = tags[0].value
+            if tipe == 'BLOCK':
+                nama = next((t.value for t in tags if t.code == 2), None)
+                base = next((Vec3(t.value) for t in tags if t.code == 10), Vec3())
+                isi = []
+            elif tipe == 'ENDBLK':
+                if nama is not None:
+                    hasil[nama] = (base, isi)
+                nama = None
+            elif nama is not None and (diminta is None or tipe in diminta or tipe in ('VERTEX', 'SEQEND')):
+                entitas = factory.load(ExtendedTags(tags))
+                if not linked_entity(entitas):
+                    isi.append(entitas)
+
+        for tag in tag_compiler(ascii_tags_loader(fp)):
+            if di_blocks:
+                if tag.code == 0:
+                    tutup_entitas()
+                    if tag.value == 'ENDSEC':
+                        break
+                    tags = [tag]
+                else:
+                    tags.append(tag)
+            elif tag.code == 2 and prev == (0, 'SECTION'):
+                di_blocks = tag.value == 'BLOCKS'
+            prev = (tag.code, tag.value)
+    return hasil
+
+
+def matriks_insert(insert, base):
+    """Matriks 4x4 (konvensi vektor-baris ezdxf) blok -> WCS, sudah dikoreksi base point blok"""
+    m = Matrix44.translate(-base.x, -base.y, -base.z) * insert.matrix44()
+    return np.array(list(m), dtype=np.float64).reshape(4, 4)
+
+
+class Geometri_Blok:
+    """
+    Geometri satu definisi blok dalam KOORDINAT BLOK, dihitung sekali:
+    ring poligon (LWPOLYLINE tertutup, CIRCLE) dan segmen garis (LWPOLYLINE terbuka, LINE)
+    disimpan sebagai array datar + layer, INSERT bersarang sebagai (nama, matriks lokal).
+    """
+    def __init__(self, base, isi):
+        from shapely.geometry import Point
+
+        ring, layer_ring, segmen, layer_segmen = [], [], [], []
+        self.bersarang = []
+        self._matriks_bersarang = None
+        self._semua_segmen = None
+        for e in isi:
+            tipe = e.dxftype()
+            layer = e.dxf.layer
+            if tipe == 'INSERT':
+                self.bersarang.append((e.dxf.name, e))
+            elif tipe == 'LWPOLYLINE':
+                pts = np.array(list(e.get_points(format='xy')), dtype=np.float64).reshape(-1, 2)
+                if len(pts) < 2:
+                    continue
+                if e.is_closed:
+                    if len(pts) >= 3:
+                        ring.append(pts)
+                        layer_ring.append(layer)
+                else:
+                    segmen.append(np.stack([pts[:-1], pts[1:]], axis=1))
+                    layer_segmen.extend([layer] * (len(pts) - 1))
+            elif tipe == 'LINE':
+                s, t = e.dxf.start, e.dxf.end
+                segmen.append(np.array([[[s.x, s.y], [t.x, t.y]]], dtype=np.float64))
+                layer_segmen.append(layer)
+            elif tipe == 'CIRCLE' and e.dxf.radius > 0:
+                c = e.dxf.center
+                ring.append(np.asarray(Point(c.x, c.y).buffer(e.dxf.radius).exterior.coords)[:-1])
+                layer_ring.append(layer)
+
+        self.base = base
+        self.titik_ring = np.concatenate(ring) if ring else np.empty((0, 2))
+        self.id_ring = np.repeat(np.arange(len(ring)), [len(r) for r in ring]) if ring else np.empty(0, dtype=np.int64)
+        self.layer_ring = np.array(layer_ring, dtype=object)
+        self.segmen = np.concatenate(segmen) if segmen else np.empty((0, 2, 2))
+        self.layer_segmen = np.array(layer_segmen, dtype=object)
+
+    def semua_segmen(self):
+        """Segmen garis + tepi ring (m, 2, 2) dalam koordinat blok (untuk pratinjau garis)"""
+        if self._semua_segmen is None:
+            n = len(self.titik_ring)
+            tepi = np.empty((0, 2, 2))
+            if n:
+                # Indeks titik berikutnya; titik terakhir tiap ring kembali ke titik pertamanya
+                awal = np.flatnonzero(np.r_[True, self.id_ring[1:] != self.id_ring[:-1]])
+                berikut = np.arange(1, n + 1)
+                berikut[np.r_[awal[1:], n] - 1] = awal
+                tepi = np.stack([self.titik_ring, self.titik_ring[berikut]], axis=1)
+            self._semua_segmen = np.concatenate([self.segmen, tepi])
+        return self._semua_segmen
+
+    def matriks_bersarang(self, blok):
+        """Matriks lokal INSERT bersarang (dihitung sekali per definisi)"""
+        if self._matriks_bersarang is None:
+            self._matriks_bersarang = [
+                (nama, matriks_insert(e, blok[nama][0])) for nama, e in self.bersarang if nama in blok
+            ]
+        return self._matriks_bersarang
+
+
+def _transformasi(titik, matriks):
+    """titik (k, 2) x matriks (n, 4, 4) -> (n, k, 2): semua insert sekaligus"""
+    return np.einsum('kj,nji->nki', titik, matriks[:, :2, :2]) + matriks[:, None, 3, :2]
+
+
+class Cache_Geometri_Blok:
+    """
+    Pengganti INSERT.virtual_entities() untuk QTO: setiap definisi blok diurai SEKALI
+    (Geometri_Blok), setiap INSERT hanya menyumbang matriks transformasinya.
+    Di akhir, semua insert dari blok yang sama ditransformasi dalam satu operasi NumPy
+    dan poligonnya dibangun massal dengan shapely.linearrings / shapely.polygons.
+    Blok dengan skala tidak seragam tetap benar (lingkaran menjadi elips).
+    """
+    def __init__(self, path, types=('LWPOLYLINE', 'LINE', 'CIRCLE'), ukuran_batch=20_000):
+        self.path = path
+        self.types = tuple(types)
+        self.ukuran_batch = ukuran_batch
+        self._blok = None
+        self._geometri = {}
+        self._matriks = {}     # nama blok -> list matriks (4x4) insert level modelspace
+
+    def _definisi(self):
+        if self._blok is None:
+            # Section BLOCKS hanya dibaca jika gambar memang memakai blok
+            self._blok = baca_blok(self.path, self.types)
+        return self._blok
+
+    def geometri(self, nama):
+        if nama not in self._geometri:
+            base, isi = self._definisi()[nama]
+            self._geometri[nama] = Geometri_Blok(base, isi)
+        return self._geometri[nama]
+
+    def catat_insert(self, insert):
+        blok = self._definisi()
+        nama = insert.dxf.name
+        if nama in blok:
+            self._matriks.setdefault(nama, []).append(matriks_insert(insert, blok[nama][0]))
+
+    def _sebar_matriks(self):
+        """Matriks akhir per blok, termasuk blok bersarang (matriks lokal x matriks induk)"""
+        hasil = {}
+        antrian = [(nama, np.stack(daftar), 0) for nama, daftar in self._matriks.items()]
+        while antrian:
+            nama, matriks, kedalaman = antrian.pop()
+            hasil.setdefault(nama, []).append(matriks)
+            if kedalaman >= MAKS_KEDALAMAN_BLOK:
+                continue
+            for anak, lokal in self.geometri(nama).matriks_bersarang(self._definisi()):
+                antrian.append((anak, lokal @ matriks, kedalaman + 1))
+        return {nama: np.concatenate(daftar) for nama, daftar in hasil.items()}
+
+    def iter_segmen(self):
+        """Segmen WCS (m, 2, 2) seluruh insert, per batch - dipakai renderer pratinjau cepat"""
+        for nama, semua_matriks in self._sebar_matriks().items():
+            segmen = self.geometri(nama).semua_segmen()
+            if not len(segmen):
+                continue
+            for i in range(0, len(semua_matriks), self.ukuran_batch):
+                matriks = semua_matriks[i:i + self.ukuran_batch]
+                yield _transformasi(segmen.reshape(-1, 2), matriks).reshape(-1, 2, 2)
+
+    def hasil(self, abaikan_layer=None):
+        """
+        Return: (poligon_per_layer {layer: [Polygon]}, panjang_per_layer {layer: float})
+        abaikan_layer: fungsi(layer) -> True jika layer dilewati.
+        """
+        import shapely
+
+        poligon, panjang = {}, {}
+        for nama, semua_matriks in self._sebar_matriks().items():
+            geo = self.geometri(nama)
+            pakai_ring = np.array([not (abaikan_layer and abaikan_layer(l)) for l in geo.layer_ring], dtype=bool)
+            pakai_seg = np.array([not (abaikan_layer and abaikan_layer(l)) for l in geo.layer_segmen], dtype=bool)
+            n_ring = len(geo.layer_ring)
+
+            for i in range(0, len(semua_matriks), self.ukuran_batch):
+                matriks = semua_matriks[i:i + self.ukuran_batch]
+                n = len(matriks)
+
+                if n_ring and pakai_ring.any():
+                    titik = _transformasi(geo.titik_ring, matriks).reshape(-1, 2)
+                    indeks = (geo.id_ring[None, :] + n_ring * np.arange(n)[:, None]).ravel()
+                    polys = shapely.polygons(shapely.linearrings(titik, indices=indeks))
+                    layer = np.tile(geo.layer_ring, n)
+                    pilih = np.tile(pakai_ring, n)
+                    for l in np.unique(geo.layer_ring[pakai_ring]):
+                        poligon.setdefault(l, []).extend(polys[pilih & (layer == l)])
+
+                if len(geo.segmen) and pakai_seg.any():
+                    ujung = _transformasi(geo.segmen.reshape(-1, 2), matriks).reshape(n, -1, 2, 2)
+                    per_segmen = np.hypot(*(ujung[:, :, 1] - ujung[:, :, 0]).transpose(2, 0, 1)).sum(axis=0)
+                    for l in np.unique(geo.layer_segmen[pakai_seg]):
+                        panjang[l] = panjang.get(l, 0.0) + float(per_segmen[geo.layer_segmen == l].sum())
+        return poligon, panjang
+
+
+# ==========================================
+# 2. EKSTRAKSI TITIK 3D & TEKS
+# ==========================================
+def _titik_entitas(e, buffer):
+    """Titik satu entitas masuk buffer sekaligus (satu array per entitas, bukan per titik)"""
+    tipe = e.dxftype()
+    if tipe == 'POINT':
+        loc = e.dxf.location
+        buffer.tambah(loc.x, loc.y, loc.z)
+    elif tipe == 'LWPOLYLINE':
+        xy = np.array(list(e.get_points(format='xy')), dtype=np.float64).reshape(-1, 2)
+        buffer.tambah_banyak(np.column_stack([xy, np.full(len(xy), e.dxf.elevation)]))
+    elif tipe == 'POLYLINE':
+        xyz = np.array([v.dxf.location for v in e.vertices if not v.is_face_record], dtype=np.float64).reshape(-1, 3)
+        if e.is_2d_polyline:
+            xyz[:, 2] = e.dxf.elevation.z
+        buffer.tambah_banyak(xyz)
+    elif tipe == '3DFACE':
+        buffer.tambah_banyak([e.dxf.vtx0, e.dxf.vtx1, e.dxf.vtx2, e.dxf.vtx3])
+
+
+def baca_titik_dan_teks(path, jumlah_sampel_teks=20, kapasitas_awal=65536, callback=None, tiap=100_000):
+    """
+    Satu lintasan streaming atas modelspace: semua titik 3D (POINT, LWPOLYLINE, POLYLINE, 3DFACE)
+    masuk Buffer_Titik, teks (TEXT, MTEXT) dihitung + diambil sampelnya untuk ringkasan.
+    callback(jumlah_entitas, jumlah_titik) dipanggil setiap `tiap` entitas.
+    Output: Dictionary {Versi, Titik, Jumlah_Entitas, Jumlah_Teks, Teks_Sampel} atau {"error": ...}.
+    """
+    try:
+        versi = ezdxf.readfile(path).dxfversion if is_binary_dxf_file(path) else dxf_file_info(str(path)).version
+        buffer = libs_awan_titik.Buffer_Titik(kapasitas_awal=kapasitas_awal)
+        jumlah_entitas = 0
+        jumlah_teks = 0
+        teks_sampel = {}
+
+        for e in iter_modelspace(path, types=TIPE_TITIK + TIPE_TEKS):
+            jumlah_entitas += 1
+            tipe = e.dxftype()
+            if tipe == 'TEXT' or tipe == 'MTEXT':
+                jumlah_teks += 1
+                if len(teks_sampel) < jumlah_sampel_teks:
+                    teks_sampel.setdefault(e.dxf.text if tipe == 'TEXT' else e.text, None)
+            else:
+                _titik_entitas(e, buffer)
+            if callback is not None and jumlah_entitas % tiap == 0:
+                callback(jumlah_entitas, len(buffer))
+    except Exception as e:
+        return {"error": str(e)}
+
+    return {
+        "Versi": versi,
+        "Titik": buffer,
+        "Jumlah_Entitas": jumlah_entitas,
+        "Jumlah_Teks": jumlah_teks,
+        "Teks_Sampel": list(teks_sampel),
+    }
+
+
+def baca_titik_tercache(path, kode_hash, folder=libs_awan_titik.FOLDER_ARTEFAK):
+    """
+    baca_titik_dan_teks + artefak disk per hash file: titik unik disimpan sebagai .npy,
+    ringkasan teks sebagai metadata, sehingga file yang sama (rerun / upload ulang) tidak di-parse lagi.
+    Output: Dictionary {Versi, Jumlah_Entitas, Jumlah_Teks, Teks_Sampel, Jumlah_Titik,
+            Titik (array (N, 3) unik, memory-mapped), Artefak (path / None)} atau {"error": ...}.
+    """
+    artefak = libs_awan_titik.path_artefak(kode_hash, folder=folder)
+    meta = libs_awan_titik.baca_meta(artefak)
+    if meta is None:
+        hasil = baca_titik_dan_teks(path)
+        if "error" in hasil:
+            return hasil
+        meta = {k: hasil[k] for k in ('Versi', 'Jumlah_Entitas', 'Jumlah_Teks', 'Teks_Sampel')}
+        xyz = hasil['Titik'].ke_array(unik=True)
+        try:
+            libs_awan_titik.simpan_artefak(xyz, artefak, meta)
+        except OSError:
+            # Disk penuh / read-only: tetap jalan dengan titik di RAM
+            return dict(meta, Jumlah_Titik=len(xyz), Titik=xyz, Artefak=None)
+        meta = libs_awan_titik.baca_meta(artefak)
+    return dict(meta, Titik=libs_awan_titik.buka_artefak(artefak), Artefak=artefak)
+
+
+def gambar_pratinjau_titik(xyz, maks_titik=200_000, dpi=100):
+    """Pratinjau ringan (scatter berwarna elevasi) untuk file yang terlalu besar dirender penuh"""
+    import matplotlib.pyplot as plt
+
+    langkah = max(1, len(xyz) // maks_titik)
+    sampel = xyz[::langkah]
+    fig = plt.figure(figsize=(8, 5))
+    ax = fig.add_axes([0, 0, 1, 1])
+    ax.scatter(sampel[:, 0], sampel[:, 1], c=sampel[:, 2], s=0.5, cmap='terrain', linewidths=0)
+    ax.set_aspect('equal')
+    ax.axis('off')
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', dpi=dpi)
+    buf.seek(0)
+    plt.close(fig)
+    return buf
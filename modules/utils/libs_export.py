@@ -1,5 +1,7 @@
 import pandas as pd
 from io import BytesIO
+import os
+import tempfile
 import xlsxwriter
 import sys
 from thefuzz import process, fuzz # [PERBAIKAN TAHAP 2] Import Mesin NLP
@@ -34,6 +36,45 @@ class Export_Engine:
     def generate_7tab_rab_excel(self, data_boq, dict_database_ahsp, nama_proyek="Proyek_SmartBIM"):
         output = BytesIO()
         workbook = xlsxwriter.Workbook(output, {'in_memory': True})
+        self._tulis_7tab_rab(workbook, data_boq, dict_database_ahsp, nama_proyek)
+        output.seek(0)
+        return output
+
+    def generate_7tab_rab_excel_stream(self, data_boq, dict_database_ahsp, nama_proyek="Proyek_SmartBIM", path_output=None):
+        """
+        Mode BOQ Raksasa (50rb+ baris): xlsxwriter 'constant_memory' langsung ke file di disk.
+        Setiap baris di-flush begitu baris berikutnya ditulis, sehingga RAM tetap datar.
+        Output: path file .xlsx (siap dibuka 'rb' untuk st.download_button / respons unduhan).
+        """
+        if path_output is None:
+            fd, path_output = tempfile.mkstemp(prefix="RAB_", suffix=".xlsx")
+            os.close(fd)
+        workbook = xlsxwriter.Workbook(path_output, {'constant_memory': True, 'tmpdir': tempfile.gettempdir()})
+        self._tulis_7tab_rab(workbook, data_boq, dict_database_ahsp, nama_proyek)
+        return path_output
+
+    @staticmethod
+    def _cocokkan_batch(data_boq, daftar_kunci_ahsp):
+        """
+        Fuzzy matching BOQ -> AHSP dihitung SEKALI sebelum penulisan Excel.
+        Nama Revit yang sama (ribuan elemen bertipe sama) hanya dicocokkan satu kali.
+        Output: dict {nama_bersih: (best_match, score)}
+        """
+        hasil = {}
+        if not daftar_kunci_ahsp:
+            return hasil
+        for item in data_boq:
+            nama_bersih = str(item.get('Nama', 'Unknown')).replace("Pekerjaan ", "").strip()
+            if nama_bersih in hasil: continue
+            if not item.get('Kuantitas', item.get('Volume', 0.0)) > 0: continue
+            # Cari probabilitas kemiripan tertinggi menggunakan algoritma Levenshtein
+            hasil[nama_bersih] = process.extractOne(nama_bersih, daftar_kunci_ahsp, scorer=fuzz.token_set_ratio)
+        return hasil
+
+    def _tulis_7tab_rab(self, workbook, data_boq, dict_database_ahsp, nama_proyek):
+        """Isi workbook RAB. Baris tiap sheet ditulis berurutan (syarat mode constant_memory)."""
+        if isinstance(data_boq, pd.DataFrame):
+            data_boq = data_boq.to_dict(orient='records')
         
         # -------------------------------------------------------
         # FORMATTING EXCEL
@@ -106,8 +147,9 @@ class Export_Engine:
         row_rab = 3
         no_rab = 1
         
-        # [PERBAIKAN TAHAP 2] Siapkan daftar AHSP untuk Mesin NLP
+        # [PERBAIKAN TAHAP 2] Siapkan daftar AHSP untuk Mesin NLP (dicocokkan 1x sebelum loop tulis)
         daftar_kunci_ahsp = list(map_baris_rekap.keys())
+        hasil_cocok = self._cocokkan_batch(data_boq, daftar_kunci_ahsp)
         
         for item in data_boq:
             nama_revit = str(item.get('Nama', 'Unknown'))
@@ -130,12 +172,7 @@ class Export_Engine:
             nama_bersih = nama_revit.replace("Pekerjaan ", "").strip()
             
             if daftar_kunci_ahsp and volume_val > 0:
-                # Cari probabilitas kemiripan tertinggi menggunakan algoritma Levenshtein
-                best_match, score = process.extractOne(
-                    nama_bersih, 
-                    daftar_kunci_ahsp, 
-                    scorer=fuzz.token_set_ratio
-                )
+                best_match, score = hasil_cocok[nama_bersih]
                 
                 # Jika kemiripan di atas batas toleransi 80%, hubungkan rumusnya!
                 if score >= 80:
@@ -201,5 +238,3 @@ class Export_Engine:
         # FINALISASI EXCEL
         # -------------------------------------------------------
         workbook.close()
-        output.seek(0)
-        return output
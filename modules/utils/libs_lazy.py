@@ -0,0 +1,260 @@
+# ==============================================================================
+# 📄 NAMA FILE: libs_lazy.py
+# 📍 LOKASI: modules/utils/libs_lazy.py
+# 🛠️ FUNGSI: Registry Engine Lazy (Import per Menu saat Dipakai) + Profil Waktu Import
+# ==============================================================================
+
+import importlib
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+import types
+
+import pandas as pd
+
+# Root repo (folder yang berisi app_enginex.py) -> dipakai subprocess profil import
+ROOT_REPO = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Baris output `python -X importtime`: "import time:  self [us] | cumulative | imported package"
+_POLA_IMPORTTIME = re.compile(r"^import time:\s*(\d+)\s*\|\s*(\d+)\s*\|(\s*)(\S+)\s*$")
+
+
+class Modul_Lazy(types.ModuleType):
+    """
+    Pengganti modul yang baru meng-import modul asli saat atribut pertama diakses.
+    Bisa dipakai seperti modul biasa: `libs_sni.SNI_Concrete_2019(...)`, `import libs_sni`,
+    `from libs_sni import X`. Atribut dunder (__file__, __path__, ...) sengaja TIDAK memicu
+    import agar pemindai sys.modules (file watcher Streamlit) tidak memuat semua engine.
+    """
+    def __init__(self, alias, registry):
+        super().__init__(alias)
+        object.__setattr__(self, '_alias', alias)
+        object.__setattr__(self, '_registry', registry)
+
+    def _modul(self):
+        return self._registry.muat(self._alias)
+
+    def __getattr__(self, nama):
+        if nama == '__all__':
+            # `from libs_x import *` -> semua nama publik modul asli
+            modul = self._modul()
+            return getattr(modul, '__all__', [k for k in vars(modul) if not k.startswith('_')])
+        if nama.startswith('__') and nama.endswith('__'):
+            raise AttributeError(nama)
+        return getattr(self._modul(), nama)
+
+    def __setattr__(self, nama, nilai):
+        setattr(self._modul(), nama, nilai)
+
+    def __dir__(self):
+        return dir(self._modul())
+
+    def __repr__(self):
+        status = "dimuat" if self._registry.sudah_dimuat(self._alias) else "belum dimuat"
+        return f"<Modul_Lazy '{self._alias}' ({status})>"
+
+
+class Registry_Engine_Lazy:
+    """
+    Daftar engine per menu. Modul asli di-import SEKALI per proses (di-cache), yaitu saat:
+      - atribut proxy pertama kali diakses, atau
+      - menu pemakainya dibuka (siapkan_menu).
+    Kegagalan import juga di-cache agar rerun Streamlit tidak mencoba ulang import yang rusak.
+    """
+    def __init__(self):
+        self._entri = {}      # alias -> {'kandidat', 'menu', 'opsional', 'sys_modules', 'proxy'}
+        self._modul = {}      # alias -> modul asli yang sudah dimuat
+        self._waktu = {}      # alias -> durasi import (detik, kumulatif termasuk dependensinya)
+        self._error = {}      # alias -> pesan ImportError
+        self._lock = threading.RLock()
+
+    # ==========================================
+    # 1. REGISTRASI
+    # ==========================================
+    def daftar(self, alias, nama_modul, menu=(), opsional=False, registrasi_sys=True):
+        """
+        Mendaftarkan engine tanpa meng-import-nya.
+        nama_modul: nama modul, atau tuple kandidat yang dicoba berurutan
+                    (misal ('modules.utils.libs_legal', 'libs_legal') untuk fallback folder root).
+        menu: label menu yang memakai engine ini. opsional: gagal import tidak menghentikan menu.
+        registrasi_sys: daftarkan juga sebagai sys.modules[alias] (untuk eksekusi kode dinamis).
+        Return: proxy Modul_Lazy (atau modul asli jika sudah dimuat di rerun sebelumnya).
+        """
+        with self._lock:
+            entri = self._entri.get(alias)
+            if entri is None:
+                kandidat = (nama_modul,) if isinstance(nama_modul, str) else tuple(nama_modul)
+                entri = {'kandidat': kandidat, 'menu': tuple(menu), 'opsional': opsional,
+                         'sys_modules': registrasi_sys, 'proxy': Modul_Lazy(alias, self)}
+                self._entri[alias] = entri
+            else:
+                entri['menu'] = tuple(dict.fromkeys(entri['menu'] + tuple(menu)))
+
+            if alias in self._modul:
+                return self._modul[alias]
+            if registrasi_sys and alias not in self._error and alias not in sys.modules:
+                sys.modules[alias] = entri['proxy']
+            return entri['proxy']
+
+    # ==========================================
+    # 2. IMPORTER TER-CACHE
+    # ==========================================
+    def muat(self, alias):
+        """Import modul asli (sekali saja). Raise ImportError jika semua kandidat gagal."""
+        modul = self._modul.get(alias)
+        if modul is not None:
+            return modul
+        with self._lock:
+            if alias in self._modul:
+                return self._modul[alias]
+            if alias in self._error:
+                raise ImportError(self._error[alias])
+
+            entri = self._entri[alias]
+            # Kandidat bernama sama dengan alias (misal fallback root 'libs_legal') akan
+            # mengembalikan proxy itu sendiri dari sys.modules -> lepas dulu selama import
+            proxy_sys = sys.modules.get(alias) is entri['proxy']
+            if proxy_sys:
+                del sys.modules[alias]
+            t_mulai = time.perf_counter()
+            pesan = []
+            try:
+                for nama in entri['kandidat']:
+                    try:
+                        modul = importlib.import_module(nama)
+                    except ImportError as e:
+                        pesan.append(f"{nama}: {e}")
+                        continue
+                    if isinstance(modul, Modul_Lazy):
+                        pesan.append(f"{nama}: yang ter-import adalah proxy lazy, bukan modul asli")
+                        modul = None
+                        continue
+                    break
+            except BaseException:
+                # Error selain ImportError tidak di-cache -> kembalikan proxy agar bisa dicoba lagi
+                if proxy_sys:
+                    sys.modules.setdefault(alias, entri['proxy'])
+                raise
+            self._waktu[alias] = time.perf_counter() - t_mulai
+
+            if modul is None:
+                self._error[alias] = "; ".join(pesan)
+                # Proxy tidak dikembalikan agar pengecekan `'libs_x' not in sys.modules` di menu tetap berlaku
+                raise ImportError(self._error[alias])
+
+            self._modul[alias] = modul
+            if entri['sys_modules']:
+                sys.modules[alias] = modul
+            return modul
+
+    def sudah_dimuat(self, alias):
+        return alias in self._modul
+
+    def bisa_dimuat(self, alias):
+        """True jika engine berhasil di-import (import dilakukan sekarang bila belum)"""
+        try:
+            self.muat(alias)
+            return True
+        except ImportError:
+            return False
+
+    def opsional(self, alias):
+        return self._entri[alias]['opsional']
+
+    def error(self, alias):
+        return self._error.get(alias)
+
+    def siapkan_menu(self, menu):
+        """
+        Memuat semua engine milik satu menu (dipanggil tepat sebelum menu dirender).
+        Engine opsional yang gagal cukup hilang dari sys.modules.
+        Return: Dictionary {alias: pesan_error} untuk engine WAJIB yang gagal dimuat.
+        """
+        gagal = {}
+        for alias, entri in list(self._entri.items()):
+            if menu not in entri['menu']:
+                continue
+            if not self.bisa_dimuat(alias) and not entri['opsional']:
+                gagal[alias] = self._error[alias]
+        return gagal
+
+    # ==========================================
+    # 3. LAPORAN
+    # ==========================================
+    def status(self):
+        """Tabel status semua engine terdaftar (untuk halaman Admin)"""
+        baris = []
+        for alias, entri in self._entri.items():
+            if alias in self._modul:
+                status = "✅ Dimuat"
+            elif alias in self._error:
+                status = "❌ Gagal"
+            else:
+                status = "💤 Belum dimuat"
+            waktu = self._waktu.get(alias)
+            baris.append({
+                'Engine': alias,
+                'Modul': self._modul[alias].__name__ if alias in self._modul else " | ".join(entri['kandidat']),
+                'Menu': ", ".join(entri['menu']) or "-",
+                'Status': status,
+                'Waktu Import (ms)': round(waktu * 1000, 1) if waktu is not None else None,
+                'Error': self._error.get(alias, ""),
+            })
+        return pd.DataFrame(baris)
+
+    def daftar_modul(self):
+        """Nama modul (kandidat pertama) semua engine terdaftar -> input profil_impor"""
+        return [entri['kandidat'][0] for entri in self._entri.values()]
+
+
+# Registry tunggal per proses (modul ini tetap di sys.modules di antara rerun Streamlit)
+REGISTRY = Registry_Engine_Lazy()
+
+
+# ==============================================================================
+# PROFIL WAKTU IMPORT (GAYA `python -X importtime`)
+# ==============================================================================
+def profil_impor(daftar_modul, top_n=30, timeout=300):
+    """
+    Meng-import daftar modul di interpreter BARU (cold start sungguhan, cache sys.modules kosong)
+    dengan `python -X importtime`, lalu merangkum output-nya.
+    Return: Dictionary {"Total_ms", "Per_Modul" (DataFrame top_n kumulatif), "Gagal"} atau {"error": ...}.
+    """
+    skrip = (
+        "import importlib, sys\n"
+        f"for m in {list(daftar_modul)!r}:\n"
+        "    try: importlib.import_module(m)\n"
+        "    except Exception as e: print(m + ': ' + repr(e), file=sys.stdout)\n"
+    )
+    try:
+        proses = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", skrip],
+            capture_output=True, text=True, timeout=timeout, cwd=ROOT_REPO
+        )
+    except subprocess.TimeoutExpired:
+        return {"error": f"Profil import melebihi batas waktu {timeout} detik."}
+    except OSError as e:
+        return {"error": str(e)}
+
+    baris = []
+    for teks in proses.stderr.splitlines():
+        cocok = _POLA_IMPORTTIME.match(teks)
+        if cocok:
+            self_us, kumulatif_us, indent, nama = cocok.groups()
+            baris.append((nama, int(self_us), int(kumulatif_us), (len(indent) - 1) // 2))
+    if not baris:
+        return {"error": "Output importtime kosong. " + proses.stderr[-500:]}
+
+    df = pd.DataFrame(baris, columns=['Modul', 'Self (ms)', 'Kumulatif (ms)', 'Kedalaman'])
+    df[['Self (ms)', 'Kumulatif (ms)']] = df[['Self (ms)', 'Kumulatif (ms)']] / 1000.0
+    # Import tingkat teratas (kedalaman 0) tidak saling tumpang tindih -> jumlahnya = total waktu import
+    total_ms = float(df.loc[df['Kedalaman'] == 0, 'Kumulatif (ms)'].sum())
+
+    return {
+        "Total_ms": round(total_ms, 1),
+        "Per_Modul": df.sort_values('Kumulatif (ms)', ascending=False).head(top_n).reset_index(drop=True),
+        "Gagal": [b for b in proses.stdout.splitlines() if b.strip()],
+    }
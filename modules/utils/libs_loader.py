@@ -6,16 +6,21 @@
 
 import streamlit as st
 import pandas as pd
-import geopandas as gpd
-import ezdxf
-from ezdxf.addons.drawing import RenderContext, Frontend
-from ezdxf.addons.drawing.matplotlib import MatplotlibBackend
-import matplotlib.pyplot as plt
 import io
 import os
 import tempfile
 import zipfile   # <-- DIKEMBALIKAN: Untuk membaca Shapefile (SHP) di dalam ZIP
-import gpxpy     # <-- DIKEMBALIKAN: Untuk membaca track GPS alat ukur
+# geopandas, gpxpy & ezdxf di-import di cabang yang memakainya (cold start lebih ringan)
+
+try:
+    from modules.utils import libs_dxf_stream, libs_pratinjau
+except ImportError:
+    import libs_dxf_stream
+    import libs_pratinjau
+
+# File DXF di atas batas ini tidak dirender penuh (butuh seluruh dokumen di RAM),
+# cukup pratinjau cepat hasil streaming (libs_pratinjau.MODE_CEPAT)
+BATAS_RENDER_PENUH_MB = 25
 
 # ---------------------------------------------------------
 # 1. IMPORT ENGINE GIS (Vektor: GeoJSON, KML)
@@ -55,9 +60,10 @@ def safe_chunked_save(uploaded_file, suffix):
     
     return temp_file.name
 
-def process_special_file(uploaded_file):
+def process_special_file(uploaded_file, pratinjau=True):
     """
     Fungsi Universal untuk membaca file CAD & GIS dengan Proteksi Memori.
+    pratinjau=False: lewati pembuatan gambar (misal menu Topografi yang hanya butuh titik).
     Output: (text_summary, image_buffer, dataframe_raw)
     """
     filename = uploaded_file.name.lower()
@@ -65,81 +71,48 @@ def process_special_file(uploaded_file):
     image_buf = None
     df_data = None
     
-    # Batasan Ekstraksi (Safety Limiters untuk mencegah RAM Penuh saat parsing)
-    MAX_TEXT_ENTITIES = 500
-    MAX_3D_POINTS = 50000
-
     try:
         # =====================================================================
         # BLOK 1: HANDLING DXF (CAD & TOPOGRAFI 3D) DENGAN DISK-STREAMING
         # =====================================================================
         if filename.endswith(".dxf"):
-            import ezdxf
-            from ezdxf.addons.drawing import RenderContext, Frontend
-            from ezdxf.addons.drawing.matplotlib import MatplotlibBackend
-            import matplotlib.pyplot as plt
-            import io
             import os
             
             # 1. Simpan ke Disk secara parsial (Anti-Crash)
             tmp_path = safe_chunked_save(uploaded_file, ".dxf")
             
             try:
-                # 2. Baca file langsung dari Disk (Jauh lebih hemat RAM daripada StringIO)
-                doc = ezdxf.readfile(tmp_path)
-                msp = doc.modelspace()
-                
-                # --- A. EKSTRAK TEKS (DENGAN BATASAN MEMORI) ---
-                text_entities = set()
-                # Menggunakan generator untuk tidak menumpuk semua data di awal
-                for e in msp.query('TEXT MTEXT'):
-                    if len(text_entities) >= MAX_TEXT_ENTITIES: break
-                    
-                    if e.dxftype() == 'TEXT': text_entities.add(e.dxf.text)
-                    elif e.dxftype() == 'MTEXT': text_entities.add(e.text)
+                # 2. Baca entitas satu per satu langsung dari Disk (iterdxf) tanpa memuat seluruh gambar,
+                #    sehingga tidak perlu lagi batas jumlah titik / teks
+                #    Titik unik disimpan sebagai artefak .npy per hash file -> rerun tidak parsing ulang
+                kode_hash = libs_pratinjau.hash_file(tmp_path)
+                hasil = libs_dxf_stream.baca_titik_tercache(tmp_path, kode_hash)
+                if "error" in hasil:
+                    return f"Gagal membaca struktur file: {hasil['error']}", None, None
                 
-                unique_texts = list(text_entities)
+                # --- A. RINGKASAN TEKS ---
+                text_info = f"**Analisis Otomatis File DXF (Mode Streaming):**\n"
+                text_info += f"- Versi DXF: {hasil['Versi']}\n"
+                text_info += f"- Teks Terbaca: {', '.join(hasil['Teks_Sampel'])} ... (Total {hasil['Jumlah_Teks']} entitas teks)\n"
                 
-                text_info = f"**Analisis Otomatis File DXF (Mode Terproteksi):**\n"
-                text_info += f"- Versi DXF: {doc.dxfversion}\n"
-                text_info += f"- Teks Terbaca: {', '.join(unique_texts[:20])} ... (Dibatasi {len(unique_texts)} entri untuk memori)\n"
-                
-                # --- B. EKSTRAK KOORDINAT 3D Z (DENGAN BATASAN MEMORI) ---
-                titik_3d = set()
-                
-                for e in msp.query('POINT LWPOLYLINE POLYLINE 3DFACE'):
-                    if len(titik_3d) >= MAX_3D_POINTS: 
-                        text_info += f"\n⚠️ **Peringatan Densitas Masif**: Pembacaan titik dihentikan pada {MAX_3D_POINTS} koordinat untuk mencegah crash sistem.\n"
-                        break
-                        
-                    if e.dxftype() == 'POINT':
-                        titik_3d.add((round(e.dxf.location.x, 3), round(e.dxf.location.y, 3), round(e.dxf.location.z, 3)))
-                    elif e.dxftype() == 'LWPOLYLINE':
-                        for pt in e.get_points(format='xy'):
-                            titik_3d.add((round(pt[0], 3), round(pt[1], 3), round(e.dxf.elevation, 3)))
-                    elif e.dxftype() == '3DFACE':
-                        for vtx in [e.dxf.vtx0, e.dxf.vtx1, e.dxf.vtx2, e.dxf.vtx3]:
-                            titik_3d.add((round(vtx.x, 3), round(vtx.y, 3), round(vtx.z, 3)))
-
-                if titik_3d:
-                    df_data = pd.DataFrame(list(titik_3d), columns=['X', 'Y', 'Z'])
+                # --- B. KOORDINAT 3D Z (SELURUH TITIK, BUFFER NUMPY) ---
+                if len(hasil['Titik']):
+                    df_data = pd.DataFrame(hasil['Titik'], columns=['X', 'Y', 'Z'], copy=False)
+                    df_data.attrs['Artefak'] = hasil['Artefak']  # Dibuka ulang via Topografi_Engine.muat_awan_titik
                     text_info += f"\n**Data Topografi (Elevasi 3D):**\n"
                     text_info += f"- Berhasil mengekstrak {len(df_data)} titik koordinat spasial.\n"
                     text_info += f"- Elevasi Terendah: {df_data['Z'].min():.2f} mdpl\n"
                     text_info += f"- Elevasi Tertinggi: {df_data['Z'].max():.2f} mdpl\n"
                     text_info += f"*Instruksi AI: Jika user meminta Cut & Fill, gunakan Dataframe ini.*\n"
 
-                # --- C. RENDER GAMBAR (Diperkecil DPI-nya untuk Cloud) ---
-                fig = plt.figure(figsize=(8, 5))
-                ax = fig.add_axes([0, 0, 1, 1])
-                ctx = RenderContext(doc)
-                out = MatplotlibBackend(ax)
-                Frontend(ctx, out).draw_layout(msp, finalize=True)
-                
-                image_buf = io.BytesIO()
-                fig.savefig(image_buf, format='png', dpi=100) # DPI diturunkan dari 150 ke 100 agar ringan
-                image_buf.seek(0)
-                plt.close(fig)
+                # --- C. PRATINJAU GAMBAR (Worker latar belakang + cache disk, tidak render ulang tiap rerun) ---
+                if pratinjau:
+                    boleh_penuh = os.path.getsize(tmp_path) <= BATAS_RENDER_PENUH_MB * 1024 * 1024
+                    image_buf, catatan = libs_pratinjau.PRATINJAU.pratinjau(tmp_path, penuh=boleh_penuh, kode_hash=kode_hash)
+                    text_info += catatan
+                    if image_buf is None and df_data is not None:
+                        image_buf = libs_dxf_stream.gambar_pratinjau_titik(df_data[['X', 'Y', 'Z']].to_numpy())
+                        text_info += "- Pratinjau: sebaran titik (pratinjau garis belum tersedia).\n"
 
             finally:
                 # 3. Selalu bersihkan file temporary dari disk agar harddisk server tidak penuh
@@ -216,6 +189,7 @@ def process_special_file(uploaded_file):
 
         elif filename.endswith('.zip'):
             try:
+                import geopandas as gpd
                 gdf = gpd.read_file(uploaded_file)
                 if not gdf.empty and gdf.geom_type[0] in ['Polygon', 'MultiPolygon']:
                     gdf_metric = gdf.to_crs(epsg=3857) 
@@ -236,16 +210,83 @@ class DXF_QTO_Engine:
     Membaca file DXF dan mengekstrak Luasan (Area) serta Panjang (Length).
     [AUDIT PATCH]: Dilengkapi Micro-buffering, Rekursi Block (INSERT), dan 
     Algoritma Area-based Even-Odd Boolean untuk lubang (Void) yang anti-crash.
+    Kedalaman sarang (void/pulau) dicari via STRtree, lalu 1 unary_union per kedalaman;
+    layer yang saling bebas dihitung paralel (operasi GEOS melepas GIL).
     """
-    def __init__(self):
+    # Poligon dianggap berada DI DALAM poligon lain jika >= 95% luasnya tertutup
+    RASIO_KANDUNGAN = 0.95
+
+    def __init__(self, max_workers=None):
         self.engine_name = "SmartBIM Vector QTO Engine (OGC Topology & Block Support)"
+        self.max_workers = max_workers
+
+    @staticmethod
+    def layer_diabaikan(layer_name):
+        """Layer standar/sampah visual yang tidak dihitung volumenya"""
+        return any(abaikan in layer_name.lower() for abaikan in ['dim', 'text', 'defpoints', '0', 'grid', 'as', 'arsir', 'hatch'])
+
+    @classmethod
+    def hitung_luas_bersih(cls, polys):
+        """
+        Luas bersih (Net Area) satu layer dengan aturan Even-Odd:
+        kedalaman 0 = solid, 1 = lubang (void), 2 = pulau di dalam lubang, dst.
+        Void/pulau bersarang murni menghasilkan luas yang sama dengan algoritma berurutan lama.
+        Perubahan yang disengaja untuk poligon yang tumpang tindih SEBAGIAN: kandungan dinilai per
+        pasangan poligon (>= 95% tertutup oleh SATU poligon lain), bukan terhadap gabungan hasil
+        sementara. Poligon yang hanya tertutup gabungan beberapa poligon kini dihitung solid (bukan
+        lubang), dan hasilnya tidak lagi bergantung pada urutan gambar.
+        Return: geometri hasil boolean (Polygon/MultiPolygon), atau None jika tidak ada poligon valid.
+        """
+        import numpy as np
+        import shapely
+
+        geoms = np.asarray(polys, dtype=object)
+        # Poligon self-intersecting diperbaiki sekaligus (vektor), bukan satu per satu
+        rusak = ~shapely.is_valid(geoms)
+        if rusak.any():
+            geoms[rusak] = shapely.buffer(geoms[rusak], 0)
+        # [PATCH]: Micro-buffering untuk menjahit celah mikroskopis (snapping issue)
+        geoms = shapely.buffer(shapely.buffer(geoms, 1e-5), -1e-5)
+        luas = shapely.area(geoms)
+        geoms, luas = geoms[luas > 0], luas[luas > 0]
+        if not len(geoms):
+            return None
+
+        # Urutkan dari yang terluas: calon "wadah" selalu punya indeks lebih kecil
+        urutan = np.argsort(-luas, kind='stable')
+        geoms, luas = geoms[urutan], luas[urutan]
+
+        # Pasangan kandidat (poligon, calon wadah) dari indeks spasial, bukan O(n^2)
+        idx_dalam, idx_wadah = shapely.STRtree(geoms).query(geoms, predicate='intersects')
+        pilih = idx_wadah < idx_dalam
+        idx_dalam, idx_wadah = idx_dalam[pilih], idx_wadah[pilih]
+
+        # Terkandung penuh (contains) atau >= 95% tertutup (toleransi gambar CAD yang tidak presisi)
+        terkandung = shapely.contains(geoms[idx_wadah], geoms[idx_dalam])
+        cek_irisan = ~terkandung
+        if cek_irisan.any():
+            irisan = shapely.area(shapely.intersection(geoms[idx_wadah[cek_irisan]], geoms[idx_dalam[cek_irisan]]))
+            terkandung[cek_irisan] = irisan > luas[idx_dalam[cek_irisan]] * cls.RASIO_KANDUNGAN
+        kedalaman = np.bincount(idx_dalam[terkandung], minlength=len(geoms))
+
+        # Satu unary_union per kedalaman: genap ditambahkan, ganjil dikurangkan
+        final_geom = None
+        for d in range(int(kedalaman.max()) + 1):
+            lapis = shapely.union_all(geoms[kedalaman == d])
+            if final_geom is None:
+                final_geom = lapis
+            elif d % 2:
+                final_geom = final_geom.difference(lapis)
+            else:
+                final_geom = final_geom.union(lapis)
+        return final_geom
 
     def extract_qto_from_dxf(self, file_stream):
         import ezdxf
         import pandas as pd
-        import tempfile
         import os
         import math
+        from concurrent.futures import ThreadPoolExecutor
         
         # Import fungsionalitas topologi spasial Shapely
         try:
@@ -255,78 +296,69 @@ class DXF_QTO_Engine:
             return None, "Library 'shapely' belum terinstall. Mesin QTO gagal dimuat."
 
         # 1. Simpan stream DXF sementara ke disk untuk menghemat RAM streaming
-        file_stream.seek(0)
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".dxf") as tmp:
-            tmp.write(file_stream.read())
-            tmp_path = tmp.name
+        tmp_path = safe_chunked_save(file_stream, ".dxf")
 
         try:
-            doc = ezdxf.readfile(tmp_path)
-            msp = doc.modelspace()
-            
             qto_data = []
             layer_polygons = {}
             layer_lines = {}
 
             # ========================================================
-            # FUNGSI REKURSIF UNTUK MEMBACA BLOCK (INSERT)
-            # Menjawab bug "Kebutaan Sistem Terhadap Entitas Referensi Blok"
+            # 2. Iterasi streaming seluruh entitas modelspace
+            # Menjawab bug "Kebutaan Sistem Terhadap Entitas Referensi Blok":
+            # INSERT tidak lagi di-explode satu per satu; cukup dicatat matriksnya,
+            # geometri tiap definisi blok diurai sekali di Cache_Geometri_Blok
             # ========================================================
-            def get_virtual_entities(entity):
-                if entity.dxftype() == 'INSERT':
-                    try:
-                        # Memecah block menjadi entitas virtual (garis/poligon dasar)
-                        # di posisi koordinat aslinya (explode on-the-fly)
-                        for virtual_e in entity.virtual_entities():
-                            yield from get_virtual_entities(virtual_e)
-                    except:
-                        pass
-                else:
-                    yield entity
-
-            # 2. Iterasi seluruh entitas (termasuk yang ada di dalam Block)
-            for base_entity in msp:
-                for entity in get_virtual_entities(base_entity):
-                    layer_name = entity.dxf.layer
-                    dxftype = entity.dxftype()
-
-                    # Abaikan layer standar/sampah visual
-                    if any(abaikan in layer_name.lower() for abaikan in ['dim', 'text', 'defpoints', '0', 'grid', 'as', 'arsir', 'hatch']):
-                        continue
-
-                    # A. Tangkap LWPOLYLINE (Area atau Garis)
-                    if dxftype == 'LWPOLYLINE':
-                        points = list(entity.get_points(format='xy'))
-                        if len(points) < 2: continue
-                        
-                        is_closed = entity.is_closed if hasattr(entity, 'is_closed') else (points[0] == points[-1])
-                        
-                        if is_closed:
-                            if len(points) >= 3:
-                                poly = Polygon(points)
-                                if not poly.is_valid:
-                                    poly = poly.buffer(0) 
-                                if poly.area > 0:
-                                    layer_polygons.setdefault(layer_name, []).append(poly)
-                        else:
-                            line = LineString(points)
-                            layer_lines[layer_name] = layer_lines.get(layer_name, 0.0) + line.length
-
-                    # B. Tangkap LINE biasa
-                    elif dxftype == 'LINE':
-                        start = entity.dxf.start
-                        end = entity.dxf.end
-                        length = math.dist((start.x, start.y), (end.x, end.y))
-                        if length > 0:
-                            layer_lines[layer_name] = layer_lines.get(layer_name, 0.0) + length
-
-                    # C. Tangkap CIRCLE
-                    elif dxftype == 'CIRCLE':
-                        center = (entity.dxf.center.x, entity.dxf.center.y)
-                        radius = entity.dxf.radius
-                        if radius > 0:
-                            circle_poly = Point(center).buffer(radius)
-                            layer_polygons.setdefault(layer_name, []).append(circle_poly)
+            cache_blok = libs_dxf_stream.Cache_Geometri_Blok(tmp_path, ('LWPOLYLINE', 'LINE', 'CIRCLE'))
+            for entity in libs_dxf_stream.iter_modelspace(tmp_path, types=('LWPOLYLINE', 'LINE', 'CIRCLE', 'INSERT')):
+                layer_name = entity.dxf.layer
+                dxftype = entity.dxftype()
+
+                if dxftype == 'INSERT':
+                    cache_blok.catat_insert(entity)
+                    continue
+
+                # Abaikan layer standar/sampah visual
+                if self.layer_diabaikan(layer_name):
+                    continue
+
+                # A. Tangkap LWPOLYLINE (Area atau Garis)
+                if dxftype == 'LWPOLYLINE':
+                    points = list(entity.get_points(format='xy'))
+                    if len(points) < 2: continue
+                    
+                    is_closed = entity.is_closed if hasattr(entity, 'is_closed') else (points[0] == points[-1])
+                    
+                    if is_closed:
+                        if len(points) >= 3:
+                            # Validasi & luas dicek massal di hitung_luas_bersih
+                            layer_polygons.setdefault(layer_name, []).append(Polygon(points))
+                    else:
+                        line = LineString(points)
+                        layer_lines[layer_name] = layer_lines.get(layer_name, 0.0) + line.length
+
+                # B. Tangkap LINE biasa
+                elif dxftype == 'LINE':
+                    start = entity.dxf.start
+                    end = entity.dxf.end
+                    length = math.dist((start.x, start.y), (end.x, end.y))
+                    if length > 0:
+                        layer_lines[layer_name] = layer_lines.get(layer_name, 0.0) + length
+
+                # C. Tangkap CIRCLE
+                elif dxftype == 'CIRCLE':
+                    center = (entity.dxf.center.x, entity.dxf.center.y)
+                    radius = entity.dxf.radius
+                    if radius > 0:
+                        circle_poly = Point(center).buffer(radius)
+                        layer_polygons.setdefault(layer_name, []).append(circle_poly)
+
+            # Isi blok: semua insert per definisi ditransformasi sekaligus (vektor)
+            poligon_blok, panjang_blok = cache_blok.hasil(abaikan_layer=self.layer_diabaikan)
+            for layer_name, polys in poligon_blok.items():
+                layer_polygons.setdefault(layer_name, []).extend(polys)
+            for layer_name, length in panjang_blok.items():
+                layer_lines[layer_name] = layer_lines.get(layer_name, 0.0) + length
 
             # Segera hancurkan file temporary untuk membebaskan disk
             os.remove(tmp_path)
@@ -335,38 +367,15 @@ class DXF_QTO_Engine:
             # 3. EKSEKUSI BOOLEAN GEOMETRI & TOPOLOGI (PENCEGAHAN CRASH)
             # Menjawab bug "Kerentanan Kegagalan Topologi pada Geometri Bersarang"
             # ========================================================
-            for layer, polys in layer_polygons.items():
-                # Urutkan poligon dari yang terluas ke terkecil
-                polys_sorted = sorted(polys, key=lambda p: p.area, reverse=True)
-                
-                # Inisialisasi geometri kosong untuk menampung kanvas
-                final_geom = Polygon() 
-                
-                for p in polys_sorted:
-                    # [PATCH]: Micro-buffering untuk menjahit celah mikroskopis (snapping issue)
-                    p_clean = p.buffer(1e-5).buffer(-1e-5)
-                    if p_clean.is_empty: continue
-                    
-                    # Logika Even-Odd Area:
-                    # Jika 95% dari poligon P ini sudah berada di dalam final_geom, 
-                    # maka secara logis P adalah sebuah LUBANG (Void) -> Lakukan Difference
-                    intersection_area = final_geom.intersection(p_clean).area
-                    
-                    if intersection_area > (p_clean.area * 0.95):
-                        final_geom = final_geom.difference(p_clean)
-                    else:
-                        # Jika tidak tumpang tindih secara masif, ini adalah poligon baru (atau pulau di dalam lubang)
-                        final_geom = final_geom.union(p_clean)
-                
-                # Agregasi total luas bersih (Net Area)
-                # Metode ini otomatis menangani MultiPolygon tanpa iterasi manual
-                net_area = final_geom.area
-                if net_area > 0:
-                    qto_data.append({"Layer (Item Pekerjaan)": layer, "Kategori": "Luasan (m2)", "Volume": net_area})
-                
-                # Kosongkan memori iterasi
-                del final_geom
-                del polys_sorted
+            n_worker = self.max_workers or min(len(layer_polygons), os.cpu_count() or 1)
+            with ThreadPoolExecutor(max_workers=max(1, n_worker)) as pool:
+                hasil_layer = pool.map(self.hitung_luas_bersih, layer_polygons.values())
+                for layer, final_geom in zip(layer_polygons, hasil_layer):
+                    # Agregasi total luas bersih (Net Area)
+                    # Metode ini otomatis menangani MultiPolygon tanpa iterasi manual
+                    net_area = final_geom.area if final_geom is not None else 0.0
+                    if net_area > 0:
+                        qto_data.append({"Layer (Item Pekerjaan)": layer, "Kategori": "Luasan (m2)", "Volume": net_area})
 
             # 4. Agregasi Total Panjang (Line)
             for layer, length in layer_lines.items():
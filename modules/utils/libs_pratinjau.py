@@ -0,0 +1,353 @@
+# ==============================================================================
+# 📄 NAMA FILE: libs_pratinjau.py
+# 📍 LOKASI: modules/utils/libs_pratinjau.py
+# 🛠️ FUNGSI: Renderer Pratinjau DXF di Latar Belakang + Cache Disk (Hash File + Parameter Tampilan)
+# ==============================================================================
+
+import hashlib
+import io
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import numpy as np
+
+try:
+    from modules.utils import libs_dxf_stream
+except ImportError:
+    import libs_dxf_stream
+
+FOLDER_CACHE = os.path.join(tempfile.gettempdir(), "smartbim_pratinjau")
+MODE_CEPAT = 'cepat'   # Streaming, garis saja (tanpa hatch & teks), polyline disederhanakan
+MODE_PENUH = 'penuh'   # ezdxf Frontend (seluruh gambar dimuat ke RAM)
+# Batas waktu menunggu pratinjau cepat sebelum UI jalan terus tanpa gambar
+BATAS_TUNGGU_DETIK = 15
+# Render yang gagal tidak dicoba ulang di setiap rerun, tetapi dicoba lagi setelah batas ini
+BATAS_ERROR_DETIK = 300
+
+TIPE_CEPAT = ('LINE', 'LWPOLYLINE', 'POLYLINE', 'ARC', 'CIRCLE', 'INSERT')
+SEGMEN_LINGKARAN = 32
+
+
+def hash_file(path, ukuran_blok=4 * 1024 * 1024):
+    """SHA-256 isi file, dibaca per 4MB (kunci cache: file sama = pratinjau sama)"""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for blok in iter(lambda: f.read(ukuran_blok), b''):
+            h.update(blok)
+    return h.hexdigest()
+
+
+# ==========================================
+# 1. RENDERER (DIPANGGIL DI THREAD WORKER)
+# ==========================================
+def _gambar_kosong(ukuran, latar):
+    # Figure tanpa pyplot: aman dipakai dari thread selain thread utama
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    fig = Figure(figsize=ukuran, facecolor=latar)
+    FigureCanvasAgg(fig)
+    return fig, fig.add_axes([0, 0, 1, 1])
+
+
+def _simpan_png(fig, dpi, latar):
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', dpi=dpi, facecolor=latar)
+    return buf.getvalue()
+
+
+def _titik_garis(e):
+    """Titik 2D satu entitas garis (busur & lingkaran didiskritisasi), None jika dilewati"""
+    tipe = e.dxftype()
+    if tipe == 'LINE':
+        s, t = e.dxf.start, e.dxf.end
+        return np.array([[s.x, s.y], [t.x, t.y]])
+    if tipe == 'LWPOLYLINE':
+        pts = np.array(list(e.get_points(format='xy')), dtype=np.float64).reshape(-1, 2)
+        return np.vstack([pts, pts[:1]]) if e.is_closed and len(pts) > 2 else pts
+    if tipe == 'POLYLINE':
+        if not (e.is_2d_polyline or e.is_3d_polyline):
+            return None  # Polyface / mesh: dilewati di mode cepat
+        pts = np.array([(v.dxf.location.x, v.dxf.location.y) for v in e.vertices], dtype=np.float64).reshape(-1, 2)
+        return np.vstack([pts, pts[:1]]) if e.is_closed and len(pts) > 2 else pts
+    if tipe in ('ARC', 'CIRCLE'):
+        c, r = e.dxf.center, e.dxf.radius
+        if tipe == 'CIRCLE':
+            sudut = np.linspace(0.0, 2 * np.pi, SEGMEN_LINGKARAN + 1)
+        else:
+            awal, akhir = np.radians(e.dxf.start_angle), np.radians(e.dxf.end_angle)
+            if akhir <= awal:
+                akhir += 2 * np.pi
+            n = max(2, int(np.ceil(SEGMEN_LINGKARAN * (akhir - awal) / (2 * np.pi))) + 1)
+            sudut = np.linspace(awal, akhir, n)
+        return np.column_stack([c.x + r * np.cos(sudut), c.y + r * np.sin(sudut)])
+    return None
+
+
+def render_cepat(path, dpi=100, ukuran=(8, 5), latar='white'):
+    """
+    Pratinjau detail rendah tanpa memuat seluruh gambar: satu lintasan streaming,
+    HATCH/TEXT/DIMENSION dilewati, polyline disederhanakan (toleransi 1 piksel),
+    blok diekspansi lewat Cache_Geometri_Blok, semua digambar sebagai satu LineCollection.
+    Return: bytes PNG, atau None jika gambar tidak punya geometri garis.
+    """
+    import shapely
+    from matplotlib.collections import LineCollection
+    from matplotlib.colors import to_rgb
+
+    polyline = []
+    cache_blok = libs_dxf_stream.Cache_Geometri_Blok(path)
+    for e in libs_dxf_stream.iter_modelspace(path, types=TIPE_CEPAT):
+        if e.dxftype() == 'INSERT':
+            cache_blok.catat_insert(e)
+            continue
+        pts = _titik_garis(e)
+        if pts is not None and len(pts) >= 2:
+            polyline.append(pts)
+
+    segmen = list(cache_blok.iter_segmen())
+    if polyline:
+        koordinat = np.concatenate(polyline)
+        indeks = np.repeat(np.arange(len(polyline)), [len(p) for p in polyline])
+
+        bawah, atas = koordinat.min(axis=0), koordinat.max(axis=0)
+        for s in segmen:
+            titik = s.reshape(-1, 2)
+            bawah, atas = np.minimum(bawah, titik.min(axis=0)), np.maximum(atas, titik.max(axis=0))
+        toleransi = float((atas - bawah).max()) / (ukuran[0] * dpi)
+
+        garis = shapely.linestrings(koordinat, indices=indeks)
+        if toleransi > 0:
+            garis = shapely.simplify(garis, toleransi, preserve_topology=False)
+        koordinat, indeks = shapely.get_coordinates(garis, return_index=True)
+        sambung = indeks[1:] == indeks[:-1]
+        segmen.append(np.stack([koordinat[:-1][sambung], koordinat[1:][sambung]], axis=1))
+
+    segmen = [s for s in segmen if len(s)]
+    if not segmen:
+        return None
+    segmen = np.concatenate(segmen)
+    titik = segmen.reshape(-1, 2)
+    bawah, atas = titik.min(axis=0), titik.max(axis=0)
+    margin = max(float((atas - bawah).max()) * 0.02, 1e-6)
+
+    warna = '#1f1f1f' if sum(to_rgb(latar)) / 3 > 0.5 else '#e0e0e0'
+    fig, ax = _gambar_kosong(ukuran, latar)
+    ax.set_facecolor(latar)
+    ax.add_collection(LineCollection(segmen, linewidths=0.4, colors=warna))
+    ax.set_xlim(bawah[0] - margin, atas[0] + margin)
+    ax.set_ylim(bawah[1] - margin, atas[1] + margin)
+    ax.set_aspect('equal', adjustable='box')
+    ax.axis('off')
+    return _simpan_png(fig, dpi, latar)
+
+
+def render_penuh(path, dpi=100, ukuran=(8, 5), latar='white'):
+    """Render lengkap ezdxf (hatch, teks, warna layer) - hanya untuk file berukuran wajar"""
+    import ezdxf
+    from ezdxf.addons.drawing import RenderContext, Frontend
+    from ezdxf.addons.drawing.matplotlib import MatplotlibBackend
+
+    doc = ezdxf.readfile(path)
+    fig, ax = _gambar_kosong(ukuran, latar)
+    Frontend(RenderContext(doc), MatplotlibBackend(ax)).draw_layout(doc.modelspace(), finalize=True)
+    return _simpan_png(fig, dpi, latar)
+
+
+RENDERER = {MODE_CEPAT: render_cepat, MODE_PENUH: render_penuh}
+
+
+# ==========================================
+# 2. WORKER LATAR BELAKANG + CACHE DISK
+# ==========================================
+class Pratinjau_DXF_Engine:
+    """
+    Antrian render pratinjau DXF di thread latar belakang dengan cache PNG di disk.
+    Kunci cache = hash isi file + mode + dpi + ukuran + warna latar, sehingga rerun Streamlit
+    atau upload ulang file yang sama langsung memakai gambar yang sudah ada.
+    File sumber di-hardlink (atau disalin) ke folder cache, jadi pemanggil bebas menghapus file temporary-nya.
+    """
+    def __init__(self, folder_cache=FOLDER_CACHE, max_workers=1, batas_cache_mb=256, batas_error_detik=BATAS_ERROR_DETIK):
+        self.folder_cache = folder_cache
+        self.batas_cache_mb = batas_cache_mb
+        self.batas_error_detik = batas_error_detik
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pratinjau_dxf")
+        self._tugas = {}      # kunci -> Future
+        self._error = {}      # kunci -> (pesan error, waktu gagal); kedaluwarsa setelah batas_error_detik
+        self._sumber = {}     # hash file -> [path salinan, jumlah tugas aktif]
+        self._lock = threading.Lock()
+
+    def kunci(self, kode_hash, mode=MODE_CEPAT, dpi=100, ukuran=(8, 5), latar='white'):
+        teks = f"{kode_hash[:32]}_{mode}_{dpi}_{ukuran[0]:g}x{ukuran[1]:g}_{latar}"
+        return re.sub(r'[^0-9A-Za-z_.-]', '', teks)
+
+    def path_cache(self, kunci):
+        return os.path.join(self.folder_cache, f"{kunci}.png")
+
+    def ambil(self, kunci):
+        """Gambar dari cache disk (BytesIO) atau None"""
+        path = self.path_cache(kunci)
+        try:
+            with open(path, 'rb') as f:
+                buf = io.BytesIO(f.read())
+            os.utime(path)  # Tandai baru dipakai (pembersihan cache membuang yang paling lama)
+            return buf
+        except OSError:
+            return None
+
+    def status(self, kunci):
+        """'siap' | 'proses' | 'gagal' | 'tidak ada'"""
+        if os.path.exists(self.path_cache(kunci)):
+            return 'siap'
+        if self.error(kunci) is not None:
+            return 'gagal'
+        tugas = self._tugas.get(kunci)
+        return 'proses' if tugas is not None and not tugas.done() else 'tidak ada'
+
+    def error(self, kunci):
+        """Pesan error render yang belum kedaluwarsa, atau None"""
+        with self._lock:
+            return self._error_aktif(kunci)
+
+    def _error_aktif(self, kunci):
+        # Dipanggil di dalam self._lock; error kedaluwarsa dibuang agar render dicoba ulang
+        entri = self._error.get(kunci)
+        if entri is None:
+            return None
+        if time.monotonic() - entri[1] >= self.batas_error_detik:
+            del self._error[kunci]
+            return None
+        return entri[0]
+
+    def _catat_error(self, kunci, pesan):
+        with self._lock:
+            self._error[kunci] = (pesan, time.monotonic())
+
+    def minta(self, path, mode=MODE_CEPAT, dpi=100, ukuran=(8, 5), latar='white', kode_hash=None):
+        """
+        Ambil pratinjau dari cache, atau antrekan render-nya di latar belakang (tidak memblokir).
+        Output: Dictionary {"Kunci", "Status", "Gambar" (BytesIO/None)} (+ "error" jika gagal).
+        """
+        kode_hash = kode_hash or hash_file(path)
+        kunci = self.kunci(kode_hash, mode, dpi, ukuran, latar)
+        gambar = self.ambil(kunci)
+        if gambar is not None:
+            return {"Kunci": kunci, "Status": 'siap', "Gambar": gambar}
+
+        with self._lock:
+            pesan_error = self._error_aktif(kunci)
+            if pesan_error is not None:
+                return {"Kunci": kunci, "Status": 'gagal', "Gambar": None, "error": pesan_error}
+            tugas = self._tugas.get(kunci)
+            if tugas is None or tugas.done():
+                sumber = self._pegang_sumber(path, kode_hash)
+                self._tugas[kunci] = self._executor.submit(
+                    self._kerjakan, kunci, kode_hash, sumber, mode, dpi, ukuran, latar
+                )
+        return {"Kunci": kunci, "Status": 'proses', "Gambar": None}
+
+    def tunggu(self, kunci, timeout=BATAS_TUNGGU_DETIK):
+        """Tunggu render selesai maksimal `timeout` detik. Return: BytesIO atau None"""
+        tugas = self._tugas.get(kunci)
+        if tugas is not None:
+            wait([tugas], timeout=timeout)
+        return self.ambil(kunci)
+
+    def pratinjau(self, path, penuh=True, dpi=100, ukuran=(8, 5), latar='white', timeout=BATAS_TUNGGU_DETIK, kode_hash=None):
+        """
+        Alur pratinjau untuk UI (tanpa render sinkron berulang):
+          1. Render penuh yang sudah ada di cache disk -> langsung dipakai.
+          2. Jika belum ada: render cepat ditunggu maksimal `timeout` detik,
+             render penuh diantrekan di latar belakang untuk rerun / upload berikutnya.
+        penuh=False (file sangat besar): hanya render cepat.
+        Output: (BytesIO atau None, catatan untuk ringkasan teks)
+        """
+        kode_hash = kode_hash or hash_file(path)
+        param = dict(dpi=dpi, ukuran=ukuran, latar=latar)
+        if penuh:
+            gambar = self.ambil(self.kunci(kode_hash, MODE_PENUH, **param))
+            if gambar is not None:
+                return gambar, ""
+
+        # Render cepat diantrekan lebih dulu agar tidak menunggu di belakang render penuh
+        cepat = self.minta(path, MODE_CEPAT, kode_hash=kode_hash, **param)
+        if penuh:
+            self.minta(path, MODE_PENUH, kode_hash=kode_hash, **param)
+        gambar = cepat['Gambar'] or self.tunggu(cepat['Kunci'], timeout)
+
+        catatan = ""
+        if gambar is not None and penuh:
+            catatan = "- Pratinjau: mode cepat (render detail sedang disiapkan di latar belakang).\n"
+        elif gambar is None and self.status(cepat['Kunci']) == 'proses':
+            catatan = "- Pratinjau: masih dirender di latar belakang, akan tampil saat file dibuka kembali.\n"
+        return gambar, catatan
+
+    def _pegang_sumber(self, path, kode_hash):
+        # Dipanggil di dalam self._lock
+        entri = self._sumber.get(kode_hash)
+        if entri is None:
+            os.makedirs(self.folder_cache, exist_ok=True)
+            salinan = os.path.join(self.folder_cache, f"sumber_{kode_hash[:32]}.dxf")
+            if not os.path.exists(salinan):
+                try:
+                    os.link(path, salinan)
+                except OSError:
+                    shutil.copyfile(path, salinan)
+            entri = self._sumber[kode_hash] = [salinan, 0]
+        entri[1] += 1
+        return entri[0]
+
+    def _lepas_sumber(self, kode_hash):
+        with self._lock:
+            entri = self._sumber[kode_hash]
+            entri[1] -= 1
+            if entri[1] == 0:
+                del self._sumber[kode_hash]
+                try:
+                    os.remove(entri[0])
+                except OSError:
+                    pass
+
+    def _kerjakan(self, kunci, kode_hash, sumber, mode, dpi, ukuran, latar):
+        try:
+            png = RENDERER[mode](sumber, dpi=dpi, ukuran=ukuran, latar=latar)
+            if png is None:
+                self._catat_error(kunci, "Tidak ada geometri garis untuk dipratinjau.")
+                return
+            path = self.path_cache(kunci)
+            sementara = f"{path}.{threading.get_ident()}.tmp"
+            with open(sementara, 'wb') as f:
+                f.write(png)
+            os.replace(sementara, path)  # Atomik: pembaca tidak pernah melihat PNG setengah jadi
+            self._bersihkan_cache()
+        except Exception as e:
+            self._catat_error(kunci, str(e))
+        finally:
+            self._lepas_sumber(kode_hash)
+
+    def _bersihkan_cache(self):
+        """Buang PNG yang paling lama tidak dipakai jika total cache melebihi batas"""
+        try:
+            daftar = [os.path.join(self.folder_cache, n) for n in os.listdir(self.folder_cache) if n.endswith('.png')]
+            daftar = sorted((st.st_mtime, st.st_size, p) for p, st in ((p, os.stat(p)) for p in daftar))
+        except OSError:
+            return
+        total = sum(ukuran for _, ukuran, _ in daftar)
+        batas = self.batas_cache_mb * 1024 * 1024
+        for _, ukuran, path in daftar:
+            if total <= batas:
+                break
+            try:
+                os.remove(path)
+                total -= ukuran
+            except OSError:
+                pass
+
+
+# Worker tunggal per proses (modul ini tetap di sys.modules di antara rerun Streamlit)
+PRATINJAU = Pratinjau_DXF_Engine()
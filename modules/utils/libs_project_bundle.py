@@ -0,0 +1,125 @@
+# ==============================================================================
+# 📄 NAMA FILE: libs_project_bundle.py
+# 📍 LOKASI: modules/utils/libs_project_bundle.py
+# 🛠️ FUNGSI: Format Bundle Proyek (ZIP berisi tabel Parquet + metadata JSON)
+# ==============================================================================
+
+import io
+import json
+import struct
+import zipfile
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+VERSI_BUNDLE = 1
+NAMA_META = "meta.json"
+FOLDER_TABEL = "tables/"
+# Objek internal session yang tidak ikut disimpan
+KUNCI_DIKECUALIKAN = ('backend', 'processed_files', 'shared_execution_vars', 'cde_structure', '_bundle_terakhir')
+
+
+# ==========================================
+# 1. SIMPAN BUNDLE
+# ==========================================
+def _ke_arrow(df):
+    """DataFrame -> Arrow Table. Kolom objek bertipe campuran dipaksa menjadi teks agar tidak ditolak Arrow."""
+    if not all(isinstance(c, str) for c in df.columns):
+        df = df.rename(columns=str)
+    try:
+        return pa.Table.from_pandas(df, preserve_index=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        df = df.copy()
+        for kolom in df.columns[df.dtypes == object]:
+            df[kolom] = df[kolom].map(lambda v: None if v is None or (isinstance(v, float) and v != v) else str(v))
+        return pa.Table.from_pandas(df, preserve_index=True)
+
+
+def _json_aman(nilai):
+    try:
+        json.dumps(nilai)
+        return True
+    except (TypeError, ValueError):
+        return False
+
+
+def simpan_bundle(data_proyek, meta_tambahan=None, compression="zstd"):
+    """
+    Mengemas dictionary proyek (misal st.session_state) menjadi bytes ZIP:
+      - meta.json           -> metadata + semua nilai dasar (str/int/float/bool/list/dict)
+      - tables/<kunci>.parquet -> setiap DataFrame (real_boq_data, master_ahsp, dst)
+    Entri Parquet disimpan tanpa kompresi ZIP (ZIP_STORED) agar bisa dibaca zero-copy.
+    """
+    data_dasar = {}
+    tabel = {}
+    for k, v in data_proyek.items():
+        if k in KUNCI_DIKECUALIKAN: continue
+        if isinstance(v, pd.DataFrame):
+            tabel[str(k)] = v
+        elif isinstance(v, (str, int, float, bool, list, dict, type(None))) and _json_aman(v):
+            data_dasar[k] = v
+
+    meta = {
+        "app": "SmartBIM Enginex",
+        "version": "Gov.Ready 2.0",
+        "bundle_version": VERSI_BUNDLE,
+        "tables": {k: {"rows": len(df), "columns": len(df.columns)} for k, df in tabel.items()},
+    }
+    meta.update(meta_tambahan or {})
+
+    output = io.BytesIO()
+    with zipfile.ZipFile(output, "w", compression=zipfile.ZIP_STORED) as zf:
+        zf.writestr(NAMA_META, json.dumps({"meta": meta, "data": data_dasar}, indent=2), compress_type=zipfile.ZIP_DEFLATED)
+        for k, df in tabel.items():
+            sink = pa.BufferOutputStream()
+            pq.write_table(_ke_arrow(df), sink, compression=compression)
+            zf.writestr(f"{FOLDER_TABEL}{k}.parquet", sink.getvalue().to_pybytes())
+    return output.getvalue()
+
+
+# ==========================================
+# 2. BUKA BUNDLE (ZERO-COPY)
+# ==========================================
+def _buffer_member(buffer, info):
+    """
+    Potongan (slice) buffer Arrow yang menunjuk langsung ke isi entri ZIP_STORED, tanpa menyalin.
+    Header lokal ZIP: 30 byte + panjang nama file + panjang extra field.
+    """
+    header = buffer.slice(info.header_offset, 30).to_pybytes()
+    panjang_nama, panjang_extra = struct.unpack("<HH", header[26:30])
+    awal = info.header_offset + 30 + panjang_nama + panjang_extra
+    return buffer.slice(awal, info.compress_size)
+
+
+def buka_bundle(sumber, memory_map=False):
+    """
+    Membuka bundle proyek.
+    sumber: path file, bytes, atau file-like (UploadedFile Streamlit).
+    memory_map=True (khusus path): isi Parquet dibaca langsung dari memory-mapped file.
+    Output: (meta, dict data) -> DataFrame sudah dikembalikan ke kuncinya masing-masing.
+    """
+    if isinstance(sumber, str) and memory_map:
+        buffer = pa.memory_map(sumber, "r").read_buffer()
+    elif isinstance(sumber, str):
+        with open(sumber, "rb") as f:
+            buffer = pa.py_buffer(f.read())
+    elif isinstance(sumber, (bytes, bytearray, memoryview)):
+        buffer = pa.py_buffer(sumber)
+    else:
+        buffer = pa.py_buffer(sumber.getvalue() if hasattr(sumber, "getvalue") else sumber.read())
+
+    with zipfile.ZipFile(pa.BufferReader(buffer)) as zf:
+        isi = json.loads(zf.read(NAMA_META))
+        data = dict(isi.get("data", {}))
+
+        for info in zf.infolist():
+            if not (info.filename.startswith(FOLDER_TABEL) and info.filename.endswith(".parquet")): continue
+            kunci = info.filename[len(FOLDER_TABEL):-len(".parquet")]
+            if info.compress_type == zipfile.ZIP_STORED:
+                sumber_tabel = pa.BufferReader(_buffer_member(buffer, info))
+            else:
+                sumber_tabel = pa.BufferReader(pa.py_buffer(zf.read(info)))
+            data[kunci] = pq.read_table(sumber_tabel).to_pandas()
+
+    return isi.get("meta", {}), data
@@ -9,10 +9,32 @@ from scipy.spatial import Delaunay
 import plotly.graph_objects as go
 import plotly.figure_factory as ff
 
+try:
+    from modules.utils import libs_awan_titik
+except ImportError:
+    import libs_awan_titik
+
 class Topografi_Engine:
     def __init__(self):
         self.engine_name = "SmartBIM DTM Engine (Delaunay TIN)"
 
+    def muat_awan_titik(self, path_artefak):
+        """
+        Membuka ulang awan titik hasil ekstraksi DXF (artefak .npy memory-mapped / .parquet)
+        tanpa parsing ulang file DXF. Output: DataFrame ['X', 'Y', 'Z'] atau None jika artefak hilang.
+        """
+        if not path_artefak or libs_awan_titik.baca_meta(path_artefak) is None:
+            return None
+        return pd.DataFrame(libs_awan_titik.buka_artefak(path_artefak), columns=['X', 'Y', 'Z'], copy=False)
+
+    def siapkan_titik(self, df_points, desimal=3):
+        """
+        Titik dari tabel CSV/XLSX -> DataFrame ['X', 'Y', 'Z'] float64 tanpa titik kembar
+        (dedup tervektorisasi, sama seperti ekstraksi DXF). Baris non-numerik dibuang.
+        """
+        xyz = df_points[['X', 'Y', 'Z']].apply(pd.to_numeric, errors='coerce').dropna().to_numpy(dtype=np.float64)
+        return pd.DataFrame(libs_awan_titik.titik_unik(xyz, desimal), columns=['X', 'Y', 'Z'])
+
     def hitung_cut_fill(self, df_points, elevasi_rencana):
         """
         Menghitung volume Galian (Cut) dan Timbunan (Fill) menggunakan metode Prisma TIN.
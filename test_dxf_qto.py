@@ -0,0 +1,104 @@
+import io
+import math
+import os
+import tempfile
+
+import ezdxf
+from shapely.geometry import Point, Polygon, box
+
+from modules.utils.libs_loader import DXF_QTO_Engine
+
+# ==============================================================================
+# QTO DXF: LUAS BERSIH (NET AREA) VOID & PULAU BERSARANG
+# Pembanding = algoritma berurutan lama (sebelum STRtree + kedalaman sarang).
+# ==============================================================================
+
+
+def _luas_bersih_lama(polys):
+    """Algoritma Even-Odd berurutan versi lama (urut luas, >= 95% tertutup -> difference)"""
+    final_geom = Polygon()
+    for p in sorted(polys, key=lambda p: p.area, reverse=True):
+        p_clean = p.buffer(1e-5).buffer(-1e-5)
+        if p_clean.is_empty:
+            continue
+        if final_geom.intersection(p_clean).area > (p_clean.area * 0.95):
+            final_geom = final_geom.difference(p_clean)
+        else:
+            final_geom = final_geom.union(p_clean)
+    return final_geom.area
+
+
+def _denah_bersarang():
+    """Pelat dengan void, pulau di dalam void, void di dalam pulau, lubang bulat & poligon terpisah"""
+    return [
+        box(0, 0, 100, 60),                 # solid
+        box(10, 10, 50, 50),                # void
+        box(20, 20, 40, 40),                # pulau di dalam void
+        box(25, 25, 30, 30),                # void di dalam pulau
+        box(60, 10, 90, 30),                # void kedua
+        box(65, 15, 70, 20),                # pulau di void kedua
+        box(80, 20, 85, 25),                # pulau lain di void kedua
+        Point(75, 45).buffer(8),            # lubang bulat (CIRCLE)
+        box(120, 0, 140, 20),               # poligon terpisah
+        box(125, 5, 135, 15),               # void di poligon terpisah
+    ]
+
+
+def test_luas_bersih_sama_dengan_algoritma_lama():
+    polys = _denah_bersarang()
+    luas_baru = DXF_QTO_Engine.hitung_luas_bersih(polys).area
+    assert math.isclose(luas_baru, _luas_bersih_lama(polys), rel_tol=1e-9, abs_tol=1e-6)
+    # Hitungan tangan: 6000-1600+400-25-600+25+25-pi*64 + 400-100
+    assert math.isclose(luas_baru, 4525 - math.pi * 64, rel_tol=1e-4)
+
+
+def test_luas_bersih_tidak_bergantung_urutan_input():
+    polys = _denah_bersarang()
+    assert math.isclose(DXF_QTO_Engine.hitung_luas_bersih(polys[::-1]).area,
+                        DXF_QTO_Engine.hitung_luas_bersih(polys).area, rel_tol=1e-12)
+
+
+def test_tumpang_tindih_parsial_dihitung_solid():
+    # Perubahan yang disengaja: C hanya tertutup GABUNGAN A & B (tidak >= 95% oleh salah satunya)
+    # -> kini dihitung solid (luas = A u B), algoritma lama menjadikannya lubang.
+    a, b, c = box(0, 0, 10, 10), box(8, 0, 18, 10), box(6, 2, 12, 8)
+    luas_baru = DXF_QTO_Engine.hitung_luas_bersih([a, b, c]).area
+    assert math.isclose(luas_baru, a.union(b).area, rel_tol=1e-6)
+    assert math.isclose(_luas_bersih_lama([a, b, c]), a.union(b).area - c.area, rel_tol=1e-6)
+
+
+def test_extract_qto_dxf_void_pulau_dan_blok():
+    doc = ezdxf.new()
+    msp = doc.modelspace()
+    for p in _denah_bersarang():
+        if p.geom_type == 'Polygon' and len(p.exterior.coords) == 5:
+            msp.add_lwpolyline(list(p.exterior.coords)[:-1], close=True, dxfattribs={'layer': 'PLAT'})
+    msp.add_circle((75, 45), 8, dxfattribs={'layer': 'PLAT'})
+
+    # Kolom 400x400 dengan void 100x100 dipasang 3x lewat blok (INSERT)
+    blok = doc.blocks.new(name='KOLOM_K1')
+    blok.add_lwpolyline([(0, 0), (400, 0), (400, 400), (0, 400)], close=True, dxfattribs={'layer': 'KOLOM'})
+    blok.add_lwpolyline([(150, 150), (250, 150), (250, 250), (150, 250)], close=True, dxfattribs={'layer': 'KOLOM'})
+    for x in (1000, 2000, 3000):
+        msp.add_blockref('KOLOM_K1', (x, 1000))
+    msp.add_line((0, 0), (300, 400), dxfattribs={'layer': 'SLOOF'})
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "uji_qto.dxf")
+        doc.saveas(path)
+        with open(path, 'rb') as f:
+            df, pesan = DXF_QTO_Engine().extract_qto_from_dxf(io.BytesIO(f.read()))
+
+    assert pesan == "Sukses", pesan
+    volume = df.set_index(['Layer (Item Pekerjaan)', 'Kategori'])['Volume']
+    assert math.isclose(volume['PLAT', 'Luasan (m2)'], round(_luas_bersih_lama(_denah_bersarang()), 3), abs_tol=1e-3)
+    assert math.isclose(volume['KOLOM', 'Luasan (m2)'], 3 * (400 * 400 - 100 * 100), abs_tol=1e-3)
+    assert math.isclose(volume['SLOOF', 'Panjang (m)'], 500.0, abs_tol=1e-3)
+
+
+if __name__ == "__main__":
+    test_luas_bersih_sama_dengan_algoritma_lama()
+    test_luas_bersih_tidak_bergantung_urutan_input()
+    test_tumpang_tindih_parsial_dihitung_solid()
+    test_extract_qto_dxf_void_pulau_dan_blok()
+    print("✅ QTO DXF: luas bersih void/pulau bersarang sesuai algoritma lama")
@@ -0,0 +1,50 @@
+import pandas as pd
+
+from modules.utils.libs_legal import Legal_Contract_Engine
+
+# ==============================================================================
+# EVALUASI TENDER MASSAL: DETEKSI HARGA TIMPANG (UNBALANCED BID)
+# ==============================================================================
+ITEM = [f"Pekerjaan {i}" for i in range(1, 6)]
+HPS_ITEM = 1_000_000
+
+
+def _tender(faktor_per_penyedia):
+    df_oe = pd.DataFrame({'Nama Pekerjaan': ITEM, 'Total Harga': [HPS_ITEM] * len(ITEM)})
+    baris = [
+        {'Nama Penyedia': penyedia, 'Nama Pekerjaan': item, 'Total Harga': HPS_ITEM * faktor}
+        for penyedia, daftar_faktor in faktor_per_penyedia.items()
+        for item, faktor in zip(ITEM, daftar_faktor)
+    ]
+    hasil = Legal_Contract_Engine().evaluasi_tender_massal(df_oe, pd.DataFrame(baris))
+    assert "error" not in hasil, hasil.get("error")
+    return hasil["Ringkasan_Penyedia"].set_index('Nama Penyedia'), hasil["Detail_Evaluasi"]
+
+
+def test_tender_kecil_harga_timpang_tidak_menang():
+    # 3 penyedia: PT A menawar 1 item 120% HPS dan 1 item 20% HPS (robust z hanya 3.37 < 3.5)
+    ringkasan, detail = _tender({
+        'PT A': [1.20, 0.20, 0.95, 0.95, 0.95],
+        'PT B': [0.95, 0.95, 0.95, 0.95, 0.95],
+        'PT C': [0.90, 0.50, 1.00, 1.00, 1.00],
+    })
+    timpang_a = detail[detail['Nama Penyedia'] == 'PT A'].set_index('Nama Pekerjaan')['Harga Timpang']
+    assert timpang_a['Pekerjaan 1'] and timpang_a['Pekerjaan 2']
+
+    assert ringkasan.loc['PT A', 'Rekomendasi_Panitia'] == "TAHAN (Klarifikasi Harga Timpang)"
+    assert pd.isna(ringkasan.loc['PT A', 'Peringkat'])
+    assert ringkasan.loc['PT B', 'Rekomendasi_Panitia'] == "TENDER DITERIMA"
+    assert ringkasan.loc['PT B', 'Peringkat'] == 1
+
+
+def test_tender_besar_tetap_pakai_robust_z():
+    # 6 penyedia: selisih 15 poin dari HPS yang seragam antar penyedia bukan harga timpang
+    ringkasan, detail = _tender({f"PT {i}": [0.85 + 0.01 * i] * len(ITEM) for i in range(6)})
+    assert not detail['Harga Timpang'].any()
+    assert (ringkasan['Rekomendasi_Panitia'] == "TENDER DITERIMA").all()
+
+
+if __name__ == "__main__":
+    test_tender_kecil_harga_timpang_tidak_menang()
+    test_tender_besar_tetap_pakai_robust_z()
+    print("✅ Evaluasi tender massal: harga timpang tender kecil terdeteksi")
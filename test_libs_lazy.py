@@ -0,0 +1,58 @@
+import os
+import sys
+import tempfile
+
+from modules.utils.libs_lazy import Modul_Lazy, Registry_Engine_Lazy
+
+# ==============================================================================
+# REGRESI: KANDIDAT FALLBACK BERNAMA SAMA DENGAN ALIAS
+# Proxy sudah ada di sys.modules[alias] -> import kandidat 'alias' tidak boleh
+# mengembalikan proxy itu sendiri (dulu: RecursionError saat atribut diakses).
+# ==============================================================================
+
+
+def _buat_modul_root(folder, nama, isi):
+    with open(os.path.join(folder, f"{nama}.py"), "w", encoding="utf-8") as f:
+        f.write(isi)
+
+
+def test_fallback_alias_sama_memuat_modul_asli():
+    with tempfile.TemporaryDirectory() as folder:
+        _buat_modul_root(folder, "libs_uji_lazy", "class Engine_Uji:\n    def halo(self):\n        return 'halo'\n")
+        sys.path.insert(0, folder)
+        try:
+            registry = Registry_Engine_Lazy()
+            proxy = registry.daftar('libs_uji_lazy', ('modules.tidak_ada.libs_uji_lazy', 'libs_uji_lazy'), menu=("Menu Uji",))
+            assert sys.modules['libs_uji_lazy'] is proxy
+
+            assert registry.siapkan_menu("Menu Uji") == {}
+            modul = sys.modules['libs_uji_lazy']
+            assert not isinstance(modul, Modul_Lazy)
+            assert modul.Engine_Uji().halo() == 'halo'
+            assert proxy.Engine_Uji().halo() == 'halo'
+        finally:
+            sys.path.remove(folder)
+            sys.modules.pop('libs_uji_lazy', None)
+
+
+def test_fallback_alias_tidak_ada_gagal_tanpa_rekursi():
+    registry = Registry_Engine_Lazy()
+    proxy = registry.daftar('libs_uji_hilang', ('modules.tidak_ada.libs_uji_hilang', 'libs_uji_hilang'), menu=("Menu Uji",), opsional=True)
+    try:
+        assert registry.siapkan_menu("Menu Uji") == {}
+        assert 'libs_uji_hilang' not in sys.modules
+        assert registry.error('libs_uji_hilang')
+        try:
+            proxy.Engine_Uji
+        except ImportError:
+            pass
+        else:
+            raise AssertionError("Akses atribut modul yang tidak ada harus ImportError")
+    finally:
+        sys.modules.pop('libs_uji_hilang', None)
+
+
+if __name__ == "__main__":
+    test_fallback_alias_sama_memuat_modul_asli()
+    test_fallback_alias_tidak_ada_gagal_tanpa_rekursi()
+    print("✅ libs_lazy: fallback alias aman (tanpa RecursionError)")